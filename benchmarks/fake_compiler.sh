@@ -0,0 +1,37 @@
+#!/bin/sh
+# Stand-in compiler for benchmarks: accepts any flags, answers the probes
+# crow_hooks makes and writes empty outputs (plus a depfile for -MF), so
+# measured time is the Python overhead rather than real compilation.
+
+case "$1" in
+    --version) echo "crow-fake-compiler (GCC compatible) 1.0.0"; exit 0 ;;
+    -dumpmachine) echo "x86_64-fake-linux-gnu"; exit 0 ;;
+esac
+
+output=""
+depfile=""
+source=""
+preprocess=0
+while [ $# -gt 0 ]; do
+    case "$1" in
+        -o) output="$2"; shift ;;
+        -MF) depfile="$2"; shift ;;
+        -I|-isystem|-include|-x|-MT|-MQ) shift ;;
+        -E) preprocess=1 ;;
+        -*) ;;
+        *) source="$1" ;;
+    esac
+    shift
+done
+
+if [ "$preprocess" = 1 ]; then
+    [ -n "$source" ] && cat "$source"
+    exit 0
+fi
+if [ -n "$output" ]; then
+    : > "$output"
+fi
+if [ -n "$depfile" ]; then
+    echo "$output: $source" > "$depfile"
+fi
+exit 0
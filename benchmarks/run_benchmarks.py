@@ -0,0 +1,230 @@
+"""Benchmarks for crow_hooks Python overhead on synthetic projects.
+
+Usage:
+    python benchmarks/run_benchmarks.py --sizes 100,1000,10000 -o results.json
+    python benchmarks/run_benchmarks.py --compare baseline.json
+
+Compilers are replaced by fake_compiler.sh, so timings measure discovery,
+bookkeeping and scheduling rather than compilation.
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, Any, List, Optional
+
+BENCHMARK_DIR = Path(__file__).resolve().parent
+REPOSITORY_ROOT = BENCHMARK_DIR.parent
+FAKE_COMPILER = BENCHMARK_DIR / "fake_compiler.sh"
+
+sys.path.insert(0, str(REPOSITORY_ROOT))
+sys.path.insert(0, str(BENCHMARK_DIR))
+
+from synthetic_project import generate_project  # noqa: E402
+
+IMPORT_SNIPPET = (
+    "import time; start = time.perf_counter(); import crow_hooks; "
+    "print(time.perf_counter() - start)"
+)
+
+
+def measure(function: Callable[[], Any], repeat: int, setup=None) -> List[float]:
+    """Returns wall times of repeat calls of function, running setup before each."""
+    timings = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def bench_import(root: Path, repeat: int) -> List[float]:
+    """Times `import crow_hooks` in fresh interpreters."""
+    environment = dict(os.environ, PYTHONPATH=str(REPOSITORY_ROOT))
+    timings = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", IMPORT_SNIPPET],
+            cwd=str(root),
+            env=environment,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        timings.append(float(output.strip()))
+    return timings
+
+
+def run_suite(root: Path, repeat: int, compile_limit: int) -> Dict[str, List[float]]:
+    """Runs every benchmark against generated project at root."""
+    from crow_hooks.discovery import FileIndex
+    from crow_hooks.hooks import HookContext
+
+    index_path = root / "build" / FileIndex.INDEX_FILE
+
+    def drop_index():
+        if index_path.exists():
+            index_path.unlink()
+
+    def discover():
+        ctx = HookContext(str(root))
+        return ctx.sources, ctx.include_dirs
+
+    def find_sources():
+        HookContext(str(root)).find_sources(["**/*.cpp", "**/*.h"])
+
+    results: Dict[str, List[float]] = {}
+    results["import"] = bench_import(root, repeat)
+    results["hook_context"] = measure(lambda: HookContext(str(root)), repeat)
+    results["discovery_cold"] = measure(discover, repeat, drop_index)
+    discover()
+    results["discovery_warm"] = measure(discover, repeat)
+    results["find_sources"] = measure(find_sources, repeat)
+
+    ctx = HookContext(str(root))
+    sources = ctx.sources[:compile_limit]
+
+    def clean_build():
+        shutil.rmtree(root / "build" / "bench_objects", ignore_errors=True)
+        state = root / "build" / ".crow_build_state.json"
+        if state.exists():
+            state.unlink()
+
+    def compile_target():
+        HookContext(str(root)).compile_target("bench", sources, cxx=True)
+
+    with _quiet():
+        results["schedule_full"] = measure(compile_target, repeat, clean_build)
+        results["schedule_noop"] = measure(compile_target, repeat)
+    return results
+
+
+class _quiet:
+    """Silences build messages written to stdout."""
+
+    def __enter__(self):
+        sys.stdout.flush()
+        self._saved = os.dup(1)
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, 1)
+        os.close(devnull)
+
+    def __exit__(self, *exc_info):
+        sys.stdout.flush()
+        os.dup2(self._saved, 1)
+        os.close(self._saved)
+
+
+def summarize(timings: List[float]) -> Dict[str, float]:
+    return {
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "mean": statistics.mean(timings),
+        "runs": timings,
+    }
+
+
+def environment_info() -> Dict[str, Any]:
+    """Describes machine and revision the results were taken on."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=str(REPOSITORY_ROOT),
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "timestamp": time.time(),
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> str:
+    """Formats median ratios of current results against baseline results."""
+    previous = {
+        (entry["size"], entry["benchmark"]): entry["median"]
+        for entry in baseline["results"]
+    }
+    lines = [
+        f"{'size':>7} {'benchmark':<16} {'baseline':>10} {'current':>10} {'ratio':>7}"
+    ]
+    for entry in current["results"]:
+        old = previous.get((entry["size"], entry["benchmark"]))
+        if old is None:
+            continue
+        ratio = entry["median"] / old if old else float("inf")
+        lines.append(
+            f"{entry['size']:>7} {entry['benchmark']:<16} "
+            f"{old * 1000:>8.1f}ms {entry['median'] * 1000:>8.1f}ms {ratio:>6.2f}x"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark crow_hooks overhead")
+    parser.add_argument("--sizes", default="100,1000,10000")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--compile-limit",
+        type=int,
+        default=1000,
+        help="maximum number of sources handed to the scheduling benchmark",
+    )
+    parser.add_argument("--workdir", type=Path, help="keep generated projects here")
+    parser.add_argument("-o", "--output", type=Path, help="write JSON results here")
+    parser.add_argument("--compare", type=Path, help="baseline JSON results")
+    arguments = parser.parse_args(argv)
+
+    workdir = arguments.workdir or Path(tempfile.mkdtemp(prefix="crow-bench-"))
+    os.environ.update(
+        CC=str(FAKE_COMPILER),
+        CXX=str(FAKE_COMPILER),
+        CROW_CACHE_DIR=str(workdir / "cache"),
+        CROW_OBJECT_CACHE="0",
+    )
+    os.environ.pop("CROW_BUILD_DIR", None)
+    os.environ.pop("CROW_TRACE", None)
+
+    report: Dict[str, Any] = {"environment": environment_info(), "results": []}
+    try:
+        for size in (int(value) for value in arguments.sizes.split(",")):
+            root = workdir / f"project_{size}"
+            if not root.exists():
+                generate_project(root, size)
+            timings = run_suite(root, arguments.repeat, arguments.compile_limit)
+            for name, runs in timings.items():
+                entry = dict(size=size, benchmark=name, **summarize(runs))
+                report["results"].append(entry)
+                print(
+                    f"{size:>7} {name:<16} median {entry['median'] * 1000:8.1f}ms"
+                    f"  min {entry['min'] * 1000:8.1f}ms",
+                    flush=True,
+                )
+    finally:
+        if arguments.workdir is None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if arguments.output:
+        arguments.output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    if arguments.compare:
+        baseline = json.loads(arguments.compare.read_text(encoding="utf-8"))
+        print(compare(report, baseline))
+
+
+if __name__ == "__main__":
+    main()
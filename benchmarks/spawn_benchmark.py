@@ -0,0 +1,96 @@
+"""Benchmark of BuildExecutor process spawn backends.
+
+Usage:
+    python benchmarks/spawn_benchmark.py --commands 500 --ballast 0,512 -o spawn.json
+    python benchmarks/spawn_benchmark.py --compare spawn.json
+
+Each run executes a trivial command many times through BuildExecutor. The
+ballast (in MiB) is allocated up front to mimic hooks that hold large data
+structures, which makes fork-based spawning progressively slower.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+from run_benchmarks import (
+    REPOSITORY_ROOT,
+    compare,
+    environment_info,
+    measure,
+    summarize,
+)
+
+sys.path.insert(0, str(REPOSITORY_ROOT))
+
+from crow_hooks.execution import BuildExecutor, ProcessSpawner  # noqa: E402
+from crow_hooks.execution.process_spawn import SPAWN_BACKENDS  # noqa: E402
+
+
+def run_commands(
+    executor: BuildExecutor, command: List[str], count: int, capture: bool
+):
+    for _ in range(count):
+        executor.execute_command(command, echo=False, capture_output=capture)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark process spawn backends")
+    parser.add_argument("--commands", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--ballast", default="0,512", help="comma separated MiB")
+    parser.add_argument("-o", "--output", type=Path, help="write JSON results here")
+    parser.add_argument("--compare", type=Path, help="baseline JSON results")
+    arguments = parser.parse_args(argv)
+
+    command = [shutil.which("true") or "true"]
+    backends = [
+        backend
+        for backend in SPAWN_BACKENDS
+        if backend != "auto" and _available(backend)
+    ]
+
+    report: Dict[str, Any] = {"environment": environment_info(), "results": []}
+    ballast: List[bytearray] = []
+    for size in sorted(int(value) for value in arguments.ballast.split(",")):
+        ballast.extend(bytearray(b"\1" * (1 << 20)) for _ in range(size - len(ballast)))
+        for backend in backends:
+            executor = BuildExecutor(Path.cwd(), dict(os.environ), backend)
+            for capture in (False, True):
+                name = f"{backend}{'+capture' if capture else ''}"
+                runs = measure(
+                    lambda: run_commands(
+                        executor, command, arguments.commands, capture
+                    ),
+                    arguments.repeat,
+                )
+                runs = [run / arguments.commands for run in runs]
+                entry = dict(size=size, benchmark=name, **summarize(runs))
+                report["results"].append(entry)
+                print(
+                    f"{size:>5}MiB {name:<22} median {entry['median'] * 1e6:9.1f}us"
+                    f"  min {entry['min'] * 1e6:9.1f}us per command",
+                    flush=True,
+                )
+
+    if arguments.output:
+        arguments.output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    if arguments.compare:
+        baseline = json.loads(arguments.compare.read_text(encoding="utf-8"))
+        print(compare(report, baseline))
+
+
+def _available(backend: str) -> bool:
+    try:
+        ProcessSpawner(backend)
+    except ValueError:
+        return False
+    return True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+import argparse
+import random
+from pathlib import Path
+from typing import Dict, List
+
+SOURCE_SUFFIXES = [".cpp", ".cpp", ".cc", ".c"]
+NOISE_SUFFIXES = [".txt", ".md", ".py", ".json"]
+
+
+def generate_project(
+    root: Path,
+    files: int,
+    depth: int = 6,
+    fanout: int = 4,
+    header_dirs: int = 32,
+    seed: int = 0,
+) -> Dict[str, int]:
+    """Generates synthetic C/C++ project with roughly the given number of files.
+
+    About 60% of files are sources spread over a nested module tree, 30% are
+    headers split between include/ directories and the module tree, and the
+    rest are non-source files. Output is deterministic for a given seed.
+    Returns counts of generated files per kind.
+    """
+    rng = random.Random(seed)
+    root.mkdir(parents=True, exist_ok=True)
+    (root / "crow.toml").write_text('[package]\nname = "synthetic"\n', encoding="utf-8")
+    (root / ".gitignore").write_text("build/\n*.tmp\n", encoding="utf-8")
+
+    directories = _module_directories(max(1, files // 25), depth, fanout, rng)
+    include_roots = [f"include/lib{index:03d}" for index in range(header_dirs)]
+
+    counts = {"sources": 0, "headers": 0, "other": 0}
+    headers: List[str] = []
+    for index in range(files):
+        roll = rng.random()
+        if roll < 0.3:
+            if rng.random() < 0.5:
+                directory = rng.choice(include_roots)
+            else:
+                directory = rng.choice(directories)
+            path = f"{directory}/header_{index}.h"
+            _write(root / path, f"#pragma once\nint value_{index}(void);\n")
+            headers.append(path)
+            counts["headers"] += 1
+        elif roll < 0.9:
+            suffix = rng.choice(SOURCE_SUFFIXES)
+            path = f"{rng.choice(directories)}/unit_{index}{suffix}"
+            includes = "".join(
+                f'#include "{Path(header).name}"\n'
+                for header in rng.sample(headers, min(3, len(headers)))
+            )
+            _write(
+                root / path,
+                f"{includes}int value_{index}(void) {{ return {index}; }}\n",
+            )
+            counts["sources"] += 1
+        else:
+            suffix = rng.choice(NOISE_SUFFIXES)
+            _write(root / f"{rng.choice(directories)}/notes_{index}{suffix}", "\n")
+            counts["other"] += 1
+    return counts
+
+
+def _module_directories(
+    count: int, depth: int, fanout: int, rng: random.Random
+) -> List[str]:
+    """Builds count distinct directories nested up to depth levels under src/."""
+    count = min(count, sum(fanout**level for level in range(depth + 1)))
+    directories = {"src"}
+    result = ["src"]
+    while len(result) < count:
+        parts = ["src"]
+        for level in range(rng.randint(1, depth)):
+            parts.append(f"mod{level}_{rng.randrange(fanout)}")
+        path = "/".join(parts)
+        if path not in directories:
+            directories.add(path)
+            result.append(path)
+    return result
+
+
+def _write(path: Path, text: str):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding="utf-8")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic C/C++ project")
+    parser.add_argument("root", type=Path)
+    parser.add_argument("--files", type=int, default=1000)
+    parser.add_argument("--depth", type=int, default=6)
+    parser.add_argument("--header-dirs", type=int, default=32)
+    parser.add_argument("--seed", type=int, default=0)
+    arguments = parser.parse_args()
+    counts = generate_project(
+        arguments.root,
+        arguments.files,
+        arguments.depth,
+        header_dirs=arguments.header_dirs,
+        seed=arguments.seed,
+    )
+    print(", ".join(f"{count} {kind}" for kind, count in counts.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+import sys
+from importlib import import_module
+from typing import Callable, Dict, List, Tuple
+
+
+def lazy_exports(
+    package: str, exports: Dict[str, str]
+) -> Tuple[Callable[[str], object], Callable[[], List[str]]]:
+    """Returns module __getattr__ and __dir__ importing exports on first access.
+
+    exports maps exported names to the submodules defining them, relative to
+    package. Submodules are imported on first access so that importing
+    crow_hooks stays cheap; resolved names are then stored on the package.
+    """
+
+    def __getattr__(name: str):
+        module = exports.get(name)
+        if module is None:
+            raise AttributeError(f"module {package!r} has no attribute {name!r}")
+        value = getattr(import_module(module, package), name)
+        setattr(sys.modules[package], name, value)
+        return value
+
+    def __dir__() -> List[str]:
+        return sorted(set(vars(sys.modules[package])) | set(exports))
+
+    return __getattr__, __dir__
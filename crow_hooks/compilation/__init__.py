@@ -1,4 +1,20 @@
-from .compilation_manager import CompilationManager
-from .artifact_manager import BuildArtifactManager
+from .._lazy import lazy_exports
 
-__all__ = ["CompilationManager", "BuildArtifactManager"]
+# Exported names and the submodules defining them.
+_EXPORTS = {
+    "CompilationManager": ".compilation_manager",
+    "CompilationError": ".compilation_manager",
+    "BuildArtifactManager": ".artifact_manager",
+    "BuildStateDatabase": ".build_state",
+    "IncludeResolver": ".include_resolver",
+    "LinkStrategy": ".link_strategy",
+    "ObjectCache": ".object_cache",
+    "ResourceLimits": ".target_scheduler",
+    "TargetBuildError": ".target_scheduler",
+    "TargetScheduler": ".target_scheduler",
+    "TargetSpec": ".target_scheduler",
+}
+
+__all__ = list(_EXPORTS)
+
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS)
@@ -1,6 +1,8 @@
 import os
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, List
+from .build_state import BuildStateDatabase
+from .target_scheduler import TARGET_KINDS, TargetSpec
 
 
 class BuildArtifactManager:
@@ -12,6 +14,9 @@ class BuildArtifactManager:
             os.environ.get("CROW_BUILD_DIR", str(project_root / "build"))
         )
         self.artifacts: Dict[str, Dict[str, Any]] = {}
+        self.object_pools: Dict[str, Dict[str, Any]] = {}
+        self.declared_targets: Dict[str, TargetSpec] = {}
+        self.build_state = BuildStateDatabase(self.build_directory)
 
     def prepare_build_directory(self):
         """Prepares build directory."""
@@ -20,3 +25,25 @@ class BuildArtifactManager:
     def register_artifact(self, name: str, artifact_info: Dict[str, Any]):
         """Registers created artifact."""
         self.artifacts[name] = artifact_info
+
+    def declare_target(self, spec: TargetSpec):
+        """Declares target to be built later by the target scheduler."""
+        if spec.kind not in TARGET_KINDS:
+            raise ValueError(f"Unknown target kind: {spec.kind!r}")
+        self.declared_targets[spec.name] = spec
+
+    def register_object_pool(
+        self,
+        pool_directory: Path,
+        objects: List[str],
+        flags: List[str],
+        artifact_path: Path,
+    ) -> Dict[str, Any]:
+        """Records artifact linked from shared object pool; returns pool info."""
+        pool = self.object_pools.setdefault(
+            str(pool_directory), {"objects": objects, "flags": flags, "artifacts": []}
+        )
+        pool["objects"] = objects
+        if str(artifact_path) not in pool["artifacts"]:
+            pool["artifacts"].append(str(artifact_path))
+        return pool
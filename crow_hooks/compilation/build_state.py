@@ -0,0 +1,243 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+from pathlib import Path
+from typing import Dict, Any, Iterable, List, Optional
+from ..discovery import CompilerProbe
+
+
+class BuildStateDatabase:
+    """Class for tracking inputs of previously built objects.
+
+    The state is kept in a single JSON file inside the build directory. Every
+    object records the content hashes of its inputs (source plus headers from
+    its depfile); a shared stat table lets unchanged files skip re-hashing.
+    Durations of the last builds of objects, outputs and targets are kept
+    for scheduling.
+    """
+
+    STATE_FILE = ".crow_build_state.json"
+    VERSION = 2
+
+    def __init__(self, build_directory: Path):
+        self.build_directory = build_directory
+        self.path = build_directory / self.STATE_FILE
+        self._objects: Optional[Dict[str, Dict[str, Any]]] = None
+        self._outputs: Dict[str, Dict[str, Any]] = {}
+        self._files: Dict[str, Dict[str, Any]] = {}
+        self._timings: Dict[str, float] = {}
+        self._hashes: Dict[str, Optional[str]] = {}
+        self._header_index: Optional[Dict[str, List[str]]] = None
+        self._compiler_ids: Dict[str, str] = {}
+        self._dirty = False
+        self._lock = threading.RLock()
+
+    def load(self):
+        """Loads build state from disk."""
+        data: Dict[str, Any] = {}
+        try:
+            loaded = json.loads(self.path.read_text(encoding="utf-8"))
+            if loaded.get("version") == self.VERSION:
+                data = loaded
+        except (OSError, ValueError):
+            pass
+        self._objects = data.get("objects", {})
+        self._outputs = data.get("outputs", {})
+        self._files = data.get("files", {})
+        self._timings = data.get("timings", {})
+        self._hashes = {}
+        self._header_index = None
+        self._dirty = False
+
+    def save(self):
+        """Atomically writes build state to disk if it changed."""
+        with self._lock:
+            if not self._dirty or self._objects is None:
+                return
+            data = {
+                "version": self.VERSION,
+                "objects": self._objects,
+                "outputs": self._outputs,
+                "files": self._files,
+                "timings": self._timings,
+            }
+            self.build_directory.mkdir(parents=True, exist_ok=True)
+            temp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+            temp_path.write_text(json.dumps(data, separators=(",", ":")), "utf-8")
+            os.replace(temp_path, self.path)
+            self._dirty = False
+
+    def refresh(self, paths: Optional[Iterable[str]] = None):
+        """Forgets file hashes memoized since the last refresh (of paths)."""
+        with self._lock:
+            if paths is None:
+                self._hashes = {}
+            else:
+                for path in paths:
+                    self._hashes.pop(path, None)
+
+    def compiler_identity(self, compiler: str) -> str:
+        """Returns identity string of compiler executable, as CompilerProbe does.
+
+        The same identity keys object cache entries, so both always agree on
+        whether the compiler changed.
+        """
+        identity = self._compiler_ids.get(compiler)
+        if identity is None:
+            identity = CompilerProbe.identity(shutil.which(compiler) or compiler)
+            self._compiler_ids[compiler] = identity
+        return identity
+
+    def is_object_current(
+        self, object_file: Path, source: str, command: List[str], compiler: str
+    ) -> bool:
+        """Checks whether object was built from unchanged inputs."""
+        entry = self._entries().get(str(object_file))
+        if entry is None or entry["command"] != command:
+            return False
+        if entry["compiler"] != self.compiler_identity(compiler):
+            return False
+        if str(source) not in entry["inputs"] or not os.path.exists(object_file):
+            return False
+        for path, recorded_hash in entry["inputs"].items():
+            if self.file_hash(path) != recorded_hash:
+                return False
+        return True
+
+    def record_object(
+        self,
+        object_file: Path,
+        source: str,
+        command: List[str],
+        compiler: str,
+        dependencies: Iterable[str] = (),
+    ):
+        """Records inputs of freshly built object."""
+        inputs = {str(source): self.file_hash(str(source))}
+        for dependency in dependencies:
+            inputs.setdefault(dependency, self.file_hash(dependency))
+        entry = {
+            "command": list(command),
+            "compiler": self.compiler_identity(compiler),
+            "inputs": inputs,
+        }
+        with self._lock:
+            self._entries()[str(object_file)] = entry
+            self._header_index = None
+            self._dirty = True
+
+    def forget_object(self, object_file: Path):
+        """Drops recorded state of object."""
+        with self._lock:
+            if self._entries().pop(str(object_file), None) is not None:
+                self._header_index = None
+                self._dirty = True
+
+    def dependents_of(self, header: str) -> List[str]:
+        """Returns objects whose last build included header."""
+        with self._lock:
+            if self._header_index is None:
+                index: Dict[str, List[str]] = {}
+                for object_file, entry in self._entries().items():
+                    for path in entry["inputs"]:
+                        index.setdefault(path, []).append(object_file)
+                self._header_index = index
+            return list(self._header_index.get(os.path.normpath(header), []))
+
+    def is_output_current(
+        self, output_file: Path, command: List[str], inputs: Iterable[str] = ()
+    ) -> bool:
+        """Checks whether link or archive output was produced by command.
+
+        inputs lists files (such as linked libraries) whose contents must be
+        unchanged since the output was recorded.
+        """
+        self._entries()
+        entry = self._outputs.get(str(output_file))
+        if entry is None or entry["command"] != command or not output_file.exists():
+            return False
+        recorded = entry.get("inputs", {})
+        return all(
+            path in recorded and self.file_hash(path) == recorded[path]
+            for path in inputs
+        )
+
+    def record_output(
+        self, output_file: Path, command: List[str], inputs: Iterable[str] = ()
+    ):
+        """Records command (and extra input hashes) that produced output."""
+        self._entries()
+        entry: Dict[str, Any] = {"command": list(command)}
+        hashes = {path: self.file_hash(path) for path in inputs}
+        if hashes:
+            entry["inputs"] = hashes
+        with self._lock:
+            self._outputs[str(output_file)] = entry
+            self._dirty = True
+
+    def duration(self, key: str) -> Optional[float]:
+        """Returns seconds the last build of object, output or target took."""
+        self._entries()
+        return self._timings.get(key)
+
+    def record_duration(self, key: str, seconds: float):
+        """Remembers how long building object, output or target took."""
+        self._entries()
+        seconds = round(seconds, 4)
+        with self._lock:
+            if self._timings.get(key) != seconds:
+                self._timings[key] = seconds
+                self._dirty = True
+
+    def file_hash(self, path: str) -> Optional[str]:
+        """Returns content hash of file, re-hashing only when its stat changed."""
+        # Memoized hashes are read without the lock; dict lookups are atomic.
+        hashes = self._hashes
+        if path in hashes:
+            return hashes[path]
+        self._entries()
+        signature = self._stat_signature(path)
+        known = self._files.get(path)
+        if signature is None:
+            digest = None
+        elif known is not None and known["stat"] == signature:
+            digest = known["hash"]
+        else:
+            digest = self.hash_file(path)
+            with self._lock:
+                self._files[path] = {"stat": signature, "hash": digest}
+                self._dirty = True
+        with self._lock:
+            self._hashes[path] = digest
+        return digest
+
+    @staticmethod
+    def hash_file(path: str) -> Optional[str]:
+        """Computes content hash of file."""
+        digest = hashlib.blake2b(digest_size=16)
+        try:
+            with open(path, "rb") as handle:
+                for chunk in iter(lambda: handle.read(1 << 20), b""):
+                    digest.update(chunk)
+        except OSError:
+            return None
+        return digest.hexdigest()
+
+    @staticmethod
+    def _stat_signature(path: str) -> Optional[List[int]]:
+        """Returns cheap change signature of file."""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return [stat.st_mtime_ns, stat.st_size, stat.st_ino]
+
+    def _entries(self) -> Dict[str, Dict[str, Any]]:
+        """Returns object entries, loading state on first use."""
+        if self._objects is None:
+            with self._lock:
+                if self._objects is None:
+                    self.load()
+        return self._objects
@@ -1,7 +1,64 @@
+import hashlib
+import os
 import platform
+import subprocess
+import time
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import List, Dict, Optional, Any
-from ..execution import BuildExecutor, FileManager
+from typing import Callable, List, Dict, NamedTuple, Optional, Sequence, Tuple, Union
+from ..config import ConfigurationManager
+from ..discovery import CompilerInfo, CompilerProbe
+from ..execution import BuildCancelled, BuildExecutor, FileManager
+from ..remote import RemoteExecutor
+from ..tracing import tracer
+from .depfile import parse_make_depfile, show_includes_dependency
+from .include_resolver import SEARCH_PATH_FLAGS, IncludeResolver
+from .link_strategy import LinkStrategy
+from .object_cache import ObjectCache
+from .response_file import command_line_limit, with_response_file
+from .unity import DEFAULT_BATCH_SIZE, plan_unity_build, write_unity_batch
+
+
+class UnitOutcome(NamedTuple):
+    """Result of building one translation unit."""
+
+    result: subprocess.CompletedProcess
+    stdout: str
+    dependencies: List[str]
+    cached: bool
+    duration: float = 0.0
+
+
+class TranslationUnit(NamedTuple):
+    """Single source compiled to a single object."""
+
+    source: str
+    object_file: Path
+    command: List[str]
+    depfile: Optional[Path] = None
+    show_includes: bool = False
+    implicit_inputs: Tuple[str, ...] = ()
+    cacheable: bool = True
+
+
+class PrecompiledHeader(NamedTuple):
+    """Built precompiled header and how translation units use it."""
+
+    flags: List[str]
+    inputs: Tuple[str, ...]
+    objects: List[str]
+
+
+class CompilationError(RuntimeError):
+    """Raised when one or more translation units fail to compile."""
+
+    def __init__(self, failures: List[Tuple[str, subprocess.CompletedProcess]]):
+        self.failures = failures
+        lines = [f"{len(failures)} translation unit(s) failed to compile:"]
+        for source, result in failures:
+            lines.append(f"  {source} (exit code {result.returncode})")
+        super().__init__("\n".join(lines))
 
 
 class CompilationManager:
@@ -15,6 +72,11 @@ class CompilationManager:
         compiler_info: Dict[str, str],
         flags: Dict[str, List[str]],
         include_dirs: List[str],
+        compiler_probe: Optional[CompilerProbe] = None,
+        object_cache: Optional[ObjectCache] = None,
+        include_resolver: Optional[IncludeResolver] = None,
+        link_strategy: Optional[LinkStrategy] = None,
+        remote_executor: Optional[RemoteExecutor] = None,
     ):
         self.executor = build_executor
         self.files = file_manager
@@ -22,6 +84,17 @@ class CompilationManager:
         self.compilers = compiler_info
         self.flags = flags
         self.include_directories = include_dirs
+        self.probe = compiler_probe
+        self.object_cache = object_cache
+        self.include_resolver = include_resolver
+        self.link_strategy = link_strategy or LinkStrategy(probe=compiler_probe)
+        self.remote_executor = remote_executor
+        self.command_line_limit = command_line_limit()
+        self._include_paths: Dict[str, str] = {}
+        # Set by TargetScheduler while it builds several targets at once.
+        self.job_slots: Optional["PrioritySlots"] = None
+        self.target_priorities: Dict[str, float] = {}
+        self._probed: Dict[str, CompilerInfo] = {}
         self.operating_system = platform.system().lower()
 
     def compile_executable(
@@ -31,13 +104,25 @@ class CompilationManager:
         extra_cflags: Optional[List[str]] = None,
         extra_ldflags: Optional[List[str]] = None,
         use_cpp: bool = True,
+        jobs: Optional[int] = None,
+        pch: Optional[str] = None,
+        unity: Union[bool, int] = False,
+        unity_exclude: Optional[List[str]] = None,
+        link_libraries: Optional[Callable[[], List[str]]] = None,
     ) -> Path:
-        """Compiles executable file."""
+        """Compiles executable file.
+
+        pch names a header to precompile; unity (True or a batch size) builds
+        sources through generated batch translation units, except those
+        matching unity_exclude globs. link_libraries is called before linking
+        and returns library paths to link; it may block until they are built.
+        """
         if self.executor.crow_cli:
             self.executor.execute_crow_command(["build", "--target", name])
             return self.artifacts.build_directory / name
 
         self.artifacts.prepare_build_directory()
+        self._start_step()
         source_files = sources or []
 
         if not source_files:
@@ -46,34 +131,46 @@ class CompilationManager:
         compiler = (
             self.compilers["cpp_compiler"] if use_cpp else self.compilers["c_compiler"]
         )
+        base_flags = self.flags["cpp_flags"] if use_cpp else self.flags["c_flags"]
+        compile_flags = list(base_flags) + (extra_cflags or [])
+        compile_flags += self.link_strategy.compile_flags(compiler, compile_flags)
         output_path = self.artifacts.build_directory / name
+        obj_dir = self.artifacts.build_directory / (name + "_objects")
+        header = self._build_pch(name, obj_dir, compiler, compile_flags, pch, use_cpp)
+
+        units = []
+        for source in self._unity_sources(obj_dir, source_files, unity, unity_exclude):
+            obj_file = self._object_path(obj_dir, source, ".o")
+            command = [compiler, "-c", self._source_path(source)]
+            command += ["-o", str(obj_file)]
+            command += compile_flags + header.flags
+            command += self._include_flags("-I", source, pch, flags=compile_flags)
+            depfile = self._add_depfile_flags(command, obj_file)
+            units.append(
+                TranslationUnit(
+                    source, obj_file, command, depfile, False, header.inputs
+                )
+            )
 
-        command = [compiler]
-        command += self.flags["cpp_flags"] if use_cpp else self.flags["c_flags"]
-
-        if extra_cflags:
-            command += extra_cflags
-
-        for include_dir in self.include_directories:
-            command += ["-I", str(self.files.project_root / include_dir)]
+        object_files, rebuilt = self._compile_objects(units, jobs, name)
 
-        absolute_sources = [
-            str(self.files.project_root / source) for source in source_files
-        ]
-        command += absolute_sources
+        libraries = list(link_libraries()) if link_libraries else []
+        command = [compiler] + compile_flags + object_files + libraries
         command += ["-o", str(output_path)]
 
         if extra_ldflags:
             command += extra_ldflags
 
         command += self.flags["linker_flags"]
+        command += self.link_strategy.link_flags(compiler, command)
 
-        self.executor.execute_command(command)
+        self._run_output_step(output_path, command, rebuilt, False, name, libraries)
 
         artifact_info = {
             "path": str(output_path),
             "sources": source_files,
             "type": "executable",
+            "objects": object_files,
         }
         self.artifacts.register_artifact(name, artifact_info)
 
@@ -85,8 +182,16 @@ class CompilationManager:
         sources: Optional[List[str]] = None,
         static: bool = True,
         extra_flags: Optional[List[str]] = None,
+        jobs: Optional[int] = None,
+        pch: Optional[str] = None,
+        unity: Union[bool, int] = False,
+        unity_exclude: Optional[List[str]] = None,
+        link_libraries: Optional[Callable[[], List[str]]] = None,
     ) -> Path:
-        """Compiles library."""
+        """Compiles library; options work as in compile_executable.
+
+        Static libraries only wait for link_libraries; shared ones link them.
+        """
         if self.executor.crow_cli:
             self.executor.execute_crow_command(["build", "--lib", name])
             return (
@@ -94,14 +199,18 @@ class CompilationManager:
             )
 
         self.artifacts.prepare_build_directory()
-        source_files = sources or []
+        self._start_step()
+        obj_dir = self.artifacts.build_directory / (name + "_objects")
+        source_files = self._unity_sources(obj_dir, sources or [], unity, unity_exclude)
 
         if self.operating_system == "windows":
             return self._compile_windows_library(
-                name, source_files, static, extra_flags
+                name, source_files, static, extra_flags, jobs, pch, link_libraries
             )
         else:
-            return self._compile_unix_library(name, source_files, static, extra_flags)
+            return self._compile_unix_library(
+                name, source_files, static, extra_flags, jobs, pch, link_libraries
+            )
 
     def _compile_windows_library(
         self,
@@ -109,52 +218,71 @@ class CompilationManager:
         sources: List[str],
         static: bool,
         extra_flags: Optional[List[str]] = None,
+        jobs: Optional[int] = None,
+        pch: Optional[str] = None,
+        link_libraries: Optional[Callable[[], List[str]]] = None,
     ) -> Path:
         """Compiles library on Windows."""
-
-        from ..discovery import ConfigurationManager
-
         output_file = self.artifacts.build_directory / (
             f"{name}.lib" if static else f"{name}.dll"
         )
         compiler = self.compilers["cpp_compiler"]
-        object_files = []
+        obj_dir = self.artifacts.build_directory / (name + "_objects")
+        header = self._build_msvc_pch(name, obj_dir, compiler, extra_flags or [], pch)
 
+        units = []
         for source in sources:
-            obj_file = self.artifacts.build_directory / (
-                Path(source).with_suffix(".obj").name
-            )
+            obj_file = self._object_path(obj_dir, source, ".obj")
             command = [
                 compiler,
                 "/c",
                 str(self.files.project_root / source),
                 "/Fo" + str(obj_file),
+                "/showIncludes",
             ]
-
-            for include_dir in self.include_directories:
-                command += ["/I", str(self.files.project_root / include_dir)]
+            command += self._include_flags("/I", source, pch, flags=extra_flags or ())
 
             if extra_flags:
                 command += extra_flags
+            command += header.flags
 
-            self.executor.execute_command(command)
-            object_files.append(str(obj_file))
+            units.append(
+                TranslationUnit(source, obj_file, command, None, True, header.inputs)
+            )
+
+        object_files, rebuilt = self._compile_objects(units, jobs, name)
+        object_files += header.objects
+        libraries = list(link_libraries()) if link_libraries else []
 
         if static:
             lib_tool = ConfigurationManager.find_executable(["lib"])
             if not lib_tool:
                 raise RuntimeError("MSVC lib tool not found")
-            self.executor.execute_command(
-                [lib_tool, "/OUT:" + str(output_file)] + object_files
+            self._run_output_step(
+                output_file,
+                [lib_tool, "/OUT:" + str(output_file)] + object_files,
+                rebuilt,
+                target=name,
             )
         else:
             linker = ConfigurationManager.find_executable(["link"])
             if not linker:
                 raise RuntimeError("MSVC link tool not found")
-            self.executor.execute_command(
-                [linker, "/DLL", "/OUT:" + str(output_file)] + object_files
+            self._run_output_step(
+                output_file,
+                [linker, "/DLL", "/OUT:" + str(output_file)] + object_files + libraries,
+                rebuilt,
+                target=name,
+                inputs=libraries,
             )
 
+        artifact_info = {
+            "path": str(output_file),
+            "type": "static" if static else "shared",
+            "objects": object_files,
+        }
+        self.artifacts.register_artifact(name, artifact_info)
+
         return output_file
 
     def _compile_unix_library(
@@ -163,79 +291,677 @@ class CompilationManager:
         sources: List[str],
         static: bool,
         extra_flags: Optional[List[str]] = None,
+        jobs: Optional[int] = None,
+        pch: Optional[str] = None,
+        link_libraries: Optional[Callable[[], List[str]]] = None,
     ) -> Path:
-        """Compiles library on Unix-like systems."""
-        if static:
-            return self._compile_static_library(name, sources, extra_flags)
-        else:
-            return self._compile_shared_library(name, sources, extra_flags)
-
-    def _compile_static_library(
-        self, name: str, sources: List[str], extra_flags: Optional[List[str]] = None
-    ) -> Path:
-        """Compiles static library."""
-
-        from ..discovery import ConfigurationManager
-
-        obj_dir = self.artifacts.build_directory / (name + "_objects")
-        obj_dir.mkdir(parents=True, exist_ok=True)
-        object_files = []
+        """Compiles library on Unix-like systems.
 
+        Static and shared flavors are built from one pool of position
+        independent objects per library and flag set, so building both
+        compiles every source once.
+        """
+        compiler = self.compilers["cpp_compiler"]
+        compile_flags = self.flags["cpp_flags"] + (extra_flags or [])
+        compile_flags += self.link_strategy.compile_flags(compiler, compile_flags)
+        if not {"-fPIC", "-fpic"} & set(compile_flags) and self.supports(
+            compiler, "fpic"
+        ):
+            compile_flags.append("-fPIC")
+        pool_dir = self._object_pool_directory(name, compiler, compile_flags)
+        header = self._build_pch(name, pool_dir, compiler, compile_flags, pch, True)
+
+        units = []
         for source in sources:
-            source_abs = self.files.project_root / source
-            obj_file = obj_dir / (Path(source).with_suffix(".o").name)
+            obj_file = self._object_path(pool_dir, source, ".o")
 
             command = [
-                self.compilers["cpp_compiler"],
+                compiler,
                 "-c",
-                str(source_abs),
+                self._source_path(source),
                 "-o",
                 str(obj_file),
             ]
-            command += self.flags["cpp_flags"]
-
-            if extra_flags:
-                command += extra_flags
+            command += compile_flags + header.flags
+            command += self._include_flags("-I", source, pch, flags=compile_flags)
+            depfile = self._add_depfile_flags(command, obj_file)
+            units.append(
+                TranslationUnit(
+                    source, obj_file, command, depfile, False, header.inputs
+                )
+            )
 
-            for include_dir in self.include_directories:
-                command += ["-I", str(self.files.project_root / include_dir)]
+        object_files, rebuilt = self._compile_objects(units, jobs, name)
+        libraries = list(link_libraries()) if link_libraries else []
 
-            self.executor.execute_command(command)
-            object_files.append(str(obj_file))
+        if static:
+            output_file = self._compile_static_library(name, object_files, rebuilt)
+        else:
+            output_file = self._compile_shared_library(
+                name, compiler, compile_flags, object_files, rebuilt, libraries
+            )
 
-        archive_file = self.artifacts.build_directory / f"lib{name}.a"
-        archiver = ConfigurationManager.find_executable(["ar", "emar"]) or "ar"
-        self.executor.execute_command(
-            [archiver, "rcs", str(archive_file)] + object_files
+        pool = self.artifacts.register_object_pool(
+            pool_dir, object_files, compile_flags, output_file
         )
-
         artifact_info = {
-            "path": str(archive_file),
-            "type": "static",
+            "path": str(output_file),
+            "type": "static" if static else "shared",
             "objects": object_files,
+            "object_pool": str(pool_dir),
+            "shares_objects_with": [
+                path for path in pool["artifacts"] if path != str(output_file)
+            ],
         }
         self.artifacts.register_artifact(name, artifact_info)
 
+        return output_file
+
+    def _compile_static_library(
+        self, name: str, object_files: List[str], rebuilt: bool
+    ) -> Path:
+        """Archives pooled objects into static library.
+
+        Thin archives (where the link strategy enables them) only reference
+        the pooled objects, so they must stay in place.
+        """
+        archive_file = self.artifacts.build_directory / f"lib{name}.a"
+        archiver = ConfigurationManager.find_executable(["ar", "emar"]) or "ar"
+        operation = self.link_strategy.archive_operation(archiver)
+        self._run_output_step(
+            archive_file,
+            [archiver, operation, str(archive_file)] + object_files,
+            rebuilt,
+            replace=True,
+            target=name,
+        )
         return archive_file
 
     def _compile_shared_library(
-        self, name: str, sources: List[str], extra_flags: Optional[List[str]] = None
+        self,
+        name: str,
+        compiler: str,
+        compile_flags: List[str],
+        object_files: List[str],
+        rebuilt: bool,
+        libraries: Optional[List[str]] = None,
     ) -> Path:
-        """Compiles shared library."""
+        """Links pooled objects (and libraries) into shared library."""
         output_file = self.artifacts.build_directory / f"lib{name}.so"
-        command = [self.compilers["cpp_compiler"], "-shared"]
-        command += self.flags["cpp_flags"]
+        command = [compiler, "-shared"] + compile_flags + object_files
+        command += libraries or []
+        command += ["-o", str(output_file)]
+        command += self.flags["linker_flags"]
+        command += self.link_strategy.link_flags(compiler, command)
+        self._run_output_step(
+            output_file, command, rebuilt, target=name, inputs=libraries or []
+        )
+        return output_file
 
-        if extra_flags:
-            command += extra_flags
+    def _object_pool_directory(
+        self, name: str, compiler: str, compile_flags: List[str]
+    ) -> Path:
+        """Returns directory of library objects built with compiler and flags."""
+        digest = hashlib.sha1("\0".join([compiler] + compile_flags).encode())
+        return (
+            self.artifacts.build_directory
+            / (name + "_objects")
+            / ("pic-" + digest.hexdigest()[:10])
+        )
 
-        for source in sources:
-            command.append(str(self.files.project_root / source))
+    def _include_flags(
+        self, switch: str, *sources: Optional[str], flags: Sequence[str] = ()
+    ) -> List[str]:
+        """Builds include directory flags for compiling sources.
+
+        With an include resolver only the directories sources actually need
+        are passed; otherwise (or when resolution fails) all of them are. So
+        are they when flags add search directories or forced includes of
+        their own, whose headers the resolver cannot follow.
+        """
+        directories = None
+        if self.include_resolver is not None and not any(
+            flag.startswith(SEARCH_PATH_FLAGS) for flag in flags
+        ):
+            directories = self.include_resolver.directories_for(
+                source for source in sources if source
+            )
+        if directories is None:
+            directories = self.include_directories
+
+        paths = self._include_paths
+        flags = []
+        for include_dir in directories:
+            path = paths.get(include_dir)
+            if path is None:
+                path = paths[include_dir] = str(self.files.project_root / include_dir)
+            flags += [switch, path]
+        return flags
+
+    def _start_step(self):
+        """Makes include resolver and compiler probes look at current files.
+
+        Within one build step each compiler is probed once, however many
+        translation units ask about its capabilities.
+        """
+        self._probed = {}
+        if self.include_resolver is not None:
+            self.include_resolver.refresh()
+
+    def _unity_sources(
+        self,
+        obj_dir: Path,
+        sources: List[str],
+        unity: Union[bool, int],
+        exclude: Optional[List[str]],
+    ) -> List[str]:
+        """Returns sources to compile, replacing batched ones by unity batches."""
+        if not unity:
+            return sources
+        batch_size = DEFAULT_BATCH_SIZE if unity is True else int(unity)
+        batches, single = plan_unity_build(
+            sources, batch_size, obj_dir / "unity", exclude
+        )
+        for batch in batches:
+            write_unity_batch(batch, self.files.project_root)
+        return [str(batch.path) for batch in batches] + single
 
-        command += ["-o", str(output_file)]
-        self.executor.execute_command(command)
+    def _build_pch(
+        self,
+        target: str,
+        obj_dir: Path,
+        compiler: str,
+        compile_flags: List[str],
+        header: Optional[str],
+        use_cpp: bool,
+    ) -> PrecompiledHeader:
+        """Precompiles header for GCC or Clang unless it is already current.
+
+        The header is built with the same flags as the target's objects; the
+        returned flags make each translation unit include it, and its path is
+        recorded as an input of every object so they rebuild with it.
+        """
+        if not header or not self._pch_supported(compiler):
+            return PrecompiledHeader([], (), [])
+
+        header_path = self.files.project_root / header
+        clang = self.probe is not None and self.probe.probe(compiler).family == "clang"
+        output = obj_dir / "pch" / (header_path.name + (".pch" if clang else ".gch"))
+        output.parent.mkdir(parents=True, exist_ok=True)
+
+        command = [compiler, "-x", "c++-header" if use_cpp else "c-header"]
+        command += [str(header_path), "-o", str(output)]
+        command += compile_flags
+        command += self._include_flags("-I", header, flags=compile_flags)
+        depfile = self._add_depfile_flags(command, output)
+        unit = TranslationUnit(header, output, command, depfile, cacheable=False)
+        self._compile_objects([unit], 1, target)
+
+        if clang:
+            flags = ["-include-pch", str(output)]
+        else:
+            # GCC picks up <name>.gch when asked to include <name>, and reads
+            # <name> itself when the .gch is unusable. A forwarding header
+            # keeps relative includes of the real one resolving as before.
+            forward = output.with_suffix("")
+            text = f'#include "{header_path}"\n'
+            if not forward.exists() or forward.read_text(encoding="utf-8") != text:
+                forward.write_text(text, encoding="utf-8")
+            flags = ["-Winvalid-pch", "-include", str(forward)]
+        return PrecompiledHeader(flags, (str(output),), [])
+
+    def _build_msvc_pch(
+        self,
+        target: str,
+        obj_dir: Path,
+        compiler: str,
+        extra_flags: List[str],
+        header: Optional[str],
+    ) -> PrecompiledHeader:
+        """Creates MSVC precompiled header with /Yc from a stub source.
+
+        Translation units force-include the header and use the .pch with /Yu;
+        the stub object has to be linked into the output as well.
+        """
+        if not header or not self._pch_supported(compiler):
+            return PrecompiledHeader([], (), [])
+
+        header_path = str(self.files.project_root / header)
+        pch_dir = obj_dir / "pch"
+        pch_dir.mkdir(parents=True, exist_ok=True)
+        stub = pch_dir / (Path(header).stem + "_pch.cpp")
+        stub_text = f'#include "{header_path}"\n'
+        if not stub.exists() or stub.read_text(encoding="utf-8") != stub_text:
+            stub.write_text(stub_text, encoding="utf-8")
+        pch_file = pch_dir / (Path(header).name + ".pch")
+        stub_obj = stub.with_suffix(".obj")
+
+        command = [
+            compiler,
+            "/c",
+            str(stub),
+            "/Fo" + str(stub_obj),
+            "/Yc" + header_path,
+            "/Fp" + str(pch_file),
+            "/showIncludes",
+        ]
+        command += self._include_flags("/I", header, flags=extra_flags)
+        command += extra_flags
+        unit = TranslationUnit(str(stub), stub_obj, command, None, True, (), False)
+        self._compile_objects([unit], 1, target)
+
+        flags = ["/Yu" + header_path, "/Fp" + str(pch_file), "/FI" + header_path]
+        return PrecompiledHeader(flags, (str(pch_file),), [str(stub_obj)])
+
+    def _pch_supported(self, compiler: str) -> bool:
+        """Checks precompiled header support, reporting when it is missing."""
+        if self.supports(compiler, "pch"):
+            return True
+        self.executor.console.line(
+            "[build] precompiled headers not supported by", compiler, "- skipping"
+        )
+        return False
+
+    def supports(self, compiler: str, capability: str, default: bool = True) -> bool:
+        """Checks compiler capability through the probe cache."""
+        if self.probe is None:
+            return default
+        info = self._probed.get(compiler)
+        if info is None:
+            info = self._probed[compiler] = self.probe.probe(compiler)
+        return info.supports(capability)
+
+    def _add_depfile_flags(self, command: List[str], obj_file: Path) -> Optional[Path]:
+        """Appends depfile flags when the compiler supports them."""
+        if not self.supports(command[0], "mmd"):
+            return None
+        depfile = obj_file.with_suffix(".d")
+        command += ["-MMD", "-MF", str(depfile)]
+        return depfile
+
+    def _source_path(self, source: str) -> str:
+        """Returns absolute path of source, skipping pathlib in per-unit loops."""
+        return os.path.join(str(self.files.project_root), source)
+
+    @staticmethod
+    def _object_path(obj_dir: Path, source: str, suffix: str) -> Path:
+        """Maps source file to its object file inside object directory."""
+        if os.path.isabs(source) or ".." in source.replace("\\", "/").split("/"):
+            source_path = Path(source)
+            digest = hashlib.sha1(str(source_path.parent).encode()).hexdigest()[:8]
+            return obj_dir / f"{source_path.stem}-{digest}{suffix}"
+        # Path() drops "." components and repeated separators like the join did.
+        return Path(f"{obj_dir}{os.sep}{os.path.splitext(source)[0]}{suffix}")
+
+    def _compile_objects(
+        self,
+        units: List[TranslationUnit],
+        jobs: Optional[int] = None,
+        target: str = "",
+    ) -> Tuple[List[str], bool]:
+        """Compiles out-of-date translation units on a bounded worker pool.
+
+        Units that took longest last time are started first. Compiler output
+        is reported in source order once all units finish, and every failing
+        unit is collected into a single CompilationError. Returns object paths
+        in source order and whether any object was rebuilt.
+        """
+        state = self.artifacts.build_state
+        state.refresh()
+        stale = [
+            unit
+            for unit in units
+            if not state.is_object_current(
+                unit.object_file,
+                self._source_path(unit.source),
+                unit.command,
+                unit.command[0],
+            )
+        ]
 
-        artifact_info = {"path": str(output_file), "type": "shared"}
-        self.artifacts.register_artifact(name, artifact_info)
+        for unit in stale:
+            unit.object_file.parent.mkdir(parents=True, exist_ok=True)
 
-        return output_file
+        longest_first = sorted(
+            range(len(stale)),
+            key=lambda index: -(state.duration(str(stale[index].object_file)) or 0.0),
+        )
+        workers = max(1, min(jobs or os.cpu_count() or 1, len(stale) or 1))
+        outcomes: List[Optional[UnitOutcome]] = [None] * len(stale)
+        error: Optional[BaseException] = None
+        try:
+            with self.executor.cancel_scope(), ThreadPoolExecutor(
+                max_workers=workers
+            ) as pool:
+                futures = {
+                    pool.submit(self._build_unit, stale[index], target): index
+                    for index in longest_first
+                }
+                for future in as_completed(futures):
+                    try:
+                        outcome = future.result()
+                    except BuildCancelled:
+                        continue
+                    except Exception as unit_error:
+                        error = error or unit_error
+                    else:
+                        outcomes[futures[future]] = outcome
+                        if outcome.result.returncode == 0:
+                            continue
+                    if not self.executor.keep_going:
+                        self.executor.cancel()
+        finally:
+            # Failed, cancelled or interrupted units may leave partial objects.
+            for unit, outcome in zip(stale, outcomes):
+                if outcome is None or outcome.result.returncode != 0:
+                    state.forget_object(unit.object_file)
+                    self._remove_outputs(
+                        unit.object_file, unit.object_file.with_suffix(".dwo")
+                    )
+        if error is not None:
+            state.save()
+            raise error
+
+        console = self.executor.console
+        failures = []
+        cancelled = 0
+        for unit, outcome in zip(stale, outcomes):
+            if outcome is None:
+                cancelled += 1
+                continue
+            if outcome.cached:
+                console.line("[build] cache hit:", unit.source)
+            else:
+                console.line("[build] executing:", " ".join(unit.command))
+            if outcome.stdout:
+                console.write(outcome.stdout)
+            if outcome.result.stderr:
+                console.write(outcome.result.stderr.decode(errors="replace"), True)
+            if getattr(outcome.result, "truncated", False):
+                console.line(
+                    "[build] output truncated, full log:", str(outcome.result.log_path)
+                )
+
+            if outcome.result.returncode != 0:
+                failures.append((unit.source, outcome.result))
+                continue
+
+            state.record_object(
+                unit.object_file,
+                self._source_path(unit.source),
+                unit.command,
+                unit.command[0],
+                outcome.dependencies,
+            )
+            if not outcome.cached:
+                state.record_duration(str(unit.object_file), outcome.duration)
+
+        if target:
+            state.record_duration(
+                "target:" + target,
+                sum(state.duration(str(unit.object_file)) or 0.0 for unit in units),
+            )
+        console.flush()
+        state.save()
+        if self.include_resolver is not None:
+            self.include_resolver.save()
+        if self.object_cache is not None:
+            self.object_cache.cleanup()
+
+        if failures:
+            raise CompilationError(failures)
+        if cancelled:
+            raise BuildCancelled(f"Build cancelled; {cancelled} unit(s) not compiled")
+
+        return [str(unit.object_file) for unit in units], bool(stale)
+
+    def _build_unit(self, unit: TranslationUnit, target: str = "") -> UnitOutcome:
+        """Produces object of one unit from the object cache or the compiler."""
+        state = self.artifacts.build_state
+        weight = state.duration(str(unit.object_file)) or 0.0
+        with self._job_slot(target, weight), tracer.span(
+            unit.source, "compile", target=target
+        ) as span:
+            start = time.perf_counter()
+            outcome = self._produce_object(unit)
+            outcome = outcome._replace(duration=time.perf_counter() - start)
+            result = outcome.result
+            span.update(
+                exit_code=result.returncode,
+                cached=outcome.cached,
+                cpu_time=getattr(result, "cpu_time", None),
+                max_rss_kb=getattr(result, "max_rss_kb", None),
+            )
+        return outcome
+
+    def _produce_object(self, unit: TranslationUnit) -> UnitOutcome:
+        """Restores unit's object from the cache or runs the compiler.
+
+        With a remote executor the unit is compiled on a worker when one is
+        free, and locally otherwise.
+        """
+        cache_key = None
+        # Split DWARF objects come with .dwo files the cache does not keep.
+        if (
+            self.object_cache is not None
+            and unit.cacheable
+            and "-gsplit-dwarf" not in unit.command
+        ):
+            cached, cache_key = self._fetch_cached_object(unit)
+            if cached is not None:
+                return cached
+
+        dependencies: List[str] = []
+
+        def collect_include(stream: str, line: bytes) -> bool:
+            header = show_includes_dependency(line.decode(errors="replace"))
+            if stream == "stdout" and header is not None:
+                dependencies.append(header)
+                return False
+            return True
+
+        result = None
+        if self.remote_executor is not None and not unit.show_includes:
+            result = self.remote_executor.compile(
+                unit.command, unit.object_file, self.executor
+            )
+        if result is None:
+            result = self.executor.execute_command(
+                with_response_file(
+                    unit.command,
+                    unit.object_file.with_suffix(".rsp"),
+                    self.command_line_limit,
+                ),
+                check_success=False,
+                capture_output=True,
+                echo=False,
+                on_line=collect_include if unit.show_includes else None,
+                output_limit=self.executor.output_limit,
+                log_path=unit.object_file.with_suffix(".log"),
+            )
+        stdout = (result.stdout or b"").decode(errors="replace")
+        if unit.show_includes:
+            dependencies = self._filter_system_headers(dependencies)
+        elif unit.depfile is not None and result.returncode == 0:
+            dependencies = self._read_depfile(unit.depfile)
+        dependencies += [
+            path for path in unit.implicit_inputs if path not in dependencies
+        ]
+
+        if result.returncode == 0 and cache_key is not None:
+            self._store_cached_object(unit, cache_key, dependencies)
+
+        return UnitOutcome(result, stdout, dependencies, False)
+
+    def _fetch_cached_object(
+        self, unit: TranslationUnit
+    ) -> Tuple[Optional[UnitOutcome], Optional[str]]:
+        """Looks unit up in the object cache; returns outcome on hit and key to store."""
+        cache = self.object_cache
+        root = self.files.project_root
+        state = self.artifacts.build_state
+        flags = cache.normalize_command(unit.command, root)
+        compiler_id = state.compiler_identity(unit.command[0])
+
+        if cache.mode == "preprocessor" and not unit.show_includes:
+            preprocessed = self.executor.execute_command(
+                with_response_file(
+                    self._preprocess_command(unit.command),
+                    unit.object_file.with_suffix(".i.rsp"),
+                    self.command_line_limit,
+                ),
+                check_success=False,
+                capture_output=True,
+                echo=False,
+            )
+            if preprocessed.returncode != 0:
+                return None, None
+            output = preprocessed.stdout or b""
+            key = cache.key(
+                "preprocessor",
+                compiler_id,
+                flags,
+                cache.normalize_preprocessed(output, root),
+            )
+            if cache.fetch(key, unit.object_file):
+                dependencies = cache.preprocessed_dependencies(output)
+                return self._cache_hit(unit, dependencies), key
+            return None, key
+
+        source_hash = state.file_hash(str(root / unit.source))
+        if source_hash is None:
+            return None, None
+        key = cache.key("direct", compiler_id, flags, source_hash)
+        found = cache.lookup(key, state.file_hash, root)
+        if found is not None and cache.fetch(found[0], unit.object_file):
+            return self._cache_hit(unit, found[1]), key
+        return None, key
+
+    def _store_cached_object(
+        self, unit: TranslationUnit, key: str, dependencies: List[str]
+    ):
+        """Inserts freshly compiled object into the object cache."""
+        cache = self.object_cache
+        if cache.mode == "preprocessor" and not unit.show_includes:
+            cache.store(key, unit.object_file)
+        else:
+            state = self.artifacts.build_state
+            cache.store_direct(
+                key,
+                [str(self.files.project_root / unit.source)] + dependencies,
+                state.file_hash,
+                self.files.project_root,
+                unit.object_file,
+            )
+
+    @staticmethod
+    def _cache_hit(unit: TranslationUnit, dependencies: List[str]) -> UnitOutcome:
+        """Builds successful outcome for object restored from cache."""
+        result = subprocess.CompletedProcess(unit.command, 0, b"", b"")
+        dependencies += [
+            path for path in unit.implicit_inputs if path not in dependencies
+        ]
+        return UnitOutcome(result, "", dependencies, True)
+
+    @staticmethod
+    def _preprocess_command(command: List[str]) -> List[str]:
+        """Turns compile command into one writing preprocessed source to stdout."""
+        preprocess = [command[0], "-E"]
+        skip_next = False
+        for argument in command[1:]:
+            if skip_next:
+                skip_next = False
+            elif argument in ("-o", "-MF"):
+                skip_next = True
+            elif argument not in ("-c", "-MMD"):
+                preprocess.append(argument)
+        return preprocess
+
+    def _read_depfile(self, depfile: Path) -> List[str]:
+        """Reads header dependencies written by the compiler."""
+        try:
+            text = depfile.read_text(encoding="utf-8", errors="replace")
+        except OSError:
+            return []
+        return [
+            os.path.normpath(os.path.join(str(self.files.project_root), path))
+            for path in parse_make_depfile(text)
+        ]
+
+    @staticmethod
+    def _filter_system_headers(dependencies: List[str]) -> List[str]:
+        """Drops headers from MSVC system include directories, mirroring -MMD."""
+        system_dirs = [
+            os.path.normcase(os.path.normpath(path))
+            for path in os.environ.get("INCLUDE", "").split(os.pathsep)
+            if path
+        ]
+        return [
+            os.path.normpath(path)
+            for path in dependencies
+            if not any(
+                os.path.normcase(path).startswith(system_dir + os.sep)
+                for system_dir in system_dirs
+            )
+        ]
+
+    def _run_output_step(
+        self,
+        output_file: Path,
+        command: List[str],
+        inputs_changed: bool,
+        replace: bool = False,
+        target: str = "",
+        inputs: List[str] = (),
+    ):
+        """Runs link or archive command unless its output is already current.
+
+        inputs are extra files (linked libraries) whose changes force a relink.
+        """
+        state = self.artifacts.build_state
+        state.refresh(inputs)
+        if not inputs_changed and state.is_output_current(output_file, command, inputs):
+            return
+
+        if replace and output_file.exists():
+            output_file.unlink()
+
+        with self._job_slot(target, float("inf")):
+            with tracer.span(output_file.name, "link", target=target):
+                start = time.perf_counter()
+                try:
+                    self.executor.execute_command(
+                        with_response_file(
+                            command,
+                            output_file.with_name(output_file.name + ".rsp"),
+                            self.command_line_limit,
+                        )
+                    )
+                except BaseException:
+                    # A partial archive or binary must not pass as current later.
+                    self._remove_outputs(output_file)
+                    raise
+                state.record_duration(
+                    "link:" + target if target else str(output_file),
+                    time.perf_counter() - start,
+                )
+        state.record_output(output_file, command, inputs)
+        state.save()
+
+    @staticmethod
+    def _remove_outputs(*paths: Path):
+        """Deletes possibly partial outputs of a failed or cancelled step."""
+        for path in paths:
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+    def _job_slot(self, target: str, weight: float):
+        """Waits for a scheduler job slot, favoring targets on the critical path.
+
+        Within a target, higher weight (expected duration) goes first.
+        """
+        if self.job_slots is None:
+            return nullcontext()
+        return self.job_slots.acquire((self.target_priorities.get(target, 0.0), weight))
@@ -0,0 +1,63 @@
+import os
+from typing import List, Optional
+
+SHOW_INCLUDES_PREFIX = "Note: including file:"
+
+
+def parse_make_depfile(text: str) -> List[str]:
+    """Parses Makefile-style depfile emitted by -MMD and returns prerequisites."""
+    text = text.replace("\\\r\n", " ").replace("\\\n", " ")
+    dependencies: List[str] = []
+    for rule in text.splitlines():
+        colon = _find_rule_colon(rule)
+        if colon < 0:
+            continue
+        dependencies.extend(_split_escaped(rule[colon + 1 :]))
+    return dependencies
+
+
+def show_includes_dependency(line: str) -> Optional[str]:
+    """Returns header named by a single /showIncludes note line, if it is one."""
+    if line.startswith(SHOW_INCLUDES_PREFIX):
+        return line[len(SHOW_INCLUDES_PREFIX) :].strip()
+    return None
+
+
+def _find_rule_colon(rule: str) -> int:
+    """Finds target separator, skipping drive letters such as C:\\."""
+    start = 0
+    while True:
+        colon = rule.find(":", start)
+        if colon < 0:
+            return -1
+        if colon + 1 < len(rule) and rule[colon + 1] in "\\/":
+            start = colon + 1
+            continue
+        return colon
+
+
+def _split_escaped(text: str) -> List[str]:
+    """Splits whitespace separated paths honoring Make escapes."""
+    paths: List[str] = []
+    current: List[str] = []
+    index = 0
+    while index < len(text):
+        char = text[index]
+        if char == "\\" and index + 1 < len(text) and text[index + 1] in " #":
+            current.append(text[index + 1])
+            index += 2
+            continue
+        if char == "$" and text[index + 1 : index + 2] == "$":
+            current.append("$")
+            index += 2
+            continue
+        if char.isspace():
+            if current:
+                paths.append("".join(current))
+                current = []
+        else:
+            current.append(char)
+        index += 1
+    if current:
+        paths.append("".join(current))
+    return [os.path.normpath(path) for path in paths]
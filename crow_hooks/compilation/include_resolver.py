@@ -0,0 +1,275 @@
+import marshal
+import os
+import re
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Any, Iterable, List, Optional, Set, Tuple
+
+# Scans of files modified this recently are not persisted, since a later edit
+# within the same timestamp tick would go unnoticed.
+RACY_WINDOW_NS = 2_000_000_000
+
+INCLUDE_DIRECTIVE = re.compile(
+    rb"^[ \t]*#[ \t]*(include_next|include|import)\b[ \t]*(.*)$", re.MULTILINE
+)
+
+# Directive whose target cannot be determined statically.
+UNRESOLVED = (2, "")
+
+# Compiler flags adding include search directories or forced includes; the
+# resolver only searches the project's include directories.
+SEARCH_PATH_FLAGS = (
+    "-I",
+    "-isystem",
+    "-iquote",
+    "-idirafter",
+    "-include",
+    "-imacros",
+    "/I",
+    "/FI",
+)
+
+
+class IncludeResolver:
+    """Class for computing the include directories translation units need.
+
+    Sources and project headers are scanned for #include directives and each
+    include is resolved the way the compiler would: quoted includes next to
+    the including file first, then the first include directory containing
+    it. Keeping only the directories that resolved something, in their
+    original order, makes every include resolve to the same file as with the
+    full list. Includes that are not found (system headers) are skipped;
+    computed includes and #include_next make the unit keep the full list.
+
+    Directive scans are persisted in the build directory and reused while
+    the file's stat signature is unchanged. Within one build step, files and
+    directories are only inspected once (directories are listed rather than
+    stat'ing every candidate) until refresh() is called.
+    """
+
+    SCAN_FILE = ".crow_include_scan.bin"
+    VERSION = 1
+
+    def __init__(
+        self, project_root: Path, include_dirs: List[str], build_directory: Path
+    ):
+        self.project_root = project_root
+        self.include_directories = list(include_dirs)
+        self.directories = [
+            os.path.normpath(os.path.join(str(project_root), directory))
+            for directory in include_dirs
+        ]
+        self.path = build_directory / self.SCAN_FILE
+        self._scans: Optional[Dict[str, Any]] = None
+        self._dirty = False
+        self._checked: Dict[str, Optional[List[Tuple[int, str]]]] = {}
+        self._includes_of: Dict[str, Optional[List[Tuple[int, str]]]] = {}
+        self._entries: Optional[Dict[str, List[int]]] = None
+        self._lookups: Dict[str, Optional[Tuple[int, str]]] = {}
+        self._local: Dict[Tuple[str, str], Optional[str]] = {}
+        self._files_in: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    def directories_for(self, sources: Iterable[str]) -> Optional[List[str]]:
+        """Returns include directories needed to compile sources, in original order.
+
+        Returns None when some include cannot be resolved statically.
+        """
+        needed = set()
+        seen = set()
+        pending = [
+            os.path.normpath(os.path.join(str(self.project_root), source))
+            for source in sources
+        ]
+        while pending:
+            path = pending.pop()
+            if path in seen:
+                continue
+            seen.add(path)
+            includes = self._includes(path)
+            if includes is None:
+                return None
+            for index, header in includes:
+                if index >= 0:
+                    needed.add(index)
+                pending.append(header)
+        return [self.include_directories[index] for index in sorted(needed)]
+
+    def refresh(self):
+        """Forgets files and directories inspected since the last refresh."""
+        self._checked = {}
+        self._includes_of = {}
+        self._entries = None
+        self._lookups = {}
+        self._local = {}
+        self._files_in = {}
+
+    def scan(self, path: str) -> Optional[List[Tuple[int, str]]]:
+        """Returns (kind, name) of file's includes; kind 1 is quoted, 0 angled."""
+        checked = self._checked
+        if path in checked:
+            return checked[path]
+        directives = checked[path] = self._scan(path)
+        return directives
+
+    def _includes(self, path: str) -> Optional[List[Tuple[int, str]]]:
+        """Returns (directory index, file) of file's resolvable includes.
+
+        Returns None when an include cannot be resolved statically. Results
+        are shared by every unit including the file until refresh().
+        """
+        includes_of = self._includes_of
+        if path in includes_of:
+            return includes_of[path]
+        includes: Optional[List[Tuple[int, str]]] = []
+        directory = os.path.dirname(path)
+        for kind, name in self.scan(path) or ():
+            if kind == UNRESOLVED[0]:
+                includes = None
+                break
+            found = self._resolve(directory, kind == 1, name)
+            if found is not None:
+                includes.append(found)
+        includes_of[path] = includes
+        return includes
+
+    def _scan(self, path: str) -> Optional[List[Tuple[int, str]]]:
+        """Scans file unless its persisted scan is still current."""
+        with self._lock:
+            if self._scans is None:
+                self.load()
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        signature = [stat.st_mtime_ns, stat.st_size, stat.st_ino]
+        entry = self._scans.get(path)
+        if entry is not None and entry[0] == signature:
+            return entry[1]
+
+        try:
+            with open(path, "rb") as handle:
+                text = handle.read()
+        except OSError:
+            return None
+        directives = [
+            _parse_directive(*match) for match in INCLUDE_DIRECTIVE.findall(text)
+        ]
+        if time.time_ns() - stat.st_mtime_ns >= RACY_WINDOW_NS:
+            with self._lock:
+                self._scans[path] = (signature, directives)
+                self._dirty = True
+        return directives
+
+    def load(self):
+        """Loads persisted scans from disk."""
+        scans: Dict[str, Any] = {}
+        try:
+            data = marshal.loads(self.path.read_bytes())
+            if data.get("version") == self._version_tag():
+                scans = data.get("files", {})
+        except (OSError, ValueError, EOFError, TypeError, AttributeError):
+            pass
+        self._scans = scans
+        self._dirty = False
+
+    def save(self):
+        """Atomically writes scans to disk if anything changed."""
+        with self._lock:
+            if not self._dirty or self._scans is None:
+                return
+            data = {"version": self._version_tag(), "files": self._scans}
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                temp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+                temp_path.write_bytes(marshal.dumps(data, 4))
+                os.replace(temp_path, self.path)
+            except OSError:
+                return
+            self._dirty = False
+
+    def _resolve(
+        self, directory: str, quoted: bool, name: str
+    ) -> Optional[Tuple[int, str]]:
+        """Returns index of include directory (-1 for local) and resolved file.
+
+        directory is the one holding the including file.
+        """
+        if quoted:
+            key = (directory, name)
+            local = self._local.get(key, "")
+            if local == "":
+                local = self._local[key] = self._find(directory, name)
+            if local is not None:
+                return -1, local
+
+        if name in self._lookups:
+            return self._lookups[name]
+        found = None
+        first = name.replace("\\", "/").split("/", 1)[0]
+        for index in self._directory_entries().get(first, ()):
+            candidate = self._find(self.directories[index], name)
+            if candidate is not None:
+                found = (index, candidate)
+                break
+        self._lookups[name] = found
+        return found
+
+    def _find(self, directory: str, name: str) -> Optional[str]:
+        """Returns normalized path of file name in directory, if it exists.
+
+        Each directory is listed once instead of stat'ing every candidate.
+        """
+        if "/" in name or "\\" in name or name in (".", ".."):
+            directory, name = os.path.split(
+                os.path.normpath(os.path.join(directory, name))
+            )
+        files = self._files_in.get(directory)
+        if files is None:
+            try:
+                with os.scandir(directory) as entries:
+                    files = {entry.name for entry in entries if entry.is_file()}
+            except OSError:
+                files = set()
+            self._files_in[directory] = files
+        return os.path.join(directory, name) if name in files else None
+
+    def _directory_entries(self) -> Dict[str, List[int]]:
+        """Maps names of entries of include directories to directory indices."""
+        entries = self._entries
+        if entries is None:
+            entries = {}
+            for index, directory in enumerate(self.directories):
+                try:
+                    names = os.listdir(directory)
+                except OSError:
+                    continue
+                for entry in names:
+                    entries.setdefault(entry, []).append(index)
+            self._entries = entries
+        return entries
+
+    @classmethod
+    def _version_tag(cls) -> str:
+        """Returns format tag; marshal output is only portable within one Python."""
+        return f"{cls.VERSION}:{sys.version_info[0]}.{sys.version_info[1]}"
+
+
+def _parse_directive(keyword: bytes, rest: bytes) -> Tuple[int, str]:
+    """Classifies include directive as quoted (1), angled (0) or unresolved."""
+    if keyword == b"include_next":
+        return UNRESOLVED
+    rest = rest.strip()
+    if rest[:1] == b'"':
+        end = rest.find(b'"', 1)
+        kind = 1
+    elif rest[:1] == b"<":
+        end = rest.find(b">", 1)
+        kind = 0
+    else:
+        return UNRESOLVED
+    if end <= 1:
+        return UNRESOLVED
+    return kind, rest[1:end].decode("utf-8", "surrogateescape")
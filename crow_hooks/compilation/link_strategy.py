@@ -0,0 +1,95 @@
+from typing import Dict, Any, List, Optional
+from ..discovery import CompilerProbe
+
+LINKERS = ("default", "auto", "mold", "lld", "gold")
+
+# Linkers tried by "auto", fastest first. gold is only used when requested.
+AUTO_LINKERS = ("mold", "lld")
+
+# Flags that turn debug information off again.
+NO_DEBUG_FLAGS = ("-g0", "-gno-split-dwarf")
+
+
+class LinkStrategy:
+    """Class for choosing the linker, archive format and debug info layout.
+
+    Every option is applied only where the compiler probe confirms support:
+    a faster linker through -fuse-ld, thin archives (which reference pooled
+    objects instead of copying them) and split DWARF (which keeps debug
+    info in .dwo files the linker never reads). The compiler's own linker
+    is kept unless another one is asked for. Configured in crow.toml:
+
+        [link]
+        linker = "default"     # default, auto (opt-in), mold, lld or gold
+        thin_archives = true
+        split_dwarf = true     # only affects builds with -g
+    """
+
+    def __init__(
+        self,
+        linker: str = "default",
+        thin_archives: bool = False,
+        split_dwarf: bool = False,
+        probe: Optional[CompilerProbe] = None,
+    ):
+        if linker not in LINKERS:
+            raise ValueError(
+                f"Unknown linker {linker!r}; expected one of {', '.join(LINKERS)}"
+            )
+        self.linker = linker
+        self.thin_archives = thin_archives
+        self.split_dwarf = split_dwarf
+        self.probe = probe
+        self._linkers: Dict[str, Optional[str]] = {}
+        self._thin: Dict[str, bool] = {}
+
+    @classmethod
+    def from_config(
+        cls, config: Dict[str, Any], probe: Optional[CompilerProbe] = None
+    ) -> "LinkStrategy":
+        """Creates strategy from the [link] table of crow.toml."""
+        link_config = config.get("link", {})
+        return cls(
+            link_config.get("linker", "default"),
+            bool(link_config.get("thin_archives", False)),
+            bool(link_config.get("split_dwarf", False)),
+            probe,
+        )
+
+    def linker_for(self, compiler: str) -> Optional[str]:
+        """Returns linker to request from compiler, or None for its default."""
+        if self.linker == "default" or self.probe is None:
+            return None
+        if compiler not in self._linkers:
+            candidates = AUTO_LINKERS if self.linker == "auto" else (self.linker,)
+            info = self.probe.probe(compiler)
+            self._linkers[compiler] = next(
+                (name for name in candidates if info.supports("fuse_ld_" + name)), None
+            )
+        return self._linkers[compiler]
+
+    def link_flags(self, compiler: str, flags: List[str]) -> List[str]:
+        """Returns flags selecting the linker unless flags already choose one."""
+        if any(flag.startswith("-fuse-ld=") for flag in flags):
+            return []
+        linker = self.linker_for(compiler)
+        return ["-fuse-ld=" + linker] if linker else []
+
+    def compile_flags(self, compiler: str, flags: List[str]) -> List[str]:
+        """Returns extra compile flags, i.e. split DWARF for debug builds."""
+        if not self.split_dwarf or self.probe is None:
+            return []
+        debug = [flag for flag in flags if flag.startswith("-g")]
+        if not debug or debug[-1] in NO_DEBUG_FLAGS or "-gsplit-dwarf" in debug:
+            return []
+        if not self.probe.probe(compiler).supports("split_dwarf"):
+            return []
+        return ["-gsplit-dwarf"]
+
+    def archive_operation(self, archiver: str) -> str:
+        """Returns ar operation, producing thin archives where supported."""
+        if not self.thin_archives or self.probe is None:
+            return "rcs"
+        if archiver not in self._thin:
+            self._thin[archiver] = self.probe.supports_thin_archives(archiver)
+        return "rcsT" if self._thin[archiver] else "rcs"
@@ -0,0 +1,374 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import uuid
+from pathlib import Path
+from typing import Callable, Dict, Any, List, Optional, Tuple
+
+DEFAULT_MAX_SIZE = 5 * 1024**3
+SIZE_UNITS = {"": 1, "K": 1024, "M": 1024**2, "G": 1024**3, "T": 1024**4}
+
+# Arguments naming per-workspace outputs; they do not influence object contents.
+OUTPUT_FLAGS = {"-o", "-MF", "-MT", "-MQ"}
+OUTPUT_FLAGS_NO_VALUE = {"-MMD", "-MD", "/showIncludes"}
+OUTPUT_FLAG_PREFIXES = ("/Fo", "/Fd")
+
+LINE_MARKER = re.compile(rb'^#(?:line)? \d+ "((?:[^"\\]|\\.)*)"', re.MULTILINE)
+
+
+def parse_size(value: Any) -> int:
+    """Parses size such as 500M or 5G into bytes."""
+    if isinstance(value, int):
+        return value
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([KMGT]?)i?B?\s*", str(value).upper())
+    if not match:
+        raise ValueError(f"Invalid cache size: {value!r}")
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2)])
+
+
+class ObjectCache:
+    """Class for content-addressed caching of compiled objects.
+
+    The cache directory may be shared by several workspaces and processes.
+    Entries are written to a unique temporary file and renamed into place, so
+    concurrent writers never expose partial objects; object and manifest
+    mtimes serve as the LRU clock for eviction. The total size is kept in a
+    size file updated as entries are stored, so the cache directory is only
+    scanned when that total crosses the limit (or the file is missing).
+
+    In direct mode an object is found through a manifest keyed by the compiler
+    identity, normalized flags and source hash, listing the header hashes seen
+    for each variant. In preprocessor mode the key is the hash of the
+    preprocessed source instead.
+    """
+
+    MODES = ("direct", "preprocessor")
+    STATS_FILE = "stats.json"
+    SIZE_FILE = "size.json"
+
+    def __init__(
+        self,
+        directory: Path,
+        max_size: int = DEFAULT_MAX_SIZE,
+        mode: str = "direct",
+    ):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown object cache mode: {mode!r}")
+        self.directory = directory
+        self.max_size = max_size
+        self.mode = mode
+        self.stats: Dict[str, int] = {
+            "hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+        }
+        self._flushed: Dict[str, int] = dict.fromkeys(self.stats, 0)
+        self._stored_bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(*parts: Any) -> str:
+        """Hashes key components into a cache key."""
+        digest = hashlib.blake2b(digest_size=20)
+        for part in parts:
+            data = part if isinstance(part, bytes) else json.dumps(part).encode()
+            digest.update(len(data).to_bytes(8, "little"))
+            digest.update(data)
+        return digest.hexdigest()
+
+    @staticmethod
+    def normalize_command(command: List[str], project_root: Path) -> List[str]:
+        """Drops output paths and makes workspace paths relative in compiler flags."""
+        root = str(project_root).rstrip(os.sep) + os.sep
+        normalized: List[str] = []
+        skip_next = False
+        for argument in command[1:]:
+            if skip_next:
+                skip_next = False
+                continue
+            if argument in OUTPUT_FLAGS:
+                skip_next = True
+                continue
+            if argument in OUTPUT_FLAGS_NO_VALUE:
+                continue
+            if argument.startswith(OUTPUT_FLAG_PREFIXES):
+                continue
+            normalized.append(argument.replace(root, "<root>" + os.sep))
+        return normalized
+
+    @staticmethod
+    def normalize_preprocessed(output: bytes, project_root: Path) -> bytes:
+        """Strips workspace location from preprocessor line markers."""
+        root = str(project_root).rstrip(os.sep) + os.sep
+        return output.replace(root.encode(), b"<root>" + os.sep.encode())
+
+    @staticmethod
+    def preprocessed_dependencies(output: bytes) -> List[str]:
+        """Extracts files named by preprocessor line markers."""
+        seen: Dict[str, None] = {}
+        for match in LINE_MARKER.finditer(output):
+            path = match.group(1).decode(errors="replace").replace("\\\\", "\\")
+            if not path.startswith("<"):
+                seen.setdefault(os.path.normpath(path), None)
+        return list(seen)
+
+    def lookup(
+        self,
+        direct_key: str,
+        file_hash: Callable[[str], Optional[str]],
+        project_root: Path,
+    ) -> Optional[Tuple[str, List[str]]]:
+        """Finds object key whose recorded dependencies still match (direct mode)."""
+        manifest = self._read_manifest(direct_key)
+        for entry in reversed(manifest):
+            dependencies = [
+                self._absolute(path, project_root) for path in entry["dependencies"]
+            ]
+            if all(
+                file_hash(path) == recorded
+                for path, recorded in zip(dependencies, entry["dependencies"].values())
+            ):
+                _touch(self._manifest_path(direct_key))
+                return entry["object"], dependencies
+        self._count("misses")
+        return None
+
+    def fetch(self, object_key: str, destination: Path) -> bool:
+        """Copies cached object to destination, returning False on miss."""
+        cached = self._object_path(object_key)
+        temp_path = self._temp_path(destination)
+        try:
+            shutil.copyfile(cached, temp_path)
+            os.replace(temp_path, destination)
+            os.utime(cached)
+        except OSError:
+            _remove_quietly(temp_path)
+            self._count("misses")
+            return False
+        self._count("hits")
+        return True
+
+    def store(self, object_key: str, object_file: Path):
+        """Atomically inserts object under key."""
+        target = self._object_path(object_key)
+        temp_path = self._temp_path(target)
+        try:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(object_file, temp_path)
+            os.replace(temp_path, target)
+            size = target.stat().st_size
+        except OSError:
+            _remove_quietly(temp_path)
+            return
+        with self._lock:
+            self.stats["stores"] += 1
+            self._stored_bytes += size
+
+    def store_direct(
+        self,
+        direct_key: str,
+        dependencies: List[str],
+        file_hash: Callable[[str], Optional[str]],
+        project_root: Path,
+        object_file: Path,
+    ):
+        """Inserts object and records its dependency hashes in the manifest."""
+        recorded = {
+            self._relative(path, project_root): file_hash(path) for path in dependencies
+        }
+        if any(value is None for value in recorded.values()):
+            return
+        object_key = self.key(direct_key, sorted(recorded.items()))
+        self.store(object_key, object_file)
+
+        manifest_path = self._manifest_path(direct_key)
+        manifest = [
+            entry
+            for entry in self._read_manifest(direct_key)
+            if entry["object"] != object_key
+        ]
+        manifest.append({"object": object_key, "dependencies": recorded})
+        previous_size = _size_of(manifest_path)
+        self._write_json(manifest_path, manifest[-16:])
+        with self._lock:
+            self._stored_bytes += _size_of(manifest_path) - previous_size
+
+    def cleanup(self):
+        """Evicts least recently used entries once the cache exceeds its size limit.
+
+        Only the size file is read and updated unless the limit is crossed.
+        Concurrent processes may lose each other's updates; every eviction
+        scan writes the actual size again.
+        """
+        with self._lock:
+            stored_bytes, self._stored_bytes = self._stored_bytes, 0
+        if stored_bytes:
+            total = self._read_size()
+            if total is None or total + stored_bytes > self.max_size:
+                self._evict()
+            else:
+                self._write_json(
+                    self.directory / self.SIZE_FILE, {"bytes": total + stored_bytes}
+                )
+        self._flush_stats()
+
+    def _read_size(self) -> Optional[int]:
+        """Returns total size recorded in the size file, if there is one."""
+        try:
+            data = json.loads((self.directory / self.SIZE_FILE).read_text("utf-8"))
+            return int(data["bytes"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def _evict(self):
+        """Removes oldest entries until the cache is below 90% of its size limit.
+
+        Objects and manifests are both counted and evicted; the resulting size
+        is written to the size file.
+        """
+        entries = []
+        total = 0
+        for kind in ("objects", "manifests"):
+            try:
+                shards = list(os.scandir(self.directory / kind))
+            except OSError:
+                continue
+            for shard in shards:
+                if not shard.is_dir():
+                    continue
+                for entry in os.scandir(shard.path):
+                    if entry.name.startswith("."):
+                        continue
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+                    total += stat.st_size
+
+        if total > self.max_size:
+            entries.sort()
+            limit = int(self.max_size * 0.9)
+            for _, size, path in entries:
+                if total <= limit:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                self._count("evictions")
+        self._write_json(self.directory / self.SIZE_FILE, {"bytes": total})
+
+    def totals(self) -> Dict[str, int]:
+        """Returns statistics accumulated by all processes using the cache."""
+        totals = dict.fromkeys(self.stats, 0)
+        try:
+            data = json.loads((self.directory / self.STATS_FILE).read_text("utf-8"))
+            for name in totals:
+                totals[name] = int(data.get(name, 0))
+        except (OSError, ValueError):
+            pass
+        with self._lock:
+            pending = dict(self._unflushed())
+        for name, value in pending.items():
+            totals[name] += value
+        return totals
+
+    def _flush_stats(self):
+        """Adds this process's statistics to the shared totals (best effort)."""
+        with self._lock:
+            pending = self._unflushed()
+            self._flushed = dict(self.stats)
+        if not any(pending.values()):
+            return
+        totals = dict.fromkeys(self.stats, 0)
+        stats_path = self.directory / self.STATS_FILE
+        try:
+            data = json.loads(stats_path.read_text("utf-8"))
+            for name in totals:
+                totals[name] = int(data.get(name, 0))
+        except (OSError, ValueError):
+            pass
+        for name, value in pending.items():
+            totals[name] += value
+        self._write_json(stats_path, totals)
+
+    def _unflushed(self) -> Dict[str, int]:
+        """Returns statistics not yet added to the shared totals."""
+        return {name: value - self._flushed[name] for name, value in self.stats.items()}
+
+    def _count(self, name: str):
+        """Increments session statistic."""
+        with self._lock:
+            self.stats[name] += 1
+
+    def _object_path(self, object_key: str) -> Path:
+        return self.directory / "objects" / object_key[:2] / (object_key[2:] + ".o")
+
+    def _manifest_path(self, direct_key: str) -> Path:
+        return (
+            self.directory / "manifests" / direct_key[:2] / (direct_key[2:] + ".json")
+        )
+
+    def _read_manifest(self, direct_key: str) -> List[Dict[str, Any]]:
+        try:
+            data = json.loads(self._manifest_path(direct_key).read_text("utf-8"))
+        except (OSError, ValueError):
+            return []
+        return data if isinstance(data, list) else []
+
+    def _write_json(self, path: Path, data: Any):
+        """Atomically replaces JSON file."""
+        temp_path = self._temp_path(path)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path.write_text(json.dumps(data, separators=(",", ":")), "utf-8")
+            os.replace(temp_path, path)
+        except OSError:
+            _remove_quietly(temp_path)
+
+    @staticmethod
+    def _temp_path(path: Path) -> Path:
+        """Returns unique sibling path for atomic replacement."""
+        return path.with_name(f".{path.name}.{os.getpid()}.{uuid.uuid4().hex}.tmp")
+
+    @staticmethod
+    def _relative(path: str, project_root: Path) -> str:
+        root = str(project_root).rstrip(os.sep) + os.sep
+        return "<root>" + os.sep + path[len(root) :] if path.startswith(root) else path
+
+    @staticmethod
+    def _absolute(path: str, project_root: Path) -> str:
+        prefix = "<root>" + os.sep
+        if path.startswith(prefix):
+            return os.path.join(str(project_root), path[len(prefix) :])
+        return path
+
+
+def _size_of(path: Path) -> int:
+    """Returns size of file, or 0 if it does not exist."""
+    try:
+        return path.stat().st_size
+    except OSError:
+        return 0
+
+
+def _touch(path: Path):
+    """Marks file as recently used, ignoring errors."""
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+def _remove_quietly(path: Path):
+    """Removes leftover temporary file, ignoring errors."""
+    try:
+        os.remove(path)
+    except OSError:
+        pass
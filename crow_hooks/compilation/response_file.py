@@ -0,0 +1,65 @@
+import os
+import subprocess
+from pathlib import Path
+from typing import List
+
+# Tools reading response files with Windows command line quoting rules.
+MSVC_TOOLS = ("cl", "clang-cl", "lib", "link", "lld-link", "llvm-lib")
+
+# CreateProcess accepts 32767 characters; keep some room for the executable.
+WINDOWS_COMMAND_LINE_LIMIT = 30000
+
+
+def command_line_limit() -> int:
+    """Returns command line length above which response files are used.
+
+    On POSIX systems arguments share ARG_MAX with the environment, so half
+    of what remains after the current environment is allowed.
+    """
+    if os.name == "nt":
+        return WINDOWS_COMMAND_LINE_LIMIT
+    try:
+        arg_max = os.sysconf("SC_ARG_MAX")
+    except (AttributeError, OSError, ValueError):
+        arg_max = -1
+    if arg_max <= 0:
+        arg_max = 131072
+    environment = sum(len(key) + len(value) + 2 for key, value in os.environ.items())
+    return max(WINDOWS_COMMAND_LINE_LIMIT, (arg_max - environment) // 2)
+
+
+def with_response_file(command: List[str], path: Path, limit: int) -> List[str]:
+    """Returns command, moving its arguments into response file when too long.
+
+    GCC, Clang, binutils and MSVC tools all expand @file arguments; the
+    quoting follows the tool's own rules.
+    """
+    if sum(len(argument) + 1 for argument in command) <= limit:
+        return command
+    arguments = command[1:]
+    if _is_msvc_tool(command[0]):
+        text = "\n".join(subprocess.list2cmdline([argument]) for argument in arguments)
+    else:
+        text = "\n".join(_quote_gnu(argument) for argument in arguments)
+    text += "\n"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        unchanged = path.read_text(encoding="utf-8") == text
+    except OSError:
+        unchanged = False
+    if not unchanged:
+        path.write_text(text, encoding="utf-8")
+    return [command[0], "@" + str(path)]
+
+
+def _is_msvc_tool(executable: str) -> bool:
+    name = os.path.basename(executable).lower()
+    if name.endswith(".exe"):
+        name = name[:-4]
+    return name in MSVC_TOOLS
+
+
+def _quote_gnu(argument: str) -> str:
+    """Quotes argument for libiberty's response file parser."""
+    escaped = argument.replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{escaped}"'
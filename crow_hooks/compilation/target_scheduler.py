@@ -0,0 +1,314 @@
+import heapq
+import itertools
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Any, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+from ..execution import BuildCancelled
+from ..tracing import tracer
+from .object_cache import parse_size
+
+TARGET_KINDS = ("executable", "static", "shared")
+LIBRARY_KINDS = ("static", "shared")
+
+# Assumed cost of a source that has never been compiled, in seconds.
+DEFAULT_SOURCE_COST = 1.0
+
+# Seconds between re-checks of load and memory while a job waits on limits.
+LIMIT_RECHECK = 0.5
+
+
+class TargetSpec(NamedTuple):
+    """Declared target with the targets it depends on."""
+
+    name: str
+    kind: str
+    sources: List[str]
+    dependencies: List[str]
+    options: Dict[str, Any]
+
+
+class TargetBuildError(RuntimeError):
+    """Raised when one or more targets of a scheduled build fail."""
+
+    def __init__(self, failures: Dict[str, BaseException]):
+        self.failures = failures
+        lines = [f"{len(failures)} target(s) failed to build:"]
+        for name, error in failures.items():
+            message = str(error).splitlines()
+            lines.append(f"  {name}: {message[0] if message else type(error).__name__}")
+        super().__init__("\n".join(lines))
+
+
+class ResourceLimits:
+    """Limits on starting further jobs, like make -l for load average.
+
+    A new job starts only while the 1-minute load average is below max_load
+    and at least job_memory bytes of memory are available. One job may
+    always run, so a build never stalls completely.
+    """
+
+    def __init__(
+        self, max_load: Optional[float] = None, job_memory: Optional[int] = None
+    ):
+        self.max_load = max_load
+        self.job_memory = job_memory
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> Optional["ResourceLimits"]:
+        """Creates limits from max_load and job_memory of crow.toml's [build]."""
+        build_config = config.get("build", {})
+        max_load = build_config.get("max_load")
+        job_memory = build_config.get("job_memory")
+        if max_load is None and job_memory is None:
+            return None
+        return cls(
+            float(max_load) if max_load is not None else None,
+            parse_size(job_memory) if job_memory is not None else None,
+        )
+
+    def allows(self, running: int) -> bool:
+        """Checks whether another job may start next to running ones."""
+        if running == 0:
+            return True
+        if self.max_load is not None and hasattr(os, "getloadavg"):
+            if os.getloadavg()[0] >= self.max_load:
+                return False
+        if self.job_memory is not None:
+            available = available_memory()
+            if available is not None and available < self.job_memory:
+                return False
+        return True
+
+
+class PrioritySlots:
+    """Counting semaphore that hands free slots to the highest priority waiter.
+
+    With limits, a free slot is handed out only while load and memory allow;
+    waiters re-check every LIMIT_RECHECK seconds.
+    """
+
+    def __init__(self, count: int, limits: Optional[ResourceLimits] = None):
+        self._count = count
+        self._free = count
+        self.limits = limits
+        self._waiting: List[Tuple[Tuple[float, ...], int]] = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+
+    @contextmanager
+    def acquire(self, priority: Tuple[float, ...]) -> Iterator[None]:
+        """Holds one slot; larger priority tuples are served first."""
+        ticket = (tuple(-value for value in priority), next(self._counter))
+        with self._condition:
+            heapq.heappush(self._waiting, ticket)
+            while not self._grantable(ticket):
+                self._condition.wait(None if self.limits is None else LIMIT_RECHECK)
+            heapq.heappop(self._waiting)
+            self._free -= 1
+            self._condition.notify_all()
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._free += 1
+                self._condition.notify_all()
+
+    def _grantable(self, ticket: Tuple[Tuple[float, ...], int]) -> bool:
+        if self._free == 0 or self._waiting[0] != ticket:
+            return False
+        return self.limits is None or self.limits.allows(self._count - self._free)
+
+
+class TargetScheduler:
+    """Class for building a graph of targets with maximal parallelism.
+
+    Translation units of every target compile as soon as a job slot is free;
+    only link steps wait for the libraries they link. Slots go to the target
+    with the longest remaining path to the end of the build, estimated from
+    durations recorded by previous runs.
+    """
+
+    def __init__(
+        self,
+        compilation_manager: "CompilationManager",
+        limits: Optional[ResourceLimits] = None,
+    ):
+        self.manager = compilation_manager
+        self.state = compilation_manager.artifacts.build_state
+        self.limits = limits
+
+    def build(
+        self,
+        targets: Dict[str, TargetSpec],
+        names: Sequence[str] = (),
+        jobs: Optional[int] = None,
+    ) -> Dict[str, Path]:
+        """Builds named targets (all by default) and their dependencies."""
+        order = self.build_order(targets, names or list(targets))
+        priorities = self.critical_paths(targets, order)
+        jobs = jobs or os.cpu_count() or 1
+
+        self.manager.job_slots = PrioritySlots(jobs, self.limits)
+        self.manager.target_priorities = priorities
+        futures: Dict[str, Future] = {}
+        try:
+            with self.manager.executor.cancel_scope(), ThreadPoolExecutor(
+                max_workers=len(order) or 1
+            ) as pool:
+                for name in order:
+                    spec = targets[name]
+                    waits = [futures[dependency] for dependency in spec.dependencies]
+                    libraries = {
+                        library: futures[library]
+                        for library in self._libraries(targets, name)
+                    }
+                    futures[name] = pool.submit(
+                        self._build_target, spec, waits, libraries, jobs
+                    )
+        finally:
+            self.manager.job_slots = None
+            self.manager.target_priorities = {}
+
+        failures: Dict[str, BaseException] = {}
+        cancelled = False
+        for name in order:
+            error = futures[name].exception()
+            if isinstance(error, BuildCancelled):
+                cancelled = True
+            elif error is not None and not isinstance(error, _DependencyFailed):
+                failures[name] = error
+        if failures:
+            raise TargetBuildError(failures)
+        if cancelled:
+            raise BuildCancelled("Build cancelled")
+
+        artifacts = self.manager.artifacts.artifacts
+        for name in order:
+            if name in artifacts:
+                artifacts[name]["dependencies"] = list(targets[name].dependencies)
+        return {name: futures[name].result() for name in order}
+
+    @staticmethod
+    def build_order(targets: Dict[str, TargetSpec], names: Sequence[str]) -> List[str]:
+        """Returns names and their transitive dependencies, dependencies first."""
+        order: List[str] = []
+        state: Dict[str, str] = {}
+
+        def visit(name: str, path: Tuple[str, ...]):
+            if name not in targets:
+                raise ValueError(f"Unknown target {name!r} required by {path[-1]!r}")
+            if state.get(name) == "done":
+                return
+            if state.get(name) == "visiting":
+                cycle = " -> ".join(path[path.index(name) :] + (name,))
+                raise ValueError(f"Dependency cycle between targets: {cycle}")
+            state[name] = "visiting"
+            for dependency in targets[name].dependencies:
+                visit(dependency, path + (name,))
+            state[name] = "done"
+            order.append(name)
+
+        for name in names:
+            if name not in targets:
+                raise ValueError(f"Unknown target {name!r}")
+            visit(name, ())
+        return order
+
+    def critical_paths(
+        self, targets: Dict[str, TargetSpec], order: List[str]
+    ) -> Dict[str, float]:
+        """Estimates seconds from the start of each target to the end of the build."""
+        consumers: Dict[str, List[str]] = {name: [] for name in order}
+        for name in order:
+            for dependency in targets[name].dependencies:
+                consumers[dependency].append(name)
+
+        remaining: Dict[str, float] = {}
+        for name in reversed(order):
+            remaining[name] = self.estimated_cost(targets[name]) + max(
+                (remaining[consumer] for consumer in consumers[name]), default=0.0
+            )
+        return remaining
+
+    def estimated_cost(self, spec: TargetSpec) -> float:
+        """Returns compile plus link seconds of target's last build."""
+        compile_time = self.state.duration("target:" + spec.name)
+        if compile_time is None:
+            compile_time = DEFAULT_SOURCE_COST * len(spec.sources)
+        link_time = self.state.duration("link:" + spec.name) or 0.0
+        return compile_time + link_time
+
+    @staticmethod
+    def _libraries(targets: Dict[str, TargetSpec], name: str) -> List[str]:
+        """Returns library targets linked into name, dependents before dependencies."""
+        linked: List[str] = []
+
+        def visit(current: str):
+            for dependency in targets[current].dependencies:
+                if targets[dependency].kind not in LIBRARY_KINDS:
+                    continue
+                if dependency in linked:
+                    linked.remove(dependency)
+                linked.append(dependency)
+                visit(dependency)
+
+        visit(name)
+        return linked
+
+    def _build_target(
+        self,
+        spec: TargetSpec,
+        waits: List[Future],
+        libraries: Dict[str, Future],
+        jobs: int,
+    ) -> Path:
+        """Compiles target, waiting for its dependencies only before linking.
+
+        A failure cancels the rest of the build unless the executor keeps going.
+        """
+
+        def link_libraries() -> List[str]:
+            for future in waits:
+                if future.exception() is not None:
+                    raise _DependencyFailed(spec.name)
+            return [str(future.result()) for future in libraries.values()]
+
+        options = dict(spec.options, jobs=jobs, link_libraries=link_libraries)
+        executor = self.manager.executor
+        try:
+            with tracer.span(spec.name, "target", type=spec.kind):
+                if spec.kind == "executable":
+                    return self.manager.compile_executable(
+                        spec.name, spec.sources, **options
+                    )
+                return self.manager.compile_library(
+                    spec.name, spec.sources, spec.kind == "static", **options
+                )
+        except (BuildCancelled, _DependencyFailed):
+            raise
+        except Exception:
+            if not executor.keep_going:
+                executor.cancel()
+            raise
+
+
+class _DependencyFailed(RuntimeError):
+    """Raised for targets skipped because a dependency failed."""
+
+
+def available_memory() -> Optional[int]:
+    """Returns bytes of memory available to new processes, if known."""
+    try:
+        with open("/proc/meminfo", "rb") as meminfo:
+            for line in meminfo:
+                if line.startswith(b"MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (AttributeError, ValueError, OSError):
+        return None
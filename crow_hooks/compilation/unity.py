@@ -0,0 +1,85 @@
+import hashlib
+import os
+import re
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+from ..discovery.file_walker import glob_to_regex
+
+DEFAULT_BATCH_SIZE = 8
+C_SUFFIXES = {".c"}
+
+
+class UnityBatch(NamedTuple):
+    """Generated translation unit including several sources."""
+
+    path: Path
+    sources: List[str]
+
+
+def plan_unity_build(
+    sources: Sequence[str],
+    batch_size: int,
+    batch_dir: Path,
+    exclude: Optional[Sequence[str]] = None,
+) -> Tuple[List[UnityBatch], List[str]]:
+    """Groups sources into unity batches; returns batches and sources built alone.
+
+    Sources are grouped by directory and language, sorted, and chunked within
+    each group, so adding or removing a file only reshuffles batches of its
+    own directory and editing a file only invalidates the batch holding it.
+    Sources matching an exclude glob, and groups of one, are built alone.
+    Batch names carry the language, since C and C++ batches of one directory
+    would otherwise share an object file.
+    """
+    excluded = (
+        re.compile("|".join(f"(?:{glob_to_regex(pattern)})" for pattern in exclude))
+        if exclude
+        else None
+    )
+    groups: Dict[Tuple[str, bool], List[str]] = {}
+    single: List[str] = []
+    for source in sources:
+        normalized = source.replace(os.sep, "/")
+        if excluded is not None and excluded.fullmatch(normalized):
+            single.append(source)
+            continue
+        is_c = Path(source).suffix.lower() in C_SUFFIXES
+        groups.setdefault((os.path.dirname(normalized), is_c), []).append(source)
+
+    batches: List[UnityBatch] = []
+    for (directory, is_c), members in sorted(groups.items()):
+        members.sort()
+        if len(members) < 2:
+            single.extend(members)
+            continue
+        digest = hashlib.sha1(directory.encode()).hexdigest()[:8]
+        stem = (os.path.basename(directory) or "root") + "-" + digest
+        stem += "-c" if is_c else "-cpp"
+        suffix = ".c" if is_c else ".cpp"
+        for start in range(0, len(members), batch_size):
+            chunk = members[start : start + batch_size]
+            if len(chunk) == 1:
+                single.extend(chunk)
+                continue
+            index = start // batch_size
+            batches.append(UnityBatch(batch_dir / f"{stem}_{index}{suffix}", chunk))
+    return batches, single
+
+
+def write_unity_batch(batch: UnityBatch, project_root: Path):
+    """Writes batch source unless it already has the same contents.
+
+    Leaving unchanged batches untouched keeps their objects up to date.
+    """
+    lines = ["/* Generated by crow_hooks unity build. */\n"]
+    for source in batch.sources:
+        path = str(project_root / source).replace("\\", "/")
+        lines.append(f'#include "{path}"\n')
+    text = "".join(lines)
+    try:
+        if batch.path.read_text(encoding="utf-8") == text:
+            return
+    except OSError:
+        pass
+    batch.path.parent.mkdir(parents=True, exist_ok=True)
+    batch.path.write_text(text, encoding="utf-8")
@@ -1,8 +1,22 @@
+import copy
+import hashlib
+import marshal
 import os
 import shutil
+import sys
+import threading
+import time
 from pathlib import Path
-from typing import Dict, Any, List, Optional
-import toml
+from typing import Dict, Any, List, Optional, Tuple
+
+# Files modified this recently are re-hashed even when their stat matches.
+RACY_WINDOW_NS = 2_000_000_000
+
+CACHE_VERSION = 1
+
+# Parsed files shared by every reader in this process, keyed by path.
+_parsed: Dict[str, Tuple[List[int], Dict[str, Any]]] = {}
+_parsed_lock = threading.Lock()
 
 
 class ConfigurationManager:
@@ -10,14 +24,24 @@ class ConfigurationManager:
 
     @staticmethod
     def load_toml(path: Path) -> Dict[str, Any]:
-        """Loads TOML configuration."""
-        if toml is None:
-            return {}
+        """Loads TOML configuration, returning {} if it cannot be read."""
         try:
-            return toml.loads(path.read_text(encoding="utf-8"))
+            return ConfigurationManager.parse_toml(path)
         except Exception:
             return {}
 
+    @staticmethod
+    def parse_toml(path: Path) -> Dict[str, Any]:
+        """Parses TOML file into a dict the caller may modify.
+
+        Files are parsed with tomllib (or tomli) when available, falling back
+        to toml. Results are memoized per process and kept in a binary cache
+        on disk keyed by the file's stat signature and content hash, so
+        unchanged files are not parsed again by later processes; every call
+        returns its own copy of the memoized result.
+        """
+        return copy.deepcopy(_parse_shared(path))
+
     @staticmethod
     def find_executable(names: List[str]) -> Optional[str]:
         """Finds executable in system."""
@@ -26,3 +50,112 @@ class ConfigurationManager:
             if path:
                 return path
         return None
+
+    @staticmethod
+    def cache_directory() -> Path:
+        """Returns per-user cache directory shared across workspaces."""
+        override = os.environ.get("CROW_CACHE_DIR")
+        if override:
+            return Path(override)
+        if os.name == "nt" and os.environ.get("LOCALAPPDATA"):
+            return Path(os.environ["LOCALAPPDATA"]) / "crow_hooks" / "cache"
+        base = os.environ.get("XDG_CACHE_HOME") or str(Path.home() / ".cache")
+        return Path(base) / "crow_hooks"
+
+
+def _parse_shared(path: Path) -> Dict[str, Any]:
+    """Parses TOML file; the memoized result is shared and must not be modified."""
+    key = os.path.abspath(str(path))
+    stat = os.stat(key)
+    signature = [stat.st_mtime_ns, stat.st_size, stat.st_ino]
+    trusted = time.time_ns() - stat.st_mtime_ns >= RACY_WINDOW_NS
+    known = _parsed.get(key)
+    if known is not None and trusted and known[0] == signature:
+        return known[1]
+
+    cache_path = (
+        ConfigurationManager.cache_directory()
+        / "config"
+        / (hashlib.sha1(key.encode()).hexdigest() + ".bin")
+    )
+    cached = _read_config_cache(cache_path)
+    if cached is not None and trusted and cached["stat"] == signature:
+        data = cached["data"]
+    else:
+        content = Path(key).read_bytes()
+        digest = hashlib.blake2b(content, digest_size=16).hexdigest()
+        if cached is not None and cached["hash"] == digest:
+            data = cached["data"]
+        else:
+            data = _parse(content.decode("utf-8"))
+        if trusted:
+            _write_config_cache(
+                cache_path, {"stat": signature, "hash": digest, "data": data}
+            )
+
+    with _parsed_lock:
+        known = _parsed.get(key)
+        if known is not None and known[1] == data:
+            data = known[1]
+        _parsed[key] = (signature, data)
+    return data
+
+
+def _parse(text: str) -> Dict[str, Any]:
+    """Parses TOML text with the fastest available parser.
+
+    Parsers are imported here rather than at module level, since unchanged
+    files are served from the cache without parsing.
+    """
+    try:
+        import tomllib
+    except ImportError:
+        try:
+            import tomli as tomllib
+        except ImportError:
+            tomllib = None
+    try:
+        import toml
+    except ImportError:
+        toml = None
+
+    if tomllib is not None:
+        try:
+            return tomllib.loads(text)
+        except tomllib.TOMLDecodeError:
+            if toml is None:
+                raise
+    if toml is None:
+        raise RuntimeError("No TOML parser available; install tomli or toml")
+    return toml.loads(text)
+
+
+def _read_config_cache(path: Path) -> Optional[Dict[str, Any]]:
+    """Reads cached parse result, or None if missing or from another format."""
+    try:
+        cached = marshal.loads(path.read_bytes())
+    except (OSError, ValueError, EOFError, TypeError):
+        return None
+    if not isinstance(cached, dict) or cached.get("version") != _cache_tag():
+        return None
+    return cached
+
+
+def _write_config_cache(path: Path, entry: Dict[str, Any]):
+    """Atomically writes parse result; values marshal cannot store are skipped."""
+    try:
+        payload = marshal.dumps(dict(entry, version=_cache_tag()), 4)
+    except ValueError:
+        return
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        temp_path.write_bytes(payload)
+        os.replace(temp_path, path)
+    except OSError:
+        pass
+
+
+def _cache_tag() -> str:
+    """Returns format tag; marshal output is only portable within one Python."""
+    return f"{CACHE_VERSION}:{sys.version_info[0]}.{sys.version_info[1]}"
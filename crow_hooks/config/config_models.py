@@ -1,18 +1,22 @@
-import toml
+from pathlib import Path
 from typing import Dict, Any, TypeVar, Generic
+from .config_manager import ConfigurationManager
 
 T = TypeVar("T")
 
 
 class ConfigSection(Generic[T]):
+    __slots__ = ("data", "_sections")
+
     def __init__(self, data: Dict[str, Any]):
         self.data = data
+        self._sections: Dict[str, "ConfigSection"] = {}
 
     def __getattr__(self, name: str) -> Any:
-        value = self.data[name]
-        if isinstance(value, dict):
-            return ConfigSection(value)
-        return value
+        if name in ConfigSection.__slots__:
+            # Unset slot, e.g. while copying; avoids recursing into data.
+            raise AttributeError(name)
+        return _section_value(self.data, self._sections, name)
 
     def as_dict(self) -> Dict[str, Any]:
         return self.data
@@ -20,16 +24,27 @@ class ConfigSection(Generic[T]):
 
 class ConfigurationMeta(type):
     _data: Dict[str, Any] = {}
+    _sections: Dict[str, ConfigSection] = {}
 
     def __getattr__(cls, name: str) -> Any:
-        value = cls._data[name]
-        if isinstance(value, dict):
-            return ConfigSection(value)
-        return value
+        return _section_value(cls._data, cls._sections, name)
 
 
 class Configuration(metaclass=ConfigurationMeta):
     @classmethod
     def load(cls, path: str = "config.toml") -> None:
-        with open(path) as f:
-            cls._data = toml.load(f)
+        cls._data = ConfigurationManager.parse_toml(Path(path))
+        cls._sections = {}
+
+
+def _section_value(
+    data: Dict[str, Any], sections: Dict[str, ConfigSection], name: str
+) -> Any:
+    """Returns data[name], wrapping tables in memoized sections."""
+    value = data[name]
+    if not isinstance(value, dict):
+        return value
+    section = sections.get(name)
+    if section is None or section.data is not value:
+        section = sections[name] = ConfigSection(value)
+    return section
@@ -1,5 +1,19 @@
-from .project_locator import ProjectLocator
-from .source_discoverer import SourceDiscoverer
-from .compiler_detector import CompilerDetector
+from .._lazy import lazy_exports
 
-__all__ = ["ProjectLocator", "SourceDiscoverer", "CompilerDetector"]
+# Exported names and the submodules defining them.
+_EXPORTS = {
+    "ProjectLocator": ".project_locator",
+    "SourceDiscoverer": ".source_discoverer",
+    "CompilerDetector": ".compiler_detector",
+    "CompilerInfo": ".compiler_probe",
+    "CompilerProbe": ".compiler_probe",
+    "FileIndex": ".file_index",
+    "FileWalker": ".file_walker",
+    "IgnoreRules": ".file_walker",
+    "FileChanges": ".file_watcher",
+    "FileWatcher": ".file_watcher",
+}
+
+__all__ = list(_EXPORTS)
+
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS)
@@ -2,35 +2,39 @@ import os
 import platform
 from typing import Dict, Any, List, Optional
 from ..config import ConfigurationManager
+from .compiler_probe import CompilerInfo, CompilerProbe
 
 
 class CompilerDetector:
     """Class for detecting and configuring compilers."""
 
-    def __init__(self):
+    def __init__(self, probe: Optional[CompilerProbe] = None):
         self.config_manager = ConfigurationManager()
+        self.probe = probe or CompilerProbe(self.config_manager.cache_directory())
 
     def detect_compilers(self) -> Dict[str, str]:
         """Detects available compilers."""
         if platform.system().lower() == "windows":
-            msvc_compiler = self.config_manager.find_executable(["cl"])
+            msvc_compiler = self.probe.resolve(["cl"])
             if msvc_compiler:
                 return {"c_compiler": msvc_compiler, "cpp_compiler": msvc_compiler}
 
         c_compiler = (
-            os.environ.get("CC")
-            or self.config_manager.find_executable(["cc", "gcc", "clang"])
-            or "cc"
+            os.environ.get("CC") or self.probe.resolve(["cc", "gcc", "clang"]) or "cc"
         )
 
         cpp_compiler = (
             os.environ.get("CXX")
-            or self.config_manager.find_executable(["c++", "g++", "clang++"])
+            or self.probe.resolve(["c++", "g++", "clang++"])
             or "c++"
         )
 
         return {"c_compiler": c_compiler, "cpp_compiler": cpp_compiler}
 
+    def probe_compiler(self, compiler: str) -> CompilerInfo:
+        """Probes compiler version, target and flag support (cached on disk)."""
+        return self.probe.probe(compiler)
+
     def collect_compiler_flags(self, config: Dict[str, Any]) -> Dict[str, List[str]]:
         """Collects compiler flags from configuration and environment variables."""
         build_config = config.get("build", {}) if isinstance(config, dict) else {}
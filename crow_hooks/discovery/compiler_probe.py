@@ -0,0 +1,259 @@
+import json
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Any, List, NamedTuple, Optional, Tuple
+from ..tracing import tracer
+
+PROBE_SOURCE = "int main(void) { return 0; }\n"
+PROBE_TIMEOUT = 30
+
+# Capability name -> (extra flags, whether the probe links an executable).
+FLAG_PROBES: Dict[str, Tuple[List[str], bool]] = {
+    "fpic": (["-fPIC"], False),
+    "mmd": (["-MMD", "-MF", "{tmp}/probe.d"], False),
+    "split_dwarf": (["-g", "-gsplit-dwarf"], False),
+    "fuse_ld_lld": (["-fuse-ld=lld"], True),
+    "fuse_ld_mold": (["-fuse-ld=mold"], True),
+    "fuse_ld_gold": (["-fuse-ld=gold"], True),
+}
+
+REJECTED_FLAG_MARKERS = (
+    "unrecognized",
+    "unknown argument",
+    "unknown option",
+    "unused-command-line-argument",
+    "argument unused",
+    "not supported",
+)
+
+
+class CompilerInfo(NamedTuple):
+    """Probed facts about a compiler executable."""
+
+    path: str
+    family: str
+    version: str
+    target: str
+    capabilities: Dict[str, bool]
+
+    def supports(self, capability: str) -> bool:
+        """Checks whether compiler accepted the probe for capability."""
+        return self.capabilities.get(capability, False)
+
+
+class CompilerProbe:
+    """Class for probing compilers and caching results on disk.
+
+    Results are keyed by the compiler's resolved path, mtime and size, so each
+    hook process only spawns the compiler when the executable changed.
+    """
+
+    CACHE_FILE = "compilers.json"
+    VERSION = 1
+
+    def __init__(self, cache_directory: Path):
+        self.cache_path = cache_directory / self.CACHE_FILE
+        self._cache: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()
+
+    def resolve(self, names: List[str]) -> Optional[str]:
+        """Finds first executable from names on PATH, reusing cached lookups.
+
+        A cached lookup stays valid while none of the PATH directories searched
+        before the hit changed, which costs one stat per directory.
+        """
+        search_path = os.environ.get("PATH", "")
+        key = "\0".join([search_path] + list(names))
+        with self._lock:
+            cached = self._load().get("which", {}).get(key)
+        if cached and all(
+            _mtime(directory) == mtime for directory, mtime in cached["dirs"]
+        ):
+            return cached["path"]
+
+        for name in names:
+            path = shutil.which(name)
+            if path:
+                break
+        else:
+            return None
+
+        searched = []
+        for directory in search_path.split(os.pathsep):
+            searched.append([directory, _mtime(directory)])
+            if directory and os.path.dirname(path) == directory.rstrip(os.sep):
+                break
+        with self._lock:
+            self._load().setdefault("which", {})[key] = {"path": path, "dirs": searched}
+            self._save()
+        return path
+
+    def probe(self, compiler: str) -> CompilerInfo:
+        """Returns probed information about compiler, using cache when valid."""
+        path = shutil.which(compiler) or compiler
+        key = self.identity(path)
+        with self._lock:
+            cached = self._load().get("compilers", {}).get(key)
+        if cached is not None:
+            return CompilerInfo(**cached)
+
+        with tracer.span(os.path.basename(path), "discovery", probe=path):
+            info = self._run_probes(path)
+        with self._lock:
+            self._load().setdefault("compilers", {})[key] = info._asdict()
+            self._save()
+        return info
+
+    def supports_thin_archives(self, archiver: str) -> bool:
+        """Checks whether archiver creates thin archives with the T modifier.
+
+        The result is verified from the archive header, since some ar
+        implementations accept T with a different meaning.
+        """
+        path = shutil.which(archiver) or archiver
+        key = self.identity(path)
+        with self._lock:
+            cached = self._load().get("archivers", {}).get(key)
+        if cached is not None:
+            return cached["thin"]
+
+        with tempfile.TemporaryDirectory(prefix="crow-probe-") as temp_dir:
+            member = os.path.join(temp_dir, "probe.o")
+            Path(member).write_bytes(b"crow\n")
+            archive = os.path.join(temp_dir, "probe.a")
+            thin = False
+            if self._accepts([path, "rcT", archive, member]):
+                try:
+                    with open(archive, "rb") as handle:
+                        thin = handle.read(8) == b"!<thin>\n"
+                except OSError:
+                    pass
+        with self._lock:
+            self._load().setdefault("archivers", {})[key] = {"thin": thin}
+            self._save()
+        return thin
+
+    @staticmethod
+    def identity(path: str) -> str:
+        """Returns cache key of compiler executable."""
+        real_path = os.path.realpath(path)
+        try:
+            stat = os.stat(real_path)
+        except OSError:
+            return real_path
+        return f"{real_path}:{stat.st_mtime_ns}:{stat.st_size}"
+
+    def _run_probes(self, path: str) -> CompilerInfo:
+        """Spawns compiler to learn its family, version, target and capabilities."""
+        banner = self._output([path, "--version"])
+        if not banner.strip() or "Microsoft" in banner:
+            banner = self._output([path])
+        if "Microsoft" in banner:
+            version = _first_version(banner)
+            target = "x64" if "x64" in banner else "x86" if "x86" in banner else ""
+            capabilities = {"pch": True, "show_includes": True}
+            return CompilerInfo(path, "msvc", version, target, capabilities)
+
+        family = "clang" if "clang" in banner.lower() else "gcc"
+        version = _first_version(banner.splitlines()[0] if banner else "")
+        target = self._output([path, "-dumpmachine"]).strip()
+
+        with tempfile.TemporaryDirectory(prefix="crow-probe-") as temp_dir:
+            source = os.path.join(temp_dir, "probe.c")
+            Path(source).write_text(PROBE_SOURCE, encoding="utf-8")
+            header = os.path.join(temp_dir, "probe.h")
+            Path(header).write_text("#define CROW_PROBE 1\n", encoding="utf-8")
+
+            jobs = {
+                name: self._flag_command(path, source, temp_dir, flags, links)
+                for name, (flags, links) in FLAG_PROBES.items()
+            }
+            jobs["pch"] = [path, "-x", "c-header", header]
+            jobs["pch"] += ["-o", os.path.join(temp_dir, "probe.h.gch")]
+            with ThreadPoolExecutor(max_workers=len(jobs)) as pool:
+                capabilities = dict(zip(jobs, pool.map(self._accepts, jobs.values())))
+
+        return CompilerInfo(path, family, version, target, capabilities)
+
+    @staticmethod
+    def _flag_command(
+        path: str, source: str, temp_dir: str, flags: List[str], links: bool
+    ) -> List[str]:
+        """Builds probe command compiling (or linking) source with flags."""
+        flags = [flag.replace("{tmp}", temp_dir) for flag in flags]
+        name = "-".join(re.sub(r"\W", "", flag) for flag in flags) or "plain"
+        output = os.path.join(temp_dir, name + (".out" if links else ".o"))
+        command = [path] + ([] if links else ["-c"]) + [source, "-o", output]
+        return command + flags
+
+    @staticmethod
+    def _accepts(command: List[str]) -> bool:
+        """Runs probe command and checks the compiler accepted every flag."""
+        try:
+            result = subprocess.run(
+                command, capture_output=True, timeout=PROBE_TIMEOUT, text=True
+            )
+        except (OSError, subprocess.SubprocessError):
+            return False
+        diagnostics = result.stderr.lower()
+        return result.returncode == 0 and not any(
+            marker in diagnostics for marker in REJECTED_FLAG_MARKERS
+        )
+
+    @staticmethod
+    def _output(command: List[str]) -> str:
+        """Returns combined output of probe command."""
+        try:
+            result = subprocess.run(
+                command, capture_output=True, timeout=PROBE_TIMEOUT, text=True
+            )
+        except (OSError, subprocess.SubprocessError):
+            return ""
+        return result.stdout + result.stderr
+
+    def _load(self) -> Dict[str, Any]:
+        """Returns cache contents, reading them on first use."""
+        if self._cache is None:
+            self._cache = {}
+            try:
+                data = json.loads(self.cache_path.read_text(encoding="utf-8"))
+                if data.get("version") == self.VERSION:
+                    self._cache = data
+            except (OSError, ValueError):
+                pass
+        return self._cache
+
+    def _save(self):
+        """Atomically writes cache to disk; failures only cost a re-probe later."""
+        data = dict(self._cache or {}, version=self.VERSION)
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = self.cache_path.with_name(
+                f"{self.cache_path.name}.{os.getpid()}.tmp"
+            )
+            temp_path.write_text(
+                json.dumps(data, separators=(",", ":")), encoding="utf-8"
+            )
+            os.replace(temp_path, self.cache_path)
+        except OSError:
+            pass
+
+
+def _mtime(path: str) -> Optional[int]:
+    """Returns modification time of path, or None if it does not exist."""
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _first_version(text: str) -> str:
+    """Extracts first dotted version number from text."""
+    match = re.search(r"\d+\.\d+(?:\.\d+)*", text)
+    return match.group(0) if match else ""
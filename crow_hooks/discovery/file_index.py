@@ -0,0 +1,126 @@
+import marshal
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+# Listings of directories modified this recently are not trusted on the next
+# run, since a later change within the same timestamp tick would go unnoticed.
+RACY_WINDOW_NS = 2_000_000_000
+
+# Persisted entry: (mtime_ns, inode, rules fingerprint, files, dirs, gitignore).
+_Entry = Tuple[int, int, str, List[str], List[str], Optional[List[int]]]
+
+
+class DirectoryListing(NamedTuple):
+    """Filtered listing of one directory."""
+
+    files: List[str]
+    dirs: List[str]
+    gitignore: Optional[List[int]]
+
+
+class FileIndex:
+    """Class for persisting filtered directory listings between processes.
+
+    Every entry is keyed by the directory's mtime and inode plus a fingerprint
+    of the ignore rules in effect, so a later run only re-lists directories
+    whose contents or applicable rules changed. Entries are flat tuples
+    holding just the listing; only directories the walk stats are validated.
+    """
+
+    INDEX_FILE = ".crow_file_index.bin"
+    VERSION = 3
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._entries: Optional[Dict[str, _Entry]] = None
+        self._visited: Dict[str, _Entry] = {}
+        self._dirty = False
+
+    def load(self):
+        """Loads index from disk."""
+        entries: Dict[str, _Entry] = {}
+        try:
+            data = marshal.loads(self.path.read_bytes())
+            if data.get("version") == self._version_tag():
+                entries = data.get("directories", {})
+        except (OSError, ValueError, EOFError, TypeError, AttributeError):
+            pass
+        self._entries = entries
+        self._visited = {}
+        self._dirty = False
+
+    def save(self):
+        """Atomically writes directories visited since load, if anything changed."""
+        if self._entries is None:
+            return
+        if not self._dirty and len(self._visited) == len(self._entries):
+            return
+        data = {"version": self._version_tag(), "directories": self._visited}
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+            temp_path.write_bytes(marshal.dumps(data, 4))
+            os.replace(temp_path, self.path)
+        except OSError:
+            return
+        self._entries = self._visited
+        self._visited = {}
+        self._dirty = False
+
+    def lookup(
+        self, relative_dir: str, stat: os.stat_result, rules_fingerprint: str
+    ) -> Optional[DirectoryListing]:
+        """Returns cached listing if directory and its ignore rules are unchanged."""
+        if self._entries is None:
+            self.load()
+        entry = self._entries.get(relative_dir)
+        if (
+            entry is None
+            or entry[0] != stat.st_mtime_ns
+            or entry[1] != stat.st_ino
+            or entry[2] != rules_fingerprint
+        ):
+            return None
+        self._visited[relative_dir] = entry
+        return DirectoryListing(entry[3], entry[4], entry[5])
+
+    def store(
+        self,
+        relative_dir: str,
+        stat: os.stat_result,
+        rules_fingerprint: str,
+        files: List[str],
+        directories: List[str],
+        gitignore: Optional[List[int]],
+    ) -> DirectoryListing:
+        """Records filtered listing of directory and returns it."""
+        if self._entries is None:
+            self.load()
+        if time.time_ns() - stat.st_mtime_ns >= RACY_WINDOW_NS:
+            self._visited[relative_dir] = (
+                stat.st_mtime_ns,
+                stat.st_ino,
+                rules_fingerprint,
+                files,
+                directories,
+                gitignore,
+            )
+        self._dirty = True
+        return DirectoryListing(files, directories, gitignore)
+
+    @classmethod
+    def _version_tag(cls) -> str:
+        """Returns format tag; marshal output is only portable within one Python."""
+        return f"{cls.VERSION}:{sys.version_info[0]}.{sys.version_info[1]}"
+
+    @staticmethod
+    def file_signature(path: str) -> Optional[List[int]]:
+        """Returns change signature of file, or None if it does not exist."""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return [stat.st_mtime_ns, stat.st_size, stat.st_ino]
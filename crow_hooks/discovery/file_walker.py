@@ -0,0 +1,361 @@
+import hashlib
+import os
+import re
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Pattern, Sequence, Tuple
+from .file_index import DirectoryListing, FileIndex
+from ..tracing import tracer
+
+DEFAULT_EXCLUDES = [".git/", ".hg/", ".svn/", "node_modules/", "__pycache__/"]
+
+
+def glob_to_regex(pattern: str) -> str:
+    """Translates glob pattern with ** support into regular expression source."""
+    result = []
+    index = 0
+    while index < len(pattern):
+        char = pattern[index]
+        if pattern.startswith("**/", index):
+            result.append("(?:.*/)?")
+            index += 3
+        elif pattern.startswith("/**", index) and index + 3 == len(pattern):
+            result.append("/.*")
+            index += 3
+        elif pattern.startswith("**", index):
+            result.append(".*")
+            index += 2
+        elif char == "*":
+            result.append("[^/]*")
+            index += 1
+        elif char == "?":
+            result.append("[^/]")
+            index += 1
+        elif char == "[":
+            end = pattern.find("]", index + 2)
+            if end < 0:
+                result.append(re.escape(char))
+                index += 1
+                continue
+            body = pattern[index + 1 : end]
+            if body.startswith("!"):
+                body = "^" + body[1:]
+            result.append(f"[{body.replace(chr(92), chr(92) * 2)}]")
+            index = end + 1
+        elif char == "\\" and index + 1 < len(pattern):
+            result.append(re.escape(pattern[index + 1]))
+            index += 2
+        else:
+            result.append(re.escape(char))
+            index += 1
+    return "".join(result)
+
+
+class IgnoreRules:
+    """Class for matching paths against .gitignore-style rules."""
+
+    def __init__(self, lines: Sequence[str]):
+        self.rules: List[Tuple[Pattern[str], bool, bool]] = []
+        for line in lines:
+            line = line.rstrip("\n").rstrip("\r")
+            if not line.endswith("\\ "):
+                line = line.rstrip(" ")
+            if not line or line.startswith("#"):
+                continue
+            negate = line.startswith("!")
+            if negate:
+                line = line[1:]
+            elif line.startswith("\\"):
+                line = line[1:]
+            directory_only = line.endswith("/")
+            line = line.rstrip("/")
+            if not line:
+                continue
+            if "/" not in line:
+                line = "**/" + line
+            line = line.lstrip("/")
+            regex = re.compile(glob_to_regex(line) + r"\Z")
+            self.rules.append((regex, negate, directory_only))
+
+    @classmethod
+    def from_file(cls, path: str) -> "IgnoreRules":
+        """Reads rules from ignore file."""
+        try:
+            with open(path, encoding="utf-8", errors="replace") as handle:
+                return cls(handle.readlines())
+        except OSError:
+            return cls([])
+
+    def match(self, relative_path: str, is_dir: bool) -> Optional[bool]:
+        """Returns True if ignored, False if re-included, None if no rule matched."""
+        result = None
+        for regex, negate, directory_only in self.rules:
+            if directory_only and not is_dir:
+                continue
+            if regex.match(relative_path):
+                result = not negate
+        return result
+
+
+class _CategoryMatcher:
+    """Matches file names with cheap suffix checks where a pattern allows it."""
+
+    def __init__(self, patterns: List[str]):
+        suffixes, others = [], []
+        for pattern in patterns:
+            suffix = pattern[4:] if pattern.startswith("**/*") else None
+            if suffix and not any(char in suffix for char in "*?[]\\/"):
+                suffixes.append(suffix)
+            else:
+                others.append(f"(?:{glob_to_regex(pattern)})")
+        self.suffixes = tuple(suffixes)
+        self.regex = re.compile("|".join(others) + r"\Z") if others else None
+
+    def select(self, relative_dir: str, names: List[str]) -> List[str]:
+        """Returns relative paths of matching files from one directory."""
+        prefix = f"{relative_dir}/" if relative_dir else ""
+        suffixes, regex = self.suffixes, self.regex
+        if regex is None:
+            return [prefix + name for name in names if name.endswith(suffixes)]
+        return [
+            prefix + name
+            for name in names
+            if (suffixes and name.endswith(suffixes)) or regex.match(prefix + name)
+        ]
+
+
+class FileWalker:
+    """Class for traversing project tree in a single pruned pass.
+
+    Ignored directories (version control metadata, the build directory,
+    .gitignore matches and configured excludes) are skipped before descending,
+    and every visited file is classified against all requested categories.
+    With a FileIndex, directories unchanged since the previous run are served
+    from the index instead of being listed again.
+    """
+
+    def __init__(
+        self,
+        project_root: Path,
+        build_dir: Optional[Path] = None,
+        exclude: Optional[List[str]] = None,
+        use_gitignore: bool = True,
+        index: Optional[FileIndex] = None,
+    ):
+        self.project_root = project_root
+        self.build_dir = build_dir
+        self.use_gitignore = use_gitignore
+        self.index = index
+        self.exclude = DEFAULT_EXCLUDES + list(exclude or [])
+        self.root_rules = IgnoreRules(self.exclude)
+        self._parsed_rules: Dict[str, IgnoreRules] = {}
+
+    def walk(self, categories: Dict[str, List[str]]) -> Dict[str, List[str]]:
+        """Classifies project files by glob patterns relative to project root."""
+        with tracer.span("walk", "discovery", categories=sorted(categories)):
+            return self._walk(categories)
+
+    def _walk(self, categories: Dict[str, List[str]]) -> Dict[str, List[str]]:
+        matchers = {
+            name: _CategoryMatcher(patterns)
+            for name, patterns in categories.items()
+            if patterns
+        }
+        results: Dict[str, List[str]] = {name: [] for name in categories}
+        for relative_dir, listing in self._iter_listings():
+            for name, matcher in matchers.items():
+                results[name].extend(matcher.select(relative_dir, listing.files))
+
+        if os.sep != "/":
+            for name, paths in results.items():
+                results[name] = [path.replace("/", os.sep) for path in paths]
+        return results
+
+    def iter_files(self, relative_dir: str = "") -> Iterator[str]:
+        """Yields relative POSIX-style paths of non-ignored files.
+
+        relative_dir restricts the walk to that subtree.
+        """
+        for directory, names in self.iter_directories(relative_dir):
+            for name in names:
+                yield f"{directory}/{name}" if directory else name
+
+    def iter_directories(
+        self, relative_dir: str = "", recursive: bool = True
+    ) -> Iterator[Tuple[str, List[str]]]:
+        """Yields each non-ignored directory with the sorted names of its files.
+
+        relative_dir restricts the walk to that subtree (nothing is yielded
+        if it is ignored or missing); without recursive only relative_dir
+        itself is listed.
+        """
+        for directory, listing in self._iter_listings(relative_dir, recursive):
+            yield directory, listing.files
+
+    def _iter_listings(
+        self, start: str = "", recursive: bool = True
+    ) -> Iterator[Tuple[str, DirectoryListing]]:
+        """Yields filtered listing of each non-ignored directory in walk order.
+
+        Only walks of the whole tree save the index, since saving keeps just
+        the directories visited.
+        """
+        self._parsed_rules = {}
+        context = self._context(start)
+        if context is None:
+            return
+        rules, fingerprint = context
+        stack: List[Tuple[str, str, List[Tuple[str, str]], str]] = [
+            (os.path.join(str(self.project_root), start), start, rules, fingerprint)
+        ]
+
+        while stack:
+            directory, relative_dir, rules, fingerprint = stack.pop()
+            listing = self._list_directory(directory, relative_dir, rules, fingerprint)
+            if listing is None:
+                continue
+            gitignore = listing.gitignore
+
+            if gitignore is not None:
+                rules = rules + [(relative_dir, os.path.join(directory, ".gitignore"))]
+                fingerprint = self._fingerprint(f"{fingerprint}:{gitignore}")
+
+            yield relative_dir, listing
+            if not recursive:
+                break
+
+            for name in reversed(listing.dirs):
+                stack.append(
+                    (
+                        os.path.join(directory, name),
+                        f"{relative_dir}/{name}" if relative_dir else name,
+                        rules,
+                        fingerprint,
+                    )
+                )
+
+        if self.index is not None and not start:
+            self.index.save()
+
+    def _context(
+        self, relative_dir: str
+    ) -> Optional[Tuple[List[Tuple[str, str]], str]]:
+        """Returns ignore rules and fingerprint in effect for listing relative_dir.
+
+        Returns None when the directory or one of its parents is ignored or
+        missing.
+        """
+        rules = [("", "")]
+        fingerprint = self._fingerprint(
+            repr((self.exclude, str(self.build_dir), self.use_gitignore))
+        )
+        if not relative_dir:
+            return rules, fingerprint
+        build_dir = os.path.abspath(self.build_dir) if self.build_dir else None
+        directory = str(self.project_root)
+        parent = ""
+        for name in relative_dir.split("/"):
+            ignore_file = os.path.join(directory, ".gitignore")
+            gitignore = None
+            if self.use_gitignore:
+                gitignore = FileIndex.file_signature(ignore_file)
+            if gitignore is not None:
+                rules = rules + [(parent, ignore_file)]
+                fingerprint = self._fingerprint(f"{fingerprint}:{gitignore}")
+            parent = f"{parent}/{name}" if parent else name
+            directory = os.path.join(directory, name)
+            if (
+                directory == build_dir
+                or os.path.islink(directory)
+                or not os.path.isdir(directory)
+                or self._is_ignored(parent, True, rules)
+            ):
+                return None
+        return rules, fingerprint
+
+    def _list_directory(
+        self,
+        directory: str,
+        relative_dir: str,
+        rules: List[Tuple[str, str]],
+        fingerprint: str,
+    ) -> Optional[DirectoryListing]:
+        """Returns filtered files, subdirectories and .gitignore signature."""
+        stat = None
+        if self.index is not None:
+            try:
+                stat = os.stat(directory)
+            except OSError:
+                return None
+            cached = self.index.lookup(relative_dir, stat, fingerprint)
+            if cached is not None:
+                gitignore = cached.gitignore
+                if gitignore is None or gitignore == FileIndex.file_signature(
+                    os.path.join(directory, ".gitignore")
+                ):
+                    return cached
+
+        try:
+            with os.scandir(directory) as iterator:
+                entries = sorted(iterator, key=lambda entry: entry.name)
+        except OSError:
+            return None
+
+        gitignore = None
+        if self.use_gitignore and any(e.name == ".gitignore" for e in entries):
+            ignore_file = os.path.join(directory, ".gitignore")
+            gitignore = FileIndex.file_signature(ignore_file)
+            rules = rules + [(relative_dir, ignore_file)]
+
+        build_dir = os.path.abspath(self.build_dir) if self.build_dir else None
+        files, subdirectories = [], []
+        for entry in entries:
+            relative_path = (
+                f"{relative_dir}/{entry.name}" if relative_dir else entry.name
+            )
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+            except OSError:
+                continue
+            if self._is_ignored(relative_path, is_dir, rules):
+                continue
+            if is_dir:
+                if entry.path != build_dir:
+                    subdirectories.append(entry.name)
+            elif entry.is_file():
+                files.append(entry.name)
+
+        if self.index is not None:
+            return self.index.store(
+                relative_dir, stat, fingerprint, files, subdirectories, gitignore
+            )
+        return DirectoryListing(files, subdirectories, gitignore)
+
+    def _is_ignored(
+        self, relative_path: str, is_dir: bool, rules: List[Tuple[str, str]]
+    ) -> bool:
+        """Applies ignore rules from outermost to innermost; last match wins."""
+        ignored = False
+        for base, ignore_file in rules:
+            if base:
+                local_path = relative_path[len(base) + 1 :]
+            else:
+                local_path = relative_path
+            matched = self._rules(ignore_file).match(local_path, is_dir)
+            if matched is not None:
+                ignored = matched
+        return ignored
+
+    def _rules(self, ignore_file: str) -> IgnoreRules:
+        """Returns parsed rules of ignore file; parsed only when a directory is listed."""
+        if not ignore_file:
+            return self.root_rules
+        rule_set = self._parsed_rules.get(ignore_file)
+        if rule_set is None:
+            rule_set = IgnoreRules.from_file(ignore_file)
+            self._parsed_rules[ignore_file] = rule_set
+        return rule_set
+
+    @staticmethod
+    def _fingerprint(text: str) -> str:
+        """Returns short stable digest of text."""
+        return hashlib.blake2b(text.encode(), digest_size=8).hexdigest()
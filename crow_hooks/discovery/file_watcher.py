@@ -0,0 +1,337 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+from .file_walker import FileWalker
+
+WATCH_BACKENDS = ("auto", "inotify", "polling")
+
+# Bursts of events are merged for at most this many debounce windows.
+MAX_DEBOUNCE_WINDOWS = 10
+
+_IN_MODIFY = 0x002
+_IN_ATTRIB = 0x004
+_IN_CLOSE_WRITE = 0x008
+_IN_MOVED_FROM = 0x040
+_IN_MOVED_TO = 0x080
+_IN_CREATE = 0x100
+_IN_DELETE = 0x200
+_IN_DELETE_SELF = 0x400
+_IN_Q_OVERFLOW = 0x4000
+_IN_IGNORED = 0x8000
+_IN_ONLYDIR = 0x01000000
+_INOTIFY_MASK = (
+    _IN_MODIFY
+    | _IN_ATTRIB
+    | _IN_CLOSE_WRITE
+    | _IN_MOVED_FROM
+    | _IN_MOVED_TO
+    | _IN_CREATE
+    | _IN_DELETE
+    | _IN_DELETE_SELF
+    | _IN_ONLYDIR
+)
+_EVENT = struct.Struct("iIII")
+
+
+class FileChanges(NamedTuple):
+    """Batch of project files changed since the previous batch (POSIX paths)."""
+
+    modified: List[str]
+    added: List[str]
+    removed: List[str]
+
+    @property
+    def paths(self) -> List[str]:
+        """Returns every changed path."""
+        return self.modified + self.added + self.removed
+
+
+class FileWatcher:
+    """Class for waiting on changes to non-ignored project files.
+
+    inotify is used where available, with stat polling as the fallback.
+    Events arriving within debounce seconds of each other are merged into
+    one batch. With inotify only the directories named by events are listed
+    again (whole subtrees when subdirectories or .gitignore files changed)
+    and only the files named by events are stat'ed; the full snapshot is
+    taken for polling and after the kernel's event queue overflowed.
+    Listings go through the walker, so files in ignored locations
+    (including the build directory) never show up.
+    """
+
+    def __init__(
+        self,
+        walker: FileWalker,
+        debounce: float = 0.2,
+        poll_interval: float = 0.5,
+        backend: str = "auto",
+    ):
+        if backend not in WATCH_BACKENDS:
+            raise ValueError(f"Unknown watch backend: {backend!r}")
+        self.walker = walker
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self._files, self._listed = self._snapshot()
+        self._polled = self._files
+        self._inotify: Optional[_Inotify] = None
+        if backend != "polling":
+            try:
+                self._inotify = _Inotify(str(walker.project_root))
+            except OSError:
+                if backend == "inotify":
+                    raise
+        if self._inotify is not None:
+            self._inotify.watch_directories(list(self._listed))
+        self.backend = "inotify" if self._inotify is not None else "polling"
+
+    def wait(self, timeout: Optional[float] = None) -> Optional[FileChanges]:
+        """Blocks until files change; returns None if timeout passes first."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = (
+                None if deadline is None else max(0.0, deadline - time.monotonic())
+            )
+            if not self._signal(remaining):
+                if deadline is not None and time.monotonic() >= deadline:
+                    return None
+                continue
+            limit = time.monotonic() + self.debounce * MAX_DEBOUNCE_WINDOWS
+            while time.monotonic() < limit and self._signal(self.debounce):
+                pass
+            changes = self._collect()
+            if changes.paths:
+                return changes
+
+    def close(self):
+        """Releases the inotify descriptor."""
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+
+    def __enter__(self) -> "FileWatcher":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _signal(self, timeout: Optional[float]) -> bool:
+        """Waits up to timeout for a hint that something changed."""
+        if self._inotify is not None:
+            return self._inotify.read(timeout)
+        wait = (
+            self.poll_interval if timeout is None else min(timeout, self.poll_interval)
+        )
+        time.sleep(wait)
+        polled, _ = self._snapshot()
+        changed = polled != self._polled
+        self._polled = polled
+        return changed
+
+    def _collect(self) -> FileChanges:
+        """Returns changes since the previous batch."""
+        if self._inotify is not None:
+            events, overflowed = self._inotify.take()
+            if not overflowed:
+                return self._collect_events(events)
+        current, listed = self._snapshot()
+        previous = self._files
+        self._files = self._polled = current
+        self._listed = listed
+        if self._inotify is not None:
+            self._inotify.watch_directories(list(listed))
+        return FileChanges(
+            sorted(
+                path
+                for path, signature in current.items()
+                if path in previous and previous[path] != signature
+            ),
+            sorted(path for path in current if path not in previous),
+            sorted(path for path in previous if path not in current),
+        )
+
+    def _collect_events(self, events: Dict[str, Set[str]]) -> FileChanges:
+        """Derives changes from inotify events, listing only affected directories."""
+        root = str(self.walker.project_root)
+        subtrees = set()
+        for relative_dir, names in events.items():
+            if relative_dir not in self._listed:
+                continue
+            prefix = f"{relative_dir}/" if relative_dir else ""
+            if any(
+                name == ".gitignore"
+                or prefix + name in self._listed
+                or os.path.isdir(os.path.join(root, prefix + name))
+                for name in names
+            ):
+                subtrees.add(relative_dir)
+        subtrees = {
+            directory
+            for directory in subtrees
+            if not any(_within(directory, other) for other in subtrees - {directory})
+        }
+
+        stale: Set[str] = set()
+        listings: Dict[str, List[str]] = {}
+        for relative_dir in subtrees:
+            stale.update(d for d in self._listed if _within(d, relative_dir))
+            listings.update(self.walker.iter_directories(relative_dir))
+        for relative_dir in events:
+            if relative_dir in self._listed and relative_dir not in stale:
+                stale.add(relative_dir)
+                listings.update(
+                    self.walker.iter_directories(relative_dir, recursive=False)
+                )
+
+        modified, added, removed = [], [], []
+        for relative_dir in stale | set(listings):
+            prefix = f"{relative_dir}/" if relative_dir else ""
+            old = set()
+            if relative_dir in stale:
+                old = self._listed.pop(relative_dir, set())
+            new = set(listings.get(relative_dir, ()))
+            if relative_dir in listings:
+                self._listed[relative_dir] = new
+            removed.extend(prefix + name for name in old - new)
+            added.extend(prefix + name for name in new - old)
+            for name in events.get(relative_dir, set()) & old & new:
+                path = prefix + name
+                signature = _signature(os.path.join(root, path))
+                if signature != self._files.get(path):
+                    self._files[path] = signature
+                    modified.append(path)
+        for path in removed:
+            self._files.pop(path, None)
+        for path in added:
+            self._files[path] = _signature(os.path.join(root, path))
+
+        if self._inotify is not None:
+            self._inotify.unwatch(d for d in stale if d not in self._listed)
+            self._inotify.watch(d for d in listings if d not in stale)
+        return FileChanges(sorted(modified), sorted(added), sorted(removed))
+
+    def _snapshot(
+        self,
+    ) -> Tuple[Dict[str, Optional[Tuple[int, int, int]]], Dict[str, Set[str]]]:
+        """Returns stat signature of every non-ignored file and files per directory."""
+        root = str(self.walker.project_root)
+        snapshot = {}
+        listed = {}
+        for relative_dir, names in self.walker.iter_directories():
+            listed[relative_dir] = set(names)
+            prefix = f"{relative_dir}/" if relative_dir else ""
+            for name in names:
+                signature = _signature(os.path.join(root, prefix + name))
+                if signature is not None:
+                    snapshot[prefix + name] = signature
+        return snapshot, listed
+
+
+class _Inotify:
+    """Minimal ctypes binding of Linux inotify watching directories.
+
+    Directories are watched by their path relative to root; read() collects
+    the names events reported per directory until take() is called.
+    """
+
+    def __init__(self, root: str):
+        if not sys.platform.startswith("linux"):
+            raise OSError("inotify is only available on Linux")
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._rm_watch = libc.inotify_rm_watch
+        self._rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+        self.root = root
+        self.watches: Dict[str, int] = {}
+        self._directories: Dict[int, str] = {}
+        self._events: Dict[str, Set[str]] = {}
+        self._overflowed = False
+
+    def watch_directories(self, directories: List[str]):
+        """Watches directories, dropping watches of directories no longer listed."""
+        wanted: Set[str] = set(directories)
+        self.unwatch([name for name in self.watches if name not in wanted])
+        self.watch(directories)
+
+    def watch(self, directories: Iterable[str]):
+        """Starts watching directories not watched yet."""
+        for directory in directories:
+            if directory in self.watches:
+                continue
+            path = os.path.join(self.root, directory) if directory else self.root
+            descriptor = self._add_watch(self.fd, os.fsencode(path), _INOTIFY_MASK)
+            if descriptor >= 0:
+                self.watches[directory] = descriptor
+                self._directories[descriptor] = directory
+
+    def unwatch(self, directories: Iterable[str]):
+        """Stops watching directories."""
+        for directory in list(directories):
+            descriptor = self.watches.pop(directory, None)
+            if descriptor is not None:
+                self._directories.pop(descriptor, None)
+                self._rm_watch(self.fd, descriptor)
+
+    def read(self, timeout: Optional[float]) -> bool:
+        """Drains pending events; returns whether any arrived within timeout."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return False
+        try:
+            data = os.read(self.fd, 1 << 16)
+        except BlockingIOError:
+            return False
+        offset = 0
+        relevant = False
+        while offset + _EVENT.size <= len(data):
+            descriptor, mask, _, length = _EVENT.unpack_from(data, offset)
+            name = data[offset + _EVENT.size : offset + _EVENT.size + length]
+            offset += _EVENT.size + length
+            if mask & _IN_Q_OVERFLOW:
+                self._overflowed = relevant = True
+                continue
+            directory = self._directories.get(descriptor)
+            if mask & _IN_IGNORED:
+                if directory is not None and self.watches.get(directory) == descriptor:
+                    del self.watches[directory]
+                self._directories.pop(descriptor, None)
+                continue
+            if directory is None:
+                continue
+            relevant = True
+            name = os.fsdecode(name.rstrip(b"\0"))
+            if name:
+                self._events.setdefault(directory, set()).add(name)
+        return relevant
+
+    def take(self) -> Tuple[Dict[str, Set[str]], bool]:
+        """Returns names reported per directory and whether events were lost."""
+        events, overflowed = self._events, self._overflowed
+        self._events, self._overflowed = {}, False
+        return events, overflowed
+
+    def close(self):
+        os.close(self.fd)
+
+
+def _within(directory: str, ancestor: str) -> bool:
+    """Checks whether relative directory is ancestor or lies below it."""
+    return not ancestor or directory == ancestor or directory.startswith(ancestor + "/")
+
+
+def _signature(path: str) -> Optional[Tuple[int, int, int]]:
+    """Returns stat signature of file, or None if it is gone."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
@@ -1,29 +1,34 @@
 import os
 from pathlib import Path
-from typing import List
+from typing import Dict, List, Optional
+from .file_walker import FileWalker
+
+SOURCE_PATTERNS = ["**/*.c", "**/*.cc", "**/*.cpp", "**/*.cxx", "**/*.c++"]
+HEADER_PATTERNS = ["**/*.h"]
 
 
 class SourceDiscoverer:
     """Class for discovering project source files."""
 
-    def __init__(self, project_root: Path):
+    def __init__(
+        self,
+        project_root: Path,
+        exclude: Optional[List[str]] = None,
+        walker: Optional[FileWalker] = None,
+    ):
         self.project_root = project_root
         self.build_dir = Path(
             os.environ.get("CROW_BUILD_DIR", str(project_root / "build"))
         )
+        self.walker = walker or FileWalker(project_root, self.build_dir, exclude)
+        self._scan: Optional[Dict[str, List[str]]] = None
 
     def discover_source_files(self, patterns: List[str] = None) -> List[str]:
         """Discovers source files by patterns."""
         if patterns is None:
-            patterns = ["**/*.c", "**/*.cc", "**/*.cpp", "**/*.cxx", "**/*.c++"]
-
-        sources = []
-        for pattern in patterns:
-            for file_path in self.project_root.glob(pattern):
-                if self.build_dir in file_path.parents:
-                    continue
-                if file_path.is_file():
-                    sources.append(str(file_path.relative_to(self.project_root)))
+            sources = list(self._scan_tree()["sources"])
+        else:
+            sources = self.walker.walk({"sources": patterns})["sources"]
 
         sources.sort()
         return sources
@@ -35,12 +40,22 @@ class SourceDiscoverer:
 
         for dir_name in common_dirs:
             dir_path = self.project_root / dir_name
-            if dir_path.exists() and dir_path.is_dir():
-                found_dirs.append(str(dir_path.relative_to(self.project_root)))
-
-        for header_file in self.project_root.rglob("*.h"):
-            dir_path = str(header_file.parent.relative_to(self.project_root))
-            if dir_path not in found_dirs:
+            if dir_path.is_dir():
+                found_dirs.append(dir_name)
+
+        seen = set(found_dirs)
+        for header_file in self._scan_tree()["headers"]:
+            dir_path = os.path.dirname(header_file) or "."
+            if dir_path not in seen:
+                seen.add(dir_path)
                 found_dirs.append(dir_path)
 
         return found_dirs
+
+    def _scan_tree(self) -> Dict[str, List[str]]:
+        """Classifies sources and headers in one traversal, shared by both queries."""
+        if self._scan is None:
+            self._scan = self.walker.walk(
+                {"sources": SOURCE_PATTERNS, "headers": HEADER_PATTERNS}
+            )
+        return self._scan
@@ -1,4 +1,20 @@
-from .build_executor import BuildExecutor
-from .file_manager import FileManager
+from .._lazy import lazy_exports
 
-__all__ = ["BuildExecutor", "FileManager"]
+# Exported names and the submodules defining them.
+_EXPORTS = {
+    "BuildCancelled": ".build_executor",
+    "BuildExecutor": ".build_executor",
+    "FileManager": ".file_manager",
+    "Jobserver": ".jobserver",
+    "CapturedProcess": ".output_capture",
+    "ConsoleLog": ".output_capture",
+    "RingBuffer": ".output_capture",
+    "ProcessSpawner": ".process_spawn",
+    "TestResult": ".test_runner",
+    "TestRunner": ".test_runner",
+    "TestsFailed": ".test_runner",
+}
+
+__all__ = list(_EXPORTS)
+
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS)
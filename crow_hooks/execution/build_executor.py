@@ -1,19 +1,97 @@
 import os
 import shutil
+import signal
 import subprocess
+import sys
+import threading
+import weakref
+from contextlib import contextmanager, nullcontext
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import TYPE_CHECKING, List, Dict, Iterator, Optional, Tuple
+from ..tracing import tracer
+from .output_capture import (
+    DEFAULT_OUTPUT_LIMIT,
+    READ_CHUNK,
+    CapturedProcess,
+    CommandLog,
+    ConsoleLog,
+    LineHandler,
+    StreamCapture,
+)
+from .jobserver import Jobserver
+from .process_spawn import ProcessSpawner, exit_code, signal_process
+
+if TYPE_CHECKING:
+    import asyncio
+
+# Seconds cancelled commands get to exit after SIGTERM before SIGKILL.
+TERMINATE_GRACE_PERIOD = 3.0
+
+
+class BuildCancelled(RuntimeError):
+    """Raised for commands skipped or terminated because the build was cancelled."""
+
+
+class _RunningCommand:
+    def __init__(self, process, grouped: bool):
+        self.process = process
+        self.grouped = grouped
+        self.terminated = False
+        self.timed_out = False
+        self.timer: Optional[threading.Timer] = None
+
+
+class _CommandHandle:
+    """Lets an async caller stop the command a worker thread runs for it."""
+
+    def __init__(self):
+        self.abandoned = False
+        self.running: Optional[_RunningCommand] = None
 
 
 class BuildExecutor:
-    """Class for executing build commands."""
+    """Class for executing build commands.
+
+    Under make -jN (or a crow acting as jobserver) every spawned command
+    holds a jobserver token while it runs, so parallel commands stay within
+    the parent's job budget.
+
+    Commands with captured or streamed output run in their own process
+    group. Inside cancel_scope() the first failure (unless keep_going is
+    set) or Ctrl+C cancels the build: in-flight commands get SIGTERM, then
+    SIGKILL after grace_period seconds, and commands not yet started raise
+    BuildCancelled.
+    """
 
     def __init__(
-        self, project_root: Path, environment: Optional[Dict[str, str]] = None
+        self,
+        project_root: Path,
+        environment: Optional[Dict[str, str]] = None,
+        spawn_backend: str = "auto",
+        use_jobserver: bool = True,
     ):
         self.project_root = project_root
         self.environment = dict(environment or os.environ)
+        self.spawner = ProcessSpawner(spawn_backend)
+        self.jobserver = (
+            Jobserver.from_environment(self.environment) if use_jobserver else None
+        )
+        self._environments: Tuple[Dict[str, str], Dict[tuple, Dict[str, str]]] = (
+            self.environment,
+            {},
+        )
         self.crow_cli = shutil.which("crow")
+        self.async_jobs = os.cpu_count() or 1
+        self.output_limit = DEFAULT_OUTPUT_LIMIT
+        self.console = ConsoleLog()
+        self._output_lock = threading.Lock()
+        self._async_slots: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+        self.keep_going = False
+        self.grace_period = TERMINATE_GRACE_PERIOD
+        self._running: Dict[int, _RunningCommand] = {}
+        self._running_lock = threading.Lock()
+        self._cancelled = threading.Event()
+        self._scopes = 0
 
     def execute_command(
         self,
@@ -22,22 +100,529 @@ class BuildExecutor:
         capture_output: bool = False,
         custom_environment: Optional[Dict[str, str]] = None,
         working_directory: Optional[str] = None,
+        echo: bool = True,
+        on_line: Optional[LineHandler] = None,
+        output_limit: Optional[int] = None,
+        log_path: Optional[Path] = None,
+        timeout: Optional[float] = None,
     ) -> subprocess.CompletedProcess:
-        """Executes system command."""
-        final_environment = dict(self.environment)
-        if custom_environment:
-            final_environment.update(custom_environment)
+        """Executes system command.
+
+        Passing on_line, output_limit or log_path switches to streaming mode:
+        output is read incrementally, handed to on_line per line, captured into
+        ring buffers holding the last output_limit bytes and spilled in full
+        to log_path. A command running longer than timeout seconds is
+        terminated; its result has timed_out set, and check_success raises
+        subprocess.TimeoutExpired.
+        """
+        final_environment = self._environment_for(custom_environment)
+        if self._cancelled.is_set():
+            raise BuildCancelled(f"Build cancelled before running {command[0]}")
 
-        print("[build] executing:", " ".join(command))
+        if echo:
+            self.console.line("[build] executing:", " ".join(command))
+            self.console.flush()
+
+        cwd = working_directory or str(self.project_root)
+        streaming = (
+            on_line is not None or output_limit is not None or log_path is not None
+        )
+        with tracer.span(
+            os.path.basename(command[0]), "command", command=" ".join(command)
+        ) as span:
+            result = self._run_process(
+                command,
+                final_environment,
+                cwd,
+                capture_output,
+                on_line,
+                (output_limit or self.output_limit) if streaming else None,
+                log_path,
+                timeout,
+            )
+            span.update(
+                exit_code=result.returncode,
+                cpu_time=result.cpu_time,
+                max_rss_kb=result.max_rss_kb,
+            )
+        if check_success:
+            if result.timed_out:
+                raise subprocess.TimeoutExpired(
+                    command, timeout, result.stdout, result.stderr
+                )
+            result.check_returncode()
+        return result
+
+    def _run_process(
+        self,
+        command: List[str],
+        environment: Dict[str, str],
+        working_directory: str,
+        capture_output: bool,
+        on_line: Optional[LineHandler],
+        limit: Optional[int],
+        log_path: Optional[Path],
+        timeout: Optional[float] = None,
+        handle: Optional[_CommandHandle] = None,
+    ) -> CapturedProcess:
+        """Runs command, reading piped output incrementally into buffers.
 
-        return subprocess.run(
+        Output is inherited from this process when it is neither captured nor
+        streamed; a limit of None captures output in full. A command whose
+        handle was abandoned is not started, or terminated once it has been.
+        """
+        if not capture_output:
+            self.console.flush()
+        with self._job_slot():
+            if handle is not None and handle.abandoned:
+                raise BuildCancelled(f"Command {command[0]} was abandoned")
+            return self._spawn_and_wait(
+                command,
+                environment,
+                working_directory,
+                capture_output,
+                on_line,
+                limit,
+                log_path,
+                timeout,
+                handle,
+            )
+
+    def _spawn_and_wait(
+        self,
+        command: List[str],
+        environment: Dict[str, str],
+        working_directory: str,
+        capture_output: bool,
+        on_line: Optional[LineHandler],
+        limit: Optional[int],
+        log_path: Optional[Path],
+        timeout: Optional[float] = None,
+        handle: Optional[_CommandHandle] = None,
+    ) -> CapturedProcess:
+        """Spawns command and reaps it; see _run_process.
+
+        Commands inheriting our output stay in our process group, so that
+        Ctrl+C reaches interactive commands directly.
+        """
+        pass_fds = self.jobserver.pass_fds if self.jobserver is not None else ()
+        if not capture_output and limit is None and log_path is None:
+            process = self.spawner.spawn(
+                command, environment, working_directory, False, pass_fds
+            )
+            running = self._track(process, False, timeout, handle)
+            try:
+                returncode, cpu_time, max_rss_kb = self._wait(process)
+            finally:
+                self._untrack(running)
+            if running.terminated:
+                raise BuildCancelled(f"Build cancelled while running {command[0]}")
+            return CapturedProcess(
+                command,
+                returncode,
+                None,
+                None,
+                None,
+                False,
+                cpu_time,
+                max_rss_kb,
+                running.timed_out,
+            )
+
+        log = CommandLog(log_path, command) if log_path is not None else None
+        captures = [
+            StreamCapture(
+                name,
+                limit,
+                on_line,
+                log,
+                None if capture_output or on_line else getattr(console, "buffer", None),
+            )
+            for name, console in (("stdout", sys.stdout), ("stderr", sys.stderr))
+        ]
+
+        process = self.spawner.spawn(
+            command, environment, working_directory, True, pass_fds, True
+        )
+        running = self._track(process, True, timeout, handle)
+        readers = [
+            threading.Thread(target=self._pump, args=(pipe, capture), daemon=True)
+            for pipe, capture in zip((process.stdout, process.stderr), captures)
+        ]
+        for reader in readers:
+            reader.start()
+        try:
+            for reader in readers:
+                reader.join()
+        finally:
+            try:
+                returncode, cpu_time, max_rss_kb = self._wait(process, True)
+            finally:
+                self._untrack(running)
+        if log is not None:
+            log.close(returncode)
+        if running.terminated:
+            raise BuildCancelled(f"Build cancelled while running {command[0]}")
+
+        stdout, stderr = (c.value() if capture_output else None for c in captures)
+        truncated = any(capture.truncated for capture in captures)
+        return CapturedProcess(
             command,
-            check=check_success,
-            capture_output=capture_output,
-            env=final_environment,
-            cwd=(working_directory or str(self.project_root)),
+            returncode,
+            stdout,
+            stderr,
+            log_path,
+            truncated,
+            cpu_time,
+            max_rss_kb,
+            running.timed_out,
         )
 
+    @contextmanager
+    def cancel_scope(self) -> Iterator[None]:
+        """Scope of commands cancelled together by cancel() or Ctrl+C.
+
+        Scopes nest; the outermost one resets the cancelled state and, in
+        the main thread, has SIGINT terminate in-flight commands before
+        KeyboardInterrupt is raised.
+        """
+        with self._running_lock:
+            outermost = self._scopes == 0
+            self._scopes += 1
+            if outermost:
+                self._cancelled.clear()
+        previous = None
+        if (
+            outermost
+            and threading.current_thread() is threading.main_thread()
+            and signal.getsignal(signal.SIGINT) is signal.default_int_handler
+        ):
+
+            def interrupt(signum, frame):
+                self.cancel()
+                signal.default_int_handler(signum, frame)
+
+            previous = signal.signal(signal.SIGINT, interrupt)
+        try:
+            yield
+        finally:
+            if previous is not None:
+                signal.signal(signal.SIGINT, previous)
+            with self._running_lock:
+                self._scopes -= 1
+                if self._scopes == 0:
+                    self._cancelled.clear()
+
+    @property
+    def cancelled(self) -> bool:
+        """Whether the current cancel scope was cancelled."""
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        """Terminates in-flight commands, escalating to SIGKILL after grace_period.
+
+        Inside a cancel scope, commands started afterwards raise
+        BuildCancelled until the outermost scope ends.
+        """
+        with self._running_lock:
+            if self._scopes:
+                self._cancelled.set()
+            running = list(self._running.values())
+            for command in running:
+                command.terminated = True
+        for command in running:
+            signal_process(command.process, signal.SIGTERM, command.grouped)
+        if running:
+            timer = threading.Timer(self.grace_period, self._kill, (running,))
+            timer.daemon = True
+            timer.start()
+
+    def _kill(self, commands: List[_RunningCommand]):
+        """Kills cancelled commands that outlived their grace period."""
+        with self._running_lock:
+            remaining = [
+                command for command in commands if command.process.pid in self._running
+            ]
+        kill = getattr(signal, "SIGKILL", signal.SIGTERM)
+        for command in remaining:
+            signal_process(command.process, kill, command.grouped)
+
+    def _track(
+        self,
+        process,
+        grouped: bool,
+        timeout: Optional[float] = None,
+        handle: Optional[_CommandHandle] = None,
+    ) -> _RunningCommand:
+        """Registers in-flight process; one started after cancel() is stopped."""
+        running = _RunningCommand(process, grouped)
+        with self._running_lock:
+            self._running[process.pid] = running
+            cancelled = self._cancelled.is_set()
+            if handle is not None:
+                handle.running = running
+                cancelled = cancelled or handle.abandoned
+            running.terminated = cancelled
+        if cancelled:
+            signal_process(process, signal.SIGTERM, grouped)
+        elif timeout is not None:
+            running.timer = threading.Timer(timeout, self._expire, (running,))
+            running.timer.daemon = True
+            running.timer.start()
+        return running
+
+    def _untrack(self, running: _RunningCommand):
+        """Unregisters reaped process."""
+        if running.timer is not None:
+            running.timer.cancel()
+        with self._running_lock:
+            self._running.pop(running.process.pid, None)
+
+    def _expire(self, running: _RunningCommand):
+        """Terminates command that exceeded its timeout, like cancel() does."""
+        with self._running_lock:
+            if running.process.pid not in self._running:
+                return
+            running.timed_out = True
+        self._terminate(running)
+
+    def _abandon(self, handle: _CommandHandle):
+        """Stops command of a cancelled async caller, or keeps it from starting."""
+        with self._running_lock:
+            handle.abandoned = True
+            running = handle.running
+            if running is None or running.process.pid not in self._running:
+                return
+            running.terminated = True
+        self._terminate(running)
+
+    def _terminate(self, running: _RunningCommand):
+        """Sends SIGTERM to command, then SIGKILL after grace_period."""
+        signal_process(running.process, signal.SIGTERM, running.grouped)
+        timer = threading.Timer(self.grace_period, self._kill, ([running],))
+        timer.daemon = True
+        timer.start()
+
+    def serve_jobserver(
+        self, jobs: Optional[int] = None, use_fifo: bool = False
+    ) -> Jobserver:
+        """Shares jobs slots (default: CPUs) with child make and crow commands.
+
+        Commands run from now on find the jobserver in MAKEFLAGS. When this
+        process is itself a jobserver client, the parent's jobserver is kept.
+        """
+        if self.jobserver is None:
+            self.jobserver = Jobserver.create(jobs or os.cpu_count() or 1, use_fifo)
+            self.environment = self.jobserver.environment(self.environment)
+            weakref.finalize(self, self.jobserver.close)
+        return self.jobserver
+
+    def _job_slot(self):
+        """Holds a jobserver token, if there is a jobserver, while a command runs."""
+        if self.jobserver is None:
+            return nullcontext()
+        return self.jobserver.slot()
+
+    def _environment_for(
+        self, custom_environment: Optional[Dict[str, str]]
+    ) -> Dict[str, str]:
+        """Returns environment for a command, reusing previously merged ones.
+
+        Environments are treated as read-only; assign a new dict to
+        environment instead of mutating it.
+        """
+        if not custom_environment:
+            return self.environment
+        key = tuple(sorted(custom_environment.items()))
+        base, merged_environments = self._environments
+        if base is not self.environment or len(merged_environments) >= 64:
+            merged_environments = {}
+            self._environments = (self.environment, merged_environments)
+        merged = merged_environments.get(key)
+        if merged is None:
+            merged = dict(self.environment)
+            merged.update(custom_environment)
+            merged_environments[key] = merged
+        return merged
+
+    @staticmethod
+    def _wait(
+        process, grouped: bool = False
+    ) -> Tuple[int, Optional[float], Optional[int]]:
+        """Reaps process, returning exit code, CPU seconds and peak RSS in KiB.
+
+        os.wait4 reports the usage of this one child, which stays accurate
+        when several commands run in parallel (RUSAGE_CHILDREN would mix them).
+        If waiting is interrupted, the process (and its group) is killed.
+        """
+        try:
+            if not hasattr(os, "wait4"):
+                return process.wait(), None, None
+            try:
+                _, status, usage = os.wait4(process.pid, 0)
+            except ChildProcessError:
+                return process.wait(), None, None
+        except BaseException:
+            if grouped:
+                signal_process(process, signal.SIGKILL, True)
+            process.kill()
+            process.wait()
+            raise
+        process.returncode = exit_code(status)
+        max_rss_kb = usage.ru_maxrss
+        if sys.platform == "darwin":
+            max_rss_kb //= 1024
+        return process.returncode, usage.ru_utime + usage.ru_stime, max_rss_kb
+
+    @staticmethod
+    def _pump(pipe, capture: StreamCapture):
+        """Moves data from child pipe into capture until end of stream."""
+        with pipe:
+            for chunk in iter(lambda: pipe.read1(READ_CHUNK), b""):
+                capture.feed(chunk)
+        capture.finish()
+
+    def execute_many(
+        self,
+        commands: List[List[str]],
+        jobs: Optional[int] = None,
+        check_success: bool = True,
+        capture_output: bool = False,
+        custom_environment: Optional[Dict[str, str]] = None,
+        working_directory: Optional[str] = None,
+    ) -> List[subprocess.CompletedProcess]:
+        """Executes commands on a bounded worker pool.
+
+        Each command's output is written as one block when it finishes, so
+        concurrent commands never interleave. Results keep the input order.
+        With check_success the first failure cancels the remaining commands
+        unless keep_going is set.
+        """
+        from concurrent.futures import ThreadPoolExecutor, as_completed
+
+        def run(command: List[str]) -> subprocess.CompletedProcess:
+            result = self.execute_command(
+                command,
+                check_success=False,
+                capture_output=True,
+                custom_environment=custom_environment,
+                working_directory=working_directory,
+                echo=False,
+            )
+            return self._finish(result, capture_output)
+
+        workers = max(1, min(jobs or os.cpu_count() or 1, len(commands) or 1))
+        with self.cancel_scope(), ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(run, command) for command in commands]
+            for future in as_completed(futures):
+                error = future.exception()
+                if self.keep_going or isinstance(error, BuildCancelled):
+                    continue
+                if error is not None or (check_success and future.result().returncode):
+                    self.cancel()
+        self.console.flush()
+
+        for future in futures:
+            error = future.exception()
+            if error is not None and not isinstance(error, BuildCancelled):
+                raise error
+        results = [future.result() for future in futures if future.exception() is None]
+        if check_success:
+            for result in results:
+                result.check_returncode()
+        if len(results) < len(futures):
+            raise BuildCancelled("Build cancelled")
+        return results
+
+    async def execute_command_async(
+        self,
+        command: List[str],
+        check_success: bool = True,
+        capture_output: bool = False,
+        custom_environment: Optional[Dict[str, str]] = None,
+        working_directory: Optional[str] = None,
+    ) -> subprocess.CompletedProcess:
+        """Executes system command without blocking the event loop.
+
+        The command runs as in execute_command (spawn backend, jobserver
+        token, own process group, cancellation by cancel()) on a worker
+        thread. At most async_jobs commands run at once per event loop;
+        output is written as one block when the command finishes. Cancelling
+        the awaiting task terminates the command, and the worker thread
+        gives back its jobserver token once the command has been reaped.
+
+        Commands are not started with asyncio.create_subprocess_exec; each
+        awaited command occupies a thread of the loop's default executor
+        until it has been reaped.
+        """
+        import asyncio
+
+        final_environment = self._environment_for(custom_environment)
+        cwd = working_directory or str(self.project_root)
+        handle = _CommandHandle()
+
+        def run() -> CapturedProcess:
+            with tracer.span(
+                os.path.basename(command[0]), "command", command=" ".join(command)
+            ) as span:
+                result = self._run_process(
+                    command,
+                    final_environment,
+                    cwd,
+                    True,
+                    None,
+                    None,
+                    None,
+                    handle=handle,
+                )
+                span.update(
+                    exit_code=result.returncode,
+                    cpu_time=result.cpu_time,
+                    max_rss_kb=result.max_rss_kb,
+                )
+            return result
+
+        async with self._async_slot():
+            if self._cancelled.is_set():
+                raise BuildCancelled(f"Build cancelled before running {command[0]}")
+            try:
+                result = await asyncio.get_running_loop().run_in_executor(None, run)
+            except asyncio.CancelledError:
+                self._abandon(handle)
+                raise
+
+        self._finish(result, capture_output)
+        self.console.flush()
+        if check_success:
+            result.check_returncode()
+        return result
+
+    def _async_slot(self) -> "asyncio.Semaphore":
+        """Returns concurrency limiter of the running event loop."""
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        slots = self._async_slots.get(loop)
+        if slots is None:
+            slots = asyncio.Semaphore(self.async_jobs)
+            self._async_slots[loop] = slots
+        return slots
+
+    def _finish(
+        self, result: subprocess.CompletedProcess, capture_output: bool
+    ) -> subprocess.CompletedProcess:
+        """Writes command header and output as one uninterrupted block."""
+        with self._output_lock:
+            self.console.line("[build] executing:", " ".join(result.args))
+            if not capture_output:
+                if result.stdout:
+                    self.console.write(result.stdout.decode(errors="replace"))
+                if result.stderr:
+                    self.console.write(result.stderr.decode(errors="replace"), True)
+        if not capture_output:
+            result.stdout = result.stderr = None
+        return result
+
     def execute_shell_command(
         self, command: str, **kwargs
     ) -> subprocess.CompletedProcess:
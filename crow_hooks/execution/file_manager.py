@@ -1,18 +1,25 @@
 from pathlib import Path
-from typing import List
+from typing import List, Optional
+from ..discovery.file_walker import FileWalker
 
 
 class FileManager:
     """Class for managing project files."""
 
-    def __init__(self, project_root: Path):
+    def __init__(self, project_root: Path, walker: Optional[FileWalker] = None):
         self.project_root = project_root
+        self.walker = walker or FileWalker(project_root)
 
     def find_files_by_patterns(self, patterns: List[str]) -> List[str]:
-        """Finds files by patterns."""
+        """Finds files by patterns in a single traversal of the project tree."""
+        categories = {str(index): [pattern] for index, pattern in enumerate(patterns)}
+        matches = self.walker.walk(categories)
+
         found_files = []
-        for pattern in patterns:
-            for file_path in self.project_root.glob(pattern):
-                if file_path.is_file():
-                    found_files.append(str(file_path.relative_to(self.project_root)))
+        seen = set()
+        for index in range(len(patterns)):
+            for file_path in matches[str(index)]:
+                if file_path not in seen:
+                    seen.add(file_path)
+                    found_files.append(file_path)
         return found_files
@@ -0,0 +1,214 @@
+import os
+import select
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Tuple
+
+# Token byte written into jobservers this process creates (GNU make uses "+").
+TOKEN = b"+"
+
+# Seconds between checks for a released implicit slot while waiting on the pipe.
+POLL_INTERVAL = 0.05
+
+
+class Jobserver:
+    """Class for sharing job slots with GNU make through its jobserver.
+
+    Every process of a jobserver owns one implicit slot; each further job
+    needs a token byte read from the jobserver pipe (or fifo), which is
+    written back when the job ends. A client is found from MAKEFLAGS set by
+    a parent make or crow; create() starts a new jobserver whose tokens
+    child make and crow invocations share through environment().
+    """
+
+    def __init__(
+        self,
+        read_fd: int,
+        write_fd: int,
+        auth: str,
+        jobs: Optional[int] = None,
+        owned: Tuple[int, ...] = (),
+        fifo: Optional[str] = None,
+    ):
+        self.read_fd = read_fd
+        self.write_fd = write_fd
+        self.auth = auth
+        self.jobs = jobs
+        self.fifo = fifo
+        self._owned = owned
+        self._implicit_free = True
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_environment(cls, environment: Dict[str, str]) -> Optional["Jobserver"]:
+        """Connects to the jobserver named in MAKEFLAGS, if any is reachable.
+
+        Both the pipe form (--jobserver-auth=R,W, or --jobserver-fds=R,W of
+        make before 4.2) and the fifo form of make 4.4 (fifo:PATH) are read.
+        A parent that did not pass its descriptors on makes this return None.
+        """
+        auth = parse_makeflags(environment.get("MAKEFLAGS", ""))
+        if auth is None:
+            return None
+        if auth.startswith("fifo:"):
+            try:
+                fd = os.open(auth[5:], os.O_RDWR | os.O_NONBLOCK | os.O_CLOEXEC)
+            except OSError:
+                return None
+            return cls(fd, fd, auth, owned=(fd,))
+
+        try:
+            read_fd, write_fd = (int(fd) for fd in auth.split(","))
+            os.fstat(read_fd)
+            os.fstat(write_fd)
+        except (ValueError, OSError):
+            return None
+        private_fd = _private_reader(read_fd)
+        if private_fd is None:
+            return cls(read_fd, write_fd, auth)
+        return cls(private_fd, write_fd, auth, owned=(private_fd,))
+
+    @classmethod
+    def create(cls, jobs: int, use_fifo: bool = False) -> "Jobserver":
+        """Starts a jobserver allowing jobs parallel jobs in total.
+
+        The pipe form works with every GNU make; use_fifo selects the named
+        pipe form, which make 4.4 and later understand and which does not
+        depend on descriptors being inherited.
+        """
+        jobs = max(1, jobs)
+        if use_fifo:
+            directory = tempfile.mkdtemp(prefix="crow-jobserver-")
+            fifo = os.path.join(directory, "fifo")
+            os.mkfifo(fifo, 0o600)
+            fd = os.open(fifo, os.O_RDWR | os.O_NONBLOCK | os.O_CLOEXEC)
+            jobserver = cls(fd, fd, "fifo:" + fifo, jobs, (fd,), fifo)
+        else:
+            read_fd, write_fd = os.pipe()
+            os.set_inheritable(read_fd, True)
+            os.set_inheritable(write_fd, True)
+            private_fd = _private_reader(read_fd)
+            owned = (read_fd, write_fd)
+            if private_fd is not None:
+                owned += (private_fd,)
+            jobserver = cls(
+                read_fd if private_fd is None else private_fd,
+                write_fd,
+                f"{read_fd},{write_fd}",
+                jobs,
+                owned,
+            )
+        if jobs > 1:
+            os.write(jobserver.write_fd, TOKEN * (jobs - 1))
+        return jobserver
+
+    @property
+    def pass_fds(self) -> Tuple[int, ...]:
+        """Descriptors children must inherit to reach this jobserver."""
+        if self.fifo is not None or self.auth.startswith("fifo:"):
+            return ()
+        return tuple(int(fd) for fd in self.auth.split(","))
+
+    def environment(self, environment: Dict[str, str]) -> Dict[str, str]:
+        """Returns copy of environment whose MAKEFLAGS point at this jobserver."""
+        flags = [
+            flag
+            for flag in environment.get("MAKEFLAGS", "").split()
+            if not flag.startswith(("--jobserver-auth=", "--jobserver-fds="))
+            and not (flag.startswith("-j") and self.jobs is not None)
+        ]
+        if self.jobs is not None:
+            flags.append(f"-j{self.jobs}")
+        flags.append("--jobserver-auth=" + self.auth)
+        if self.fifo is None:
+            flags.append("--jobserver-fds=" + self.auth)
+        updated = dict(environment)
+        updated["MAKEFLAGS"] = " ".join(flags)
+        return updated
+
+    def acquire(self) -> Optional[bytes]:
+        """Blocks until a job may start; returns the token to release.
+
+        None stands for the implicit slot. If the jobserver went away the
+        job runs without a token.
+        """
+        while True:
+            with self._lock:
+                if self._implicit_free:
+                    self._implicit_free = False
+                    return None
+            try:
+                ready, _, _ = select.select([self.read_fd], [], [], POLL_INTERVAL)
+            except InterruptedError:
+                continue
+            if not ready:
+                continue
+            try:
+                token = os.read(self.read_fd, 1)
+            except (BlockingIOError, InterruptedError):
+                continue
+            except OSError:
+                return b""
+            return token
+
+    def release(self, token: Optional[bytes]):
+        """Gives back a token returned by acquire()."""
+        if token is None:
+            with self._lock:
+                self._implicit_free = True
+        elif token:
+            os.write(self.write_fd, token)
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        """Holds a job slot for the duration of the block."""
+        token = self.acquire()
+        try:
+            yield
+        finally:
+            self.release(token)
+
+    def close(self):
+        """Closes descriptors and removes the fifo this process opened."""
+        for fd in self._owned:
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+        self._owned = ()
+        if self.fifo is not None:
+            try:
+                os.unlink(self.fifo)
+                os.rmdir(os.path.dirname(self.fifo))
+            except OSError:
+                pass
+            self.fifo = None
+
+
+def parse_makeflags(makeflags: str) -> Optional[str]:
+    """Returns the jobserver auth string of MAKEFLAGS, if any.
+
+    The last occurrence wins, as in make.
+    """
+    auth = None
+    for word in makeflags.split():
+        for prefix in ("--jobserver-auth=", "--jobserver-fds="):
+            if word.startswith(prefix):
+                auth = word[len(prefix) :]
+    return auth or None
+
+
+def _private_reader(fd: int) -> Optional[int]:
+    """Reopens pipe's read end as a private non-blocking description.
+
+    Setting O_NONBLOCK on the shared description would affect make as well;
+    a private one keeps a token taken by another process between select()
+    and read() from blocking us. Returns None where /proc is unavailable.
+    """
+    try:
+        return os.open(
+            f"/proc/self/fd/{fd}", os.O_RDONLY | os.O_NONBLOCK | os.O_CLOEXEC
+        )
+    except OSError:
+        return None
@@ -0,0 +1,226 @@
+import atexit
+import subprocess
+import sys
+import threading
+import time
+import weakref
+from collections import deque
+from pathlib import Path
+from typing import BinaryIO, Callable, Deque, List, Optional
+
+# Called with stream name ("stdout"/"stderr") and one line including its
+# newline; returning False drops the line from the captured buffer.
+LineHandler = Callable[[str, bytes], Optional[bool]]
+
+DEFAULT_OUTPUT_LIMIT = 64 * 1024
+READ_CHUNK = 64 * 1024
+LOG_BUFFER = 256 * 1024
+
+
+class RingBuffer:
+    """Class for keeping only the last limit bytes written to it."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.total = 0
+        self._chunks: Deque[bytes] = deque()
+        self._size = 0
+
+    def write(self, data: bytes):
+        """Appends data, discarding the oldest bytes beyond the limit."""
+        if not data:
+            return
+        self.total += len(data)
+        if len(data) >= self.limit:
+            self._chunks.clear()
+            self._chunks.append(data[-self.limit :])
+            self._size = min(len(data), self.limit)
+            return
+        self._chunks.append(data)
+        self._size += len(data)
+        while self._size - len(self._chunks[0]) >= self.limit:
+            self._size -= len(self._chunks.popleft())
+
+    @property
+    def truncated(self) -> bool:
+        return self.total > self.limit
+
+    def getvalue(self) -> bytes:
+        """Returns retained bytes, at most limit of them."""
+        data = b"".join(self._chunks)
+        return data[-self.limit :] if len(data) > self.limit else data
+
+
+class StreamCapture:
+    """Class for consuming one output stream of a running command.
+
+    Data is kept in a bounded ring buffer, optionally passed line by line to a
+    handler, mirrored to a console stream and spilled in full to a log file.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        limit: Optional[int],
+        on_line: Optional[LineHandler] = None,
+        log: Optional["CommandLog"] = None,
+        passthrough: Optional[BinaryIO] = None,
+    ):
+        self.name = name
+        self.buffer = RingBuffer(limit) if limit else None
+        self.on_line = on_line
+        self.log = log
+        self.passthrough = passthrough
+        self._chunks: List[bytes] = []
+        self._partial = b""
+
+    def feed(self, data: bytes):
+        """Processes chunk read from the stream."""
+        if self.log is not None:
+            self.log.write(data)
+        if self.passthrough is not None:
+            self.passthrough.write(data)
+            self.passthrough.flush()
+        if self.on_line is None:
+            self._keep(data)
+            return
+        lines = (self._partial + data).split(b"\n")
+        self._partial = lines.pop()
+        for line in lines:
+            self._line(line + b"\n")
+
+    def finish(self):
+        """Flushes an unterminated last line."""
+        if self._partial:
+            self._line(self._partial)
+            self._partial = b""
+
+    def value(self) -> bytes:
+        """Returns captured output."""
+        if self.buffer is not None:
+            return self.buffer.getvalue()
+        return b"".join(self._chunks)
+
+    @property
+    def truncated(self) -> bool:
+        return self.buffer is not None and self.buffer.truncated
+
+    def _line(self, line: bytes):
+        if self.on_line(self.name, line) is not False:
+            self._keep(line)
+
+    def _keep(self, data: bytes):
+        if self.buffer is not None:
+            self.buffer.write(data)
+        else:
+            self._chunks.append(data)
+
+
+class CommandLog:
+    """Class for spilling full command output to a file with batched writes."""
+
+    def __init__(self, path: Path, command: List[str]):
+        self.path = path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(path, "wb", buffering=LOG_BUFFER)
+        self._lock = threading.Lock()
+        self._file.write(("$ " + " ".join(command) + "\n").encode())
+
+    def write(self, data: bytes):
+        with self._lock:
+            self._file.write(data)
+
+    def close(self, returncode: int):
+        with self._lock:
+            self._file.write(f"\n[exit code {returncode}]\n".encode())
+            self._file.close()
+
+
+class CapturedProcess(subprocess.CompletedProcess):
+    """Completed command with its captured output and resource usage.
+
+    cpu_time (user + system seconds) and max_rss_kb (peak resident set size)
+    are None where the platform does not report per-child usage. timed_out
+    tells whether the command was terminated for exceeding its timeout.
+    """
+
+    def __init__(
+        self,
+        args: List[str],
+        returncode: int,
+        stdout: Optional[bytes],
+        stderr: Optional[bytes],
+        log_path: Optional[Path] = None,
+        truncated: bool = False,
+        cpu_time: Optional[float] = None,
+        max_rss_kb: Optional[int] = None,
+        timed_out: bool = False,
+    ):
+        super().__init__(args, returncode, stdout, stderr)
+        self.log_path = log_path
+        self.truncated = truncated
+        self.cpu_time = cpu_time
+        self.max_rss_kb = max_rss_kb
+        self.timed_out = timed_out
+
+
+class ConsoleLog:
+    """Class for batching build messages written to the console.
+
+    Messages are buffered and flushed once the buffer grows, after a short
+    interval, before the other stream is written, and at interpreter exit.
+    Callers flush explicitly before a child process inherits the console.
+    """
+
+    def __init__(self, max_buffer: int = 64 * 1024, max_delay: float = 0.1):
+        self.max_buffer = max_buffer
+        self.max_delay = max_delay
+        self._pending: List[str] = []
+        self._pending_size = 0
+        self._pending_stream = None
+        self._last_flush = time.monotonic()
+        self._lock = threading.RLock()
+        _consoles.add(self)
+
+    def write(self, text: str, error: bool = False):
+        """Queues text for stdout (or stderr when error is set)."""
+        stream = sys.stderr if error else sys.stdout
+        with self._lock:
+            if self._pending_stream is not stream:
+                self.flush()
+                self._pending_stream = stream
+            self._pending.append(text)
+            self._pending_size += len(text)
+            if (
+                self._pending_size >= self.max_buffer
+                or time.monotonic() - self._last_flush >= self.max_delay
+            ):
+                self.flush()
+
+    def line(self, *parts: str):
+        """Queues space separated message line, like print()."""
+        self.write(" ".join(parts) + "\n")
+
+    def flush(self):
+        """Writes queued text out."""
+        with self._lock:
+            if self._pending and self._pending_stream is not None:
+                self._pending_stream.write("".join(self._pending))
+                self._pending_stream.flush()
+            self._pending = []
+            self._pending_size = 0
+            self._last_flush = time.monotonic()
+
+
+# Consoles still in use; one exit hook flushes them without keeping
+# discarded consoles alive.
+_consoles: "weakref.WeakSet[ConsoleLog]" = weakref.WeakSet()
+
+
+def _flush_consoles():
+    """Writes out text still queued in any console at interpreter exit."""
+    for console in list(_consoles):
+        console.flush()
+
+
+atexit.register(_flush_consoles)
@@ -0,0 +1,344 @@
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import threading
+from typing import BinaryIO, Dict, List, Optional, Tuple
+
+SPAWN_BACKENDS = ("auto", "subprocess", "posix_spawn")
+
+# Signals Python ignores that children get back at their default action,
+# as subprocess does with restore_signals.
+_DEFAULT_SIGNALS = tuple(
+    getattr(signal, name) for name in ("SIGPIPE", "SIGXFSZ") if hasattr(signal, name)
+)
+# Flags of posix_spawnattr_t placing the child in the group set by setpgroup
+# and resetting the signals set by setsigdefault.
+_POSIX_SPAWN_SETPGROUP = 0x02
+_POSIX_SPAWN_SETSIGDEF = 0x04
+# Generous size for the opaque posix_spawn_file_actions_t and posix_spawnattr_t.
+_SPAWN_STRUCT_SIZE = 1024
+
+
+class SpawnedProcess:
+    """Child started with os.posix_spawn, exposing the Popen subset we use."""
+
+    def __init__(
+        self,
+        args: List[str],
+        pid: int,
+        stdout: Optional[BinaryIO] = None,
+        stderr: Optional[BinaryIO] = None,
+    ):
+        self.args = args
+        self.pid = pid
+        self.stdout = stdout
+        self.stderr = stderr
+        self.returncode: Optional[int] = None
+
+    def wait(self) -> int:
+        if self.returncode is None:
+            # Raises ChildProcessError if the status was reaped elsewhere.
+            _, status = os.waitpid(self.pid, 0)
+            self.returncode = exit_code(status)
+        return self.returncode
+
+    def kill(self):
+        if self.returncode is None:
+            try:
+                os.kill(self.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+
+
+class ProcessSpawner:
+    """Class for starting child processes through a configurable backend.
+
+    The posix_spawn backend starts children without forking the (possibly
+    large) hook process. Executable lookups are cached per PATH. A child
+    needing a working directory other than ours is started through libc's
+    posix_spawn with a chdir file action, which os.posix_spawn lacks; where
+    libc has no such action it is started with subprocess instead. The
+    subprocess backend uses subprocess.Popen; auto picks posix_spawn where
+    available.
+    """
+
+    def __init__(self, backend: str = "auto"):
+        if backend not in SPAWN_BACKENDS:
+            raise ValueError(f"Unknown spawn backend: {backend!r}")
+        if backend == "auto":
+            backend = "posix_spawn" if hasattr(os, "posix_spawn") else "subprocess"
+        elif backend == "posix_spawn" and not hasattr(os, "posix_spawn"):
+            raise ValueError("posix_spawn is not available on this platform")
+        self.backend = backend
+        self._executables: Dict[Tuple[str, str], str] = {}
+        self._libc: Optional[_LibcSpawn] = None
+        self._libc_loaded = False
+        self._lock = threading.Lock()
+
+    def spawn(
+        self,
+        command: List[str],
+        environment: Dict[str, str],
+        working_directory: str,
+        pipes: bool,
+        pass_fds: Tuple[int, ...] = (),
+        new_group: bool = False,
+    ):
+        """Starts command; with pipes its stdout and stderr are readable streams.
+
+        pass_fds must be inheritable descriptors; posix_spawn children inherit
+        them anyway, subprocess children only when listed. With new_group the
+        child leads a new process group, so it and everything it starts can
+        be signalled together (see signal_process).
+        """
+        new_group = new_group and hasattr(os, "killpg")
+        if self.backend == "subprocess":
+            return self._popen(
+                command, environment, working_directory, pipes, pass_fds, new_group
+            )
+
+        path = self.resolve(command[0], environment.get("PATH", os.defpath))
+        chdir = None
+        if os.path.realpath(working_directory) != os.getcwd():
+            if not os.path.isdir(working_directory):
+                raise FileNotFoundError(
+                    f"No such working directory: {working_directory!r}"
+                )
+            if self._libc_spawn() is None:
+                return self._popen(
+                    command, environment, working_directory, pipes, pass_fds, new_group
+                )
+            chdir = working_directory
+
+        if not pipes:
+            pid = self._posix_spawn(path, command, environment, [], chdir, new_group)
+            return SpawnedProcess(command, pid)
+
+        stdout_read, stdout_write = os.pipe()
+        stderr_read, stderr_write = os.pipe()
+        try:
+            pid = self._posix_spawn(
+                path,
+                command,
+                environment,
+                [(stdout_write, 1), (stderr_write, 2)],
+                chdir,
+                new_group,
+            )
+        except BaseException:
+            os.close(stdout_read)
+            os.close(stderr_read)
+            raise
+        finally:
+            os.close(stdout_write)
+            os.close(stderr_write)
+        return SpawnedProcess(
+            command, pid, os.fdopen(stdout_read, "rb"), os.fdopen(stderr_read, "rb")
+        )
+
+    def resolve(self, executable: str, search_path: str) -> str:
+        """Finds executable on search_path the way subprocess would, cached."""
+        if os.sep in executable or (os.altsep and os.altsep in executable):
+            return executable
+        key = (executable, search_path)
+        path = self._executables.get(key)
+        if path is None:
+            path = shutil.which(executable, path=search_path)
+            if path is None:
+                raise FileNotFoundError(f"No such file or directory: {executable!r}")
+            with self._lock:
+                self._executables[key] = path
+        return path
+
+    def _posix_spawn(
+        self,
+        path: str,
+        argv: List[str],
+        environment: Dict[str, str],
+        redirects: List[Tuple[int, int]],
+        chdir: Optional[str],
+        new_group: bool,
+    ) -> int:
+        """Starts child with descriptors redirected (and directory changed)."""
+        if chdir is not None:
+            return self._libc_spawn().spawn(
+                path, argv, environment, redirects, chdir, new_group
+            )
+        group_options = {"setsigdef": _DEFAULT_SIGNALS}
+        if new_group:
+            group_options["setpgroup"] = 0
+        file_actions = [(os.POSIX_SPAWN_DUP2, fd, target) for fd, target in redirects]
+        if file_actions:
+            group_options["file_actions"] = file_actions
+        return os.posix_spawn(path, argv, environment, **group_options)
+
+    @staticmethod
+    def _popen(
+        command: List[str],
+        environment: Dict[str, str],
+        working_directory: str,
+        pipes: bool,
+        pass_fds: Tuple[int, ...],
+        new_group: bool,
+    ) -> subprocess.Popen:
+        """Starts child with subprocess.Popen."""
+        output = subprocess.PIPE if pipes else None
+        group_options = {}
+        if new_group:
+            if sys.version_info >= (3, 11):
+                group_options["process_group"] = 0
+            else:
+                group_options["start_new_session"] = True
+        return subprocess.Popen(
+            command,
+            stdout=output,
+            stderr=output,
+            env=environment,
+            cwd=working_directory,
+            pass_fds=pass_fds,
+            **group_options,
+        )
+
+    def _libc_spawn(self) -> Optional["_LibcSpawn"]:
+        """Returns libc posix_spawn binding with chdir support, if available."""
+        if not self._libc_loaded:
+            with self._lock:
+                if not self._libc_loaded:
+                    try:
+                        self._libc = _LibcSpawn()
+                    except (OSError, AttributeError):
+                        self._libc = None
+                    self._libc_loaded = True
+        return self._libc
+
+
+class _LibcSpawn:
+    """Minimal ctypes binding of posix_spawn with the chdir file action.
+
+    posix_spawn_file_actions_addchdir_np is available in glibc 2.29+ and
+    macOS 10.15+; constructing the binding raises AttributeError without it.
+    """
+
+    def __init__(self):
+        import ctypes
+        import ctypes.util
+
+        self._ctypes = ctypes
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        struct = ctypes.c_void_p
+        self._actions_init = libc.posix_spawn_file_actions_init
+        self._actions_init.argtypes = [struct]
+        self._actions_destroy = libc.posix_spawn_file_actions_destroy
+        self._actions_destroy.argtypes = [struct]
+        self._add_dup2 = libc.posix_spawn_file_actions_adddup2
+        self._add_dup2.argtypes = [struct, ctypes.c_int, ctypes.c_int]
+        self._add_chdir = libc.posix_spawn_file_actions_addchdir_np
+        self._add_chdir.argtypes = [struct, ctypes.c_char_p]
+        self._attr_init = libc.posix_spawnattr_init
+        self._attr_init.argtypes = [struct]
+        self._attr_destroy = libc.posix_spawnattr_destroy
+        self._attr_destroy.argtypes = [struct]
+        self._set_flags = libc.posix_spawnattr_setflags
+        self._set_flags.argtypes = [struct, ctypes.c_short]
+        self._set_pgroup = libc.posix_spawnattr_setpgroup
+        self._set_pgroup.argtypes = [struct, ctypes.c_int]
+        self._set_sigdefault = libc.posix_spawnattr_setsigdefault
+        self._set_sigdefault.argtypes = [struct, struct]
+        self._sigemptyset = libc.sigemptyset
+        self._sigemptyset.argtypes = [struct]
+        self._sigaddset = libc.sigaddset
+        self._sigaddset.argtypes = [struct, ctypes.c_int]
+        self._spawn = libc.posix_spawn
+        self._spawn.argtypes = [
+            ctypes.POINTER(ctypes.c_int),
+            ctypes.c_char_p,
+            struct,
+            struct,
+            ctypes.POINTER(ctypes.c_char_p),
+            ctypes.POINTER(ctypes.c_char_p),
+        ]
+
+    def spawn(
+        self,
+        path: str,
+        argv: List[str],
+        environment: Dict[str, str],
+        redirects: List[Tuple[int, int]],
+        chdir: str,
+        new_group: bool,
+    ) -> int:
+        """Starts child in directory chdir; returns its pid."""
+        ctypes = self._ctypes
+        actions = ctypes.create_string_buffer(_SPAWN_STRUCT_SIZE)
+        attributes = ctypes.create_string_buffer(_SPAWN_STRUCT_SIZE)
+        _check(self._actions_init(actions))
+        try:
+            _check(self._attr_init(attributes))
+            try:
+                for fd, target in redirects:
+                    _check(self._add_dup2(actions, fd, target))
+                _check(self._add_chdir(actions, os.fsencode(chdir)))
+                signals = ctypes.create_string_buffer(_SPAWN_STRUCT_SIZE)
+                self._sigemptyset(signals)
+                for signum in _DEFAULT_SIGNALS:
+                    self._sigaddset(signals, signum)
+                _check(self._set_sigdefault(attributes, signals))
+                flags = _POSIX_SPAWN_SETSIGDEF
+                if new_group:
+                    flags |= _POSIX_SPAWN_SETPGROUP
+                    _check(self._set_pgroup(attributes, 0))
+                _check(self._set_flags(attributes, flags))
+                pid = ctypes.c_int()
+                _check(
+                    self._spawn(
+                        ctypes.byref(pid),
+                        os.fsencode(path),
+                        actions,
+                        attributes,
+                        _strings([os.fsencode(arg) for arg in argv]),
+                        _strings(
+                            [
+                                os.fsencode(key) + b"=" + os.fsencode(value)
+                                for key, value in environment.items()
+                            ]
+                        ),
+                    )
+                )
+                return pid.value
+            finally:
+                self._attr_destroy(attributes)
+        finally:
+            self._actions_destroy(actions)
+
+
+def _check(result: int):
+    """Raises OSError for the error number returned by a posix_spawn call."""
+    if result != 0:
+        raise OSError(result, os.strerror(result))
+
+
+def _strings(values: List[bytes]):
+    """Returns NULL-terminated char * array of values."""
+    import ctypes
+
+    return (ctypes.c_char_p * (len(values) + 1))(*values, None)
+
+
+def exit_code(status: int) -> int:
+    """Converts wait status into returncode as reported by subprocess."""
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
+def signal_process(process, signum: int, group: bool = False):
+    """Sends signal to process, or to its whole process group with group."""
+    try:
+        if group:
+            os.killpg(process.pid, signum)
+        else:
+            os.kill(process.pid, signum)
+    except (ProcessLookupError, PermissionError):
+        pass
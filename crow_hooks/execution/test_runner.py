@@ -0,0 +1,368 @@
+import math
+import mmap
+import os
+import re
+import time
+import xml.etree.ElementTree as ElementTree
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence
+from ..tracing import tracer
+from .build_executor import BuildCancelled, BuildExecutor
+
+TEST_FRAMEWORKS = ("auto", "gtest", "catch2", "plain")
+
+DEFAULT_TIMEOUT = 300.0
+
+# Output kept in memory per test; the full output goes to its log file.
+TEST_OUTPUT_LIMIT = 64 * 1024
+
+# Tests whose last run took less than this many seconds are not sharded.
+MIN_SHARD_SECONDS = 1.0
+
+# Assumed duration of a test that has never run, in seconds.
+DEFAULT_TEST_COST = 1.0
+
+# Strings only present in binaries linked against the framework's runner.
+_FRAMEWORK_MARKERS = (
+    ("gtest", b"GTEST_SHARD_INDEX"),
+    ("catch2", b"--shard-count"),
+)
+
+
+class TestSpec(NamedTuple):
+    """Test binary with how to run it; framework is one of TEST_FRAMEWORKS."""
+
+    name: str
+    path: Path
+    args: List[str]
+    framework: str
+    shards: Optional[int]
+    timeout: Optional[float]
+    env: Dict[str, str]
+    cwd: Optional[str] = None
+
+
+class TestResult(NamedTuple):
+    """Outcome of one test binary or one shard of it."""
+
+    name: str
+    command: List[str]
+    status: str
+    returncode: Optional[int]
+    duration: float
+    output: str
+    log_path: Optional[Path]
+    report: Optional[Path] = None
+
+    @property
+    def passed(self) -> bool:
+        return self.status == "passed"
+
+
+class TestsFailed(RuntimeError):
+    """Raised when one or more tests fail or time out."""
+
+    def __init__(self, results: List[TestResult]):
+        self.results = results
+        failed = [result for result in results if not result.passed]
+        lines = [f"{len(failed)} of {len(results)} test(s) failed:"]
+        for result in failed:
+            lines.append(f"  {result.name} ({result.status})")
+        super().__init__("\n".join(lines))
+
+
+class _TestJob(NamedTuple):
+    name: str
+    spec: TestSpec
+    command: List[str]
+    env: Dict[str, str]
+    report: Optional[Path]
+
+
+class TestRunner:
+    """Class for running test binaries in parallel.
+
+    Tests using GoogleTest or Catch2 (v3) are split into shards which run as
+    separate processes; every job gets a timeout, keeps only the tail of its
+    output in memory (the full output goes to a log file) and jobs that took
+    longest last time start first. Results are summarized as JUnit XML,
+    including the individual test cases reported by GoogleTest.
+    """
+
+    def __init__(
+        self,
+        executor: BuildExecutor,
+        state: "BuildStateDatabase",
+        build_directory: Path,
+    ):
+        self.executor = executor
+        self.state = state
+        self.build_directory = build_directory
+        self._frameworks: Dict[str, str] = {}
+
+    def run(
+        self,
+        specs: Sequence[TestSpec],
+        jobs: Optional[int] = None,
+        shards: Optional[int] = None,
+        timeout: Optional[float] = None,
+        junit_path: Optional[Path] = None,
+    ) -> List[TestResult]:
+        """Runs tests on a worker pool; results are in the order of specs.
+
+        A test's own timeout takes precedence over timeout, which defaults
+        to DEFAULT_TIMEOUT.
+        """
+        jobs = jobs or os.cpu_count() or 1
+        # Without history, spread the worker pool over the tests.
+        default_shards = max(1, jobs // max(1, len(specs)))
+        test_jobs = [
+            job
+            for spec in specs
+            for job in self._jobs(spec, shards or spec.shards, jobs, default_shards)
+        ]
+        longest_first = sorted(test_jobs, key=lambda job: -self._estimate(job))
+        log_directory = self.build_directory / "test_logs"
+        log_directory.mkdir(parents=True, exist_ok=True)
+
+        results: Dict[str, TestResult] = {}
+        start = time.perf_counter()
+        with self.executor.cancel_scope(), ThreadPoolExecutor(
+            max_workers=max(1, min(jobs, len(test_jobs) or 1))
+        ) as pool:
+            futures = {
+                pool.submit(
+                    self._run_job,
+                    job,
+                    job.spec.timeout or timeout or DEFAULT_TIMEOUT,
+                    log_directory,
+                ): job
+                for job in longest_first
+            }
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except BuildCancelled:
+                    continue
+                results[result.name] = result
+                self._report(result)
+        elapsed = time.perf_counter() - start
+
+        ordered = [results[job.name] for job in test_jobs if job.name in results]
+        for spec in specs:
+            durations = [
+                results[job.name].duration
+                for job in test_jobs
+                if job.spec is spec and job.name in results
+            ]
+            if durations:
+                self.state.record_duration("test:" + spec.name, sum(durations))
+        self.state.save()
+
+        self.write_junit(
+            ordered, junit_path or self.build_directory / "test_results.xml"
+        )
+        passed = sum(result.passed for result in ordered)
+        self.executor.console.line(
+            f"[test] {passed}/{len(ordered)} passed in {elapsed:.2f}s"
+        )
+        self.executor.console.flush()
+        if len(ordered) < len(test_jobs):
+            raise BuildCancelled("Test run cancelled")
+        return ordered
+
+    def framework(self, spec: TestSpec) -> str:
+        """Returns framework of test, detecting it from the binary for auto."""
+        if spec.framework != "auto":
+            return spec.framework
+        key = str(spec.path)
+        if key not in self._frameworks:
+            self._frameworks[key] = detect_framework(spec.path)
+        return self._frameworks[key]
+
+    def _jobs(
+        self, spec: TestSpec, shards: Optional[int], jobs: int, default_shards: int
+    ) -> List[_TestJob]:
+        """Splits test into shard jobs where its framework supports it."""
+        framework = self.framework(spec)
+        command = [str(spec.path)] + spec.args
+        if framework == "plain":
+            return [_TestJob(spec.name, spec, command, dict(spec.env), None)]
+        if shards is None:
+            last = self.state.duration("test:" + spec.name)
+            if last is None:
+                shards = default_shards
+            else:
+                shards = min(jobs, max(1, math.ceil(last / MIN_SHARD_SECONDS)))
+        shards = max(1, shards)
+
+        test_jobs = []
+        for index in range(shards):
+            name = spec.name if shards == 1 else f"{spec.name}[{index + 1}/{shards}]"
+            env = dict(spec.env)
+            shard_command = list(command)
+            report = None
+            if framework == "gtest":
+                report = self.build_directory / "test_logs" / f"{_file_name(name)}.xml"
+                env["GTEST_OUTPUT"] = "xml:" + str(report)
+                if shards > 1:
+                    env["GTEST_TOTAL_SHARDS"] = str(shards)
+                    env["GTEST_SHARD_INDEX"] = str(index)
+            elif shards > 1:
+                # Shards may outnumber test cases; empty ones must still pass.
+                shard_command += ["--shard-count", str(shards)]
+                shard_command += ["--shard-index", str(index)]
+                shard_command += ["--allow-running-no-tests"]
+            test_jobs.append(_TestJob(name, spec, shard_command, env, report))
+        return test_jobs
+
+    def _estimate(self, job: _TestJob) -> float:
+        """Returns expected seconds of job from previous runs."""
+        duration = self.state.duration("test:" + job.name)
+        if duration is not None:
+            return duration
+        total = self.state.duration("test:" + job.spec.name)
+        if total is None:
+            return DEFAULT_TEST_COST
+        shards = re.search(r"\[\d+/(\d+)\]$", job.name)
+        return total / int(shards.group(1)) if shards else total
+
+    def _run_job(
+        self, job: _TestJob, timeout: float, log_directory: Path
+    ) -> TestResult:
+        """Runs one test job and records its duration."""
+        if job.report is not None:
+            try:
+                job.report.unlink()
+            except OSError:
+                pass
+        start = time.perf_counter()
+        with tracer.span(job.name, "test"):
+            result = self.executor.execute_command(
+                job.command,
+                check_success=False,
+                capture_output=True,
+                custom_environment=job.env or None,
+                working_directory=job.spec.cwd,
+                echo=False,
+                output_limit=TEST_OUTPUT_LIMIT,
+                log_path=log_directory / (_file_name(job.name) + ".log"),
+                timeout=timeout,
+            )
+        duration = time.perf_counter() - start
+        self.state.record_duration("test:" + job.name, duration)
+
+        if result.timed_out:
+            status = "timeout"
+        elif result.returncode == 0:
+            status = "passed"
+        else:
+            status = "failed"
+        output = (result.stdout or b"") + (result.stderr or b"")
+        return TestResult(
+            job.name,
+            job.command,
+            status,
+            result.returncode,
+            duration,
+            output.decode(errors="replace"),
+            result.log_path,
+            job.report if job.report is not None and job.report.exists() else None,
+        )
+
+    def _report(self, result: TestResult):
+        """Prints one line per finished job, plus the output tail of failures."""
+        console = self.executor.console
+        label = {"passed": "PASS", "failed": "FAIL", "timeout": "TIMEOUT"}
+        console.line(
+            f"[test] {label[result.status]} {result.name} ({result.duration:.2f}s)"
+        )
+        if not result.passed:
+            if result.output:
+                console.write(result.output, True)
+            if result.log_path is not None:
+                console.line("[test] full log:", str(result.log_path))
+        console.flush()
+
+    @staticmethod
+    def write_junit(results: List[TestResult], path: Path):
+        """Writes results as JUnit XML.
+
+        Test cases from GoogleTest's own XML reports are included; a job
+        without a usable report (other frameworks, crashes, timeouts) becomes
+        one test case of the "crow" suite.
+        """
+        root = ElementTree.Element("testsuites")
+        suite = ElementTree.SubElement(root, "testsuite", name="crow")
+        for result in results:
+            reports = _read_report(result.report) if result.status != "timeout" else []
+            for report in reports:
+                report.set("name", f"{result.name}.{report.get('name')}")
+                root.append(report)
+            reported_failure = any(
+                report.find(".//failure") is not None for report in reports
+            )
+            if reports and (result.passed or reported_failure):
+                continue
+
+            case = ElementTree.SubElement(
+                suite,
+                "testcase",
+                classname=result.name.split("[")[0],
+                name=result.name,
+                time=f"{result.duration:.3f}",
+            )
+            if result.status == "timeout":
+                ElementTree.SubElement(case, "error", message="timed out")
+            elif result.status == "failed":
+                ElementTree.SubElement(
+                    case, "failure", message=f"exit code {result.returncode}"
+                )
+            if result.output:
+                ElementTree.SubElement(case, "system-out").text = result.output
+
+        suite.set("tests", str(len(suite)))
+        suite.set("failures", str(len(suite.findall("testcase/failure"))))
+        suite.set("errors", str(len(suite.findall("testcase/error"))))
+        if not len(suite):
+            root.remove(suite)
+        suites = list(root)
+        for key in ("tests", "failures", "errors"):
+            root.set(key, str(sum(int(item.get(key) or 0) for item in suites)))
+        root.set("time", f"{sum(result.duration for result in results):.3f}")
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        ElementTree.ElementTree(root).write(temp_path, "utf-8", xml_declaration=True)
+        os.replace(temp_path, path)
+
+
+def detect_framework(path: Path) -> str:
+    """Guesses test framework of binary from strings its runner embeds."""
+    try:
+        with open(path, "rb") as binary, mmap.mmap(
+            binary.fileno(), 0, access=mmap.ACCESS_READ
+        ) as data:
+            for framework, marker in _FRAMEWORK_MARKERS:
+                if data.find(marker) != -1:
+                    return framework
+    except (OSError, ValueError):
+        pass
+    return "plain"
+
+
+def _read_report(path: Optional[Path]) -> List[Any]:
+    """Returns testsuite elements of GoogleTest XML report, if readable."""
+    if path is None:
+        return []
+    try:
+        root = ElementTree.parse(path).getroot()
+    except (OSError, ElementTree.ParseError):
+        return []
+    return [root] if root.tag == "testsuite" else list(root.iter("testsuite"))
+
+
+def _file_name(name: str) -> str:
+    """Returns job name usable as file name."""
+    return re.sub(r"[^\w.-]+", "_", name).strip("_")
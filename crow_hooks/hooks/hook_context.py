@@ -1,16 +1,71 @@
 import os
 import platform
+from functools import cached_property
 from pathlib import Path
-from typing import List, Optional, Dict, Any
+from typing import TYPE_CHECKING, Callable, List, Optional, Dict, Any, Set, Tuple, Union
 
-from ..discovery import ProjectLocator, SourceDiscoverer, CompilerDetector
 from ..config import ConfigurationManager
-from ..execution import BuildExecutor, FileManager
-from ..compilation import BuildArtifactManager, CompilationManager
+from ..discovery.project_locator import ProjectLocator
+from ..tracing import BuildTracer, tracer
+
+if TYPE_CHECKING:
+    import subprocess
+    from ..compilation import (
+        BuildArtifactManager,
+        CompilationManager,
+        IncludeResolver,
+        ObjectCache,
+    )
+    from ..discovery import (
+        SourceDiscoverer,
+        CompilerDetector,
+        CompilerInfo,
+        FileChanges,
+        FileWalker,
+    )
+    from ..execution import BuildExecutor, FileManager, TestResult
+    from ..execution.output_capture import LineHandler
+    from ..execution.test_runner import TestSpec
+    from ..remote import RemoteExecutor
 
 
 class HookContext:
-    """Context available inside hook scripts - Public User API."""
+    """Context available inside hook scripts - Public User API.
+
+    Discovery results, configuration and managers are computed on first access
+    and memoized; call invalidate() to have them recomputed.
+    """
+
+    # Memoized attributes that must be dropped when the key is invalidated.
+    _DEPENDENTS: Dict[str, Tuple[str, ...]] = {
+        "config": (
+            "cflags",
+            "_file_walker",
+            "_object_cache",
+            "_build_executor",
+            "_include_resolver",
+            "_remote_executor",
+        ),
+        "env": ("_build_executor",),
+        "sources": (),
+        "include_dirs": ("_include_resolver", "_compilation_manager"),
+        "compiler": ("_compilation_manager",),
+        "cflags": ("_compilation_manager",),
+        "_build_executor": ("_compilation_manager",),
+        "_file_walker": ("_source_discoverer", "_file_manager"),
+        "_source_discoverer": ("sources", "include_dirs"),
+        "_compiler_detector": (
+            "compiler",
+            "cflags",
+            "_remote_executor",
+            "_compilation_manager",
+        ),
+        "_file_manager": ("_compilation_manager",),
+        "_object_cache": ("_compilation_manager",),
+        "_include_resolver": ("_compilation_manager",),
+        "_remote_executor": ("_compilation_manager",),
+        "_compilation_manager": (),
+    }
 
     def __init__(self, start_dir: Optional[str] = None):
         self._locator = ProjectLocator(start_dir)
@@ -20,48 +75,242 @@ class HookContext:
         self.project_root = self._locator.find_project_root() or self.start_dir
 
         self.crow_toml_path = self.project_root / "crow.toml"
-        self.config = (
+
+        self.build_dir = Path(
+            os.environ.get("CROW_BUILD_DIR", str(self.project_root / "build"))
+        )
+        self.os = platform.system().lower()
+
+        self._tests: Dict[str, Dict[str, Any]] = {}
+
+        self.tracer: BuildTracer = tracer
+        if os.environ.get("CROW_TRACE"):
+            self.tracer.enable(Path(os.environ["CROW_TRACE"]))
+
+    @cached_property
+    def config(self) -> Dict[str, Any]:
+        """Parsed crow.toml contents."""
+        return (
             self._config_manager.load_toml(self.crow_toml_path)
             if self.crow_toml_path.exists()
             else {}
         )
 
-        self.env = dict(os.environ)
+    @cached_property
+    def env(self) -> Dict[str, str]:
+        """Environment passed to executed commands."""
+        return dict(os.environ)
 
-        self.build_dir = Path(
-            os.environ.get("CROW_BUILD_DIR", str(self.project_root / "build"))
+    @cached_property
+    def sources(self) -> List[str]:
+        """Project source files."""
+        return self._source_discoverer.discover_source_files()
+
+    @cached_property
+    def include_dirs(self) -> List[str]:
+        """Project header directories."""
+        return self._source_discoverer.discover_include_directories()
+
+    @cached_property
+    def compiler(self) -> Dict[str, str]:
+        """Detected C and C++ compilers."""
+        return self._compiler_detector.detect_compilers()
+
+    @cached_property
+    def cflags(self) -> Dict[str, List[str]]:
+        """Compiler and linker flags."""
+        return self._compiler_detector.collect_compiler_flags(self.config)
+
+    @property
+    def targets(self) -> Dict[str, Dict[str, Any]]:
+        """Artifacts registered by compile calls."""
+        return self._artifact_manager.artifacts
+
+    @cached_property
+    def _file_walker(self) -> "FileWalker":
+        from ..discovery import FileIndex, FileWalker
+
+        discovery_config = self.config.get("discovery", {})
+        index = (
+            FileIndex(self.build_dir / FileIndex.INDEX_FILE)
+            if discovery_config.get("index", True)
+            else None
         )
-        self.os = platform.system().lower()
+        return FileWalker(
+            self.project_root,
+            self.build_dir,
+            discovery_config.get("exclude", []),
+            discovery_config.get("gitignore", True),
+            index,
+        )
+
+    @cached_property
+    def _source_discoverer(self) -> "SourceDiscoverer":
+        from ..discovery import SourceDiscoverer
+
+        return SourceDiscoverer(self.project_root, walker=self._file_walker)
+
+    @cached_property
+    def _compiler_detector(self) -> "CompilerDetector":
+        from ..discovery import CompilerDetector
+
+        return CompilerDetector()
+
+    @cached_property
+    def _file_manager(self) -> "FileManager":
+        from ..execution import FileManager
 
-        self._source_discoverer = SourceDiscoverer(self.project_root)
-        self._compiler_detector = CompilerDetector()
-        self._file_manager = FileManager(self.project_root)
-        self._artifact_manager = BuildArtifactManager(self.project_root)
-        self._build_executor = BuildExecutor(self.project_root, self.env)
-        self._artifact_manager.prepare_build_directory()
+        return FileManager(self.project_root, self._file_walker)
 
-        self.sources = self._source_discoverer.discover_source_files()
-        self.include_dirs = self._source_discoverer.discover_include_directories()
-        self.compiler = self._compiler_detector.detect_compilers()
-        self.cflags = self._compiler_detector.collect_compiler_flags(self.config)
+    @cached_property
+    def _artifact_manager(self) -> "BuildArtifactManager":
+        from ..compilation import BuildArtifactManager
 
-        self._compilation_manager = CompilationManager(
+        return BuildArtifactManager(self.project_root)
+
+    @cached_property
+    def _build_executor(self) -> "BuildExecutor":
+        from ..execution import BuildExecutor
+
+        build_config = self.config.get("build", {})
+        backend = os.environ.get("CROW_SPAWN") or build_config.get("spawn", "auto")
+        executor = BuildExecutor(
+            self.project_root,
+            self.env,
+            backend,
+            bool(build_config.get("jobserver", True)),
+        )
+        keep_going = os.environ.get("CROW_KEEP_GOING")
+        executor.keep_going = (
+            keep_going == "1"
+            if keep_going is not None
+            else bool(build_config.get("keep_going", False))
+        )
+        return executor
+
+    @cached_property
+    def _object_cache(self) -> Optional["ObjectCache"]:
+        cache_config = self.config.get("cache", {})
+        enabled = os.environ.get("CROW_OBJECT_CACHE")
+        if not (
+            cache_config.get("enabled", False) if enabled is None else enabled == "1"
+        ):
+            return None
+        from ..compilation.object_cache import DEFAULT_MAX_SIZE, ObjectCache, parse_size
+
+        directory = cache_config.get("directory") or str(
+            ConfigurationManager.cache_directory() / "object_cache"
+        )
+        return ObjectCache(
+            Path(directory).expanduser(),
+            parse_size(cache_config.get("max_size", DEFAULT_MAX_SIZE)),
+            cache_config.get("mode", "direct"),
+        )
+
+    @cached_property
+    def _include_resolver(self) -> Optional["IncludeResolver"]:
+        if not self.config.get("build", {}).get("minimize_includes", False):
+            return None
+        from ..compilation import IncludeResolver
+
+        return IncludeResolver(self.project_root, self.include_dirs, self.build_dir)
+
+    @cached_property
+    def _remote_executor(self) -> Optional["RemoteExecutor"]:
+        from ..remote import RemoteExecutor
+
+        return RemoteExecutor.from_config(self.config, self._compiler_detector.probe)
+
+    @cached_property
+    def _compilation_manager(self) -> "CompilationManager":
+        from ..compilation import CompilationManager, LinkStrategy
+
+        return CompilationManager(
             self._build_executor,
             self._file_manager,
             self._artifact_manager,
             self.compiler,
             self.cflags,
             self.include_dirs,
+            self._compiler_detector.probe,
+            self._object_cache,
+            self._include_resolver,
+            LinkStrategy.from_config(self.config, self._compiler_detector.probe),
+            self._remote_executor,
         )
 
-        self.targets = self._artifact_manager.artifacts
+    def invalidate(self, *names: str):
+        """Drop memoized attributes so they are recomputed on next access.
+
+        Without arguments everything is dropped; otherwise only the named
+        attributes and whatever was derived from them.
+        """
+        pending = list(names or self._DEPENDENTS)
+        while pending:
+            name = pending.pop()
+            if name not in self._DEPENDENTS:
+                raise AttributeError(f"'{name}' is not a lazily computed attribute")
+            self.__dict__.pop(name, None)
+            pending.extend(self._DEPENDENTS[name])
+
+    def run(
+        self,
+        cmd: List[str],
+        check=True,
+        capture_output=False,
+        env=None,
+        cwd=None,
+        on_line: Optional["LineHandler"] = None,
+        output_limit: Optional[int] = None,
+        log_file: Optional[str] = None,
+    ):
+        """Execute a system command.
 
-    def run(self, cmd: List[str], check=True, capture_output=False, env=None, cwd=None):
-        """Execute a system command."""
+        on_line, output_limit or log_file stream the output: lines go to
+        on_line(stream, line), captured output keeps only the last output_limit
+        bytes and the full output is written to log_file.
+        """
         return self._build_executor.execute_command(
+            cmd,
+            check,
+            capture_output,
+            env,
+            cwd,
+            on_line=on_line,
+            output_limit=output_limit,
+            log_path=Path(log_file) if log_file else None,
+        )
+
+    def run_many(
+        self,
+        cmds: List[List[str]],
+        jobs: Optional[int] = None,
+        check=True,
+        capture_output=False,
+        env=None,
+        cwd=None,
+    ) -> List["subprocess.CompletedProcess"]:
+        """Execute system commands concurrently; results keep input order."""
+        return self._build_executor.execute_many(
+            cmds, jobs, check, capture_output, env, cwd
+        )
+
+    async def run_async(
+        self, cmd: List[str], check=True, capture_output=False, env=None, cwd=None
+    ) -> "subprocess.CompletedProcess":
+        """Execute a system command from asyncio code."""
+        return await self._build_executor.execute_command_async(
             cmd, check, capture_output, env, cwd
         )
 
+    def serve_jobserver(self, jobs: Optional[int] = None):
+        """Act as GNU make jobserver with jobs slots for commands run from now on.
+
+        Child make and crow invocations then share the slots with this
+        process. Under a parent make's jobserver its slots are shared instead.
+        """
+        self._build_executor.serve_jobserver(jobs)
+
     def sh(self, cmd: str, **kwargs):
         """Execute a shell command."""
         return self._build_executor.execute_shell_command(cmd, **kwargs)
@@ -70,6 +319,34 @@ class HookContext:
         """Execute crow CLI command directly."""
         return self._build_executor.execute_crow_command(args, **kwargs)
 
+    def compiler_info(self, cxx: bool = True) -> "CompilerInfo":
+        """Probe version, target and flag support of the C or C++ compiler."""
+        compiler = self.compiler["cpp_compiler" if cxx else "c_compiler"]
+        return self._compiler_detector.probe_compiler(compiler)
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """Object cache hit/miss statistics for this process and all-time totals."""
+        cache = self._object_cache
+        if cache is None:
+            return {"enabled": False}
+        return {"enabled": True, "session": dict(cache.stats), "total": cache.totals()}
+
+    def enable_tracing(self, path: Optional[str] = None):
+        """Record spans of commands, discovery and compilation steps.
+
+        With path the Chrome trace is written there at exit; setting the
+        CROW_TRACE environment variable to a path does the same.
+        """
+        self.tracer.enable(Path(path) if path else None)
+
+    def write_trace(self, path: Optional[str] = None) -> Optional[Path]:
+        """Write recorded spans as Chrome trace JSON (chrome://tracing, Perfetto)."""
+        return self.tracer.write(Path(path) if path else None)
+
+    def trace_summary(self, limit: int = 10) -> str:
+        """Tables of the slowest and most memory-hungry translation units."""
+        return self.tracer.summary(limit)
+
     def find_sources(self, patterns: List[str]) -> List[str]:
         """Find source files by patterns."""
         return self._file_manager.find_files_by_patterns(patterns)
@@ -81,11 +358,30 @@ class HookContext:
         extra_cflags: Optional[List[str]] = None,
         extra_ldflags: Optional[List[str]] = None,
         cxx: bool = True,
+        jobs: Optional[int] = None,
+        pch: Optional[str] = None,
+        unity: Union[bool, int] = False,
+        unity_exclude: Optional[List[str]] = None,
     ) -> Path:
-        """Compile an executable target."""
-        return self._compilation_manager.compile_executable(
-            name, sources, extra_cflags, extra_ldflags, cxx
-        )
+        """Compile an executable target.
+
+        pch names a header (relative to the project root) to precompile once
+        and include in every translation unit. unity=True (or a batch size)
+        compiles sources in generated batches; unity_exclude lists globs of
+        sources to keep compiling on their own.
+        """
+        with self.tracer.span(name, "target", type="executable"):
+            return self._compilation_manager.compile_executable(
+                name,
+                sources,
+                extra_cflags,
+                extra_ldflags,
+                cxx,
+                jobs,
+                pch,
+                unity,
+                unity_exclude,
+            )
 
     def compile_library(
         self,
@@ -93,8 +389,284 @@ class HookContext:
         sources: Optional[List[str]] = None,
         static: bool = True,
         extra_flags: Optional[List[str]] = None,
+        jobs: Optional[int] = None,
+        pch: Optional[str] = None,
+        unity: Union[bool, int] = False,
+        unity_exclude: Optional[List[str]] = None,
     ) -> Path:
-        """Compile a library."""
-        return self._compilation_manager.compile_library(
-            name, sources, static, extra_flags
+        """Compile a library; pch and unity work as in compile_target."""
+        with self.tracer.span(name, "target", type="static" if static else "shared"):
+            return self._compilation_manager.compile_library(
+                name, sources, static, extra_flags, jobs, pch, unity, unity_exclude
+            )
+
+    def add_target(
+        self,
+        name: str,
+        sources: Optional[List[str]] = None,
+        deps: Optional[List[str]] = None,
+        **options: Any,
+    ):
+        """Declare an executable built by build(), linking the libraries in deps.
+
+        options are the keyword arguments of compile_target (extra_cflags,
+        extra_ldflags, cxx, pch, unity, unity_exclude).
+        """
+        from ..compilation import TargetSpec
+
+        if "cxx" in options:
+            options["use_cpp"] = options.pop("cxx")
+        self._artifact_manager.declare_target(
+            TargetSpec(
+                name, "executable", list(sources or []), list(deps or []), options
+            )
+        )
+
+    def add_library(
+        self,
+        name: str,
+        sources: Optional[List[str]] = None,
+        static: bool = True,
+        deps: Optional[List[str]] = None,
+        **options: Any,
+    ):
+        """Declare a library built by build(); options as for compile_library."""
+        from ..compilation import TargetSpec
+
+        kind = "static" if static else "shared"
+        self._artifact_manager.declare_target(
+            TargetSpec(name, kind, list(sources or []), list(deps or []), options)
+        )
+
+    def build(self, *names: str, jobs: Optional[int] = None) -> Dict[str, Path]:
+        """Build declared targets (all by default) and their dependencies.
+
+        Independent targets and all translation units share jobs slots;
+        targets on the longest path, judged by previous build times, go first.
+        [build] max_load and job_memory in crow.toml hold back further jobs
+        while the load average is too high or memory runs low. The first
+        failure stops the build unless [build] keep_going is set (or
+        CROW_KEEP_GOING=1), in which case every failure is collected.
+        """
+        from ..compilation import ResourceLimits, TargetScheduler
+
+        scheduler = TargetScheduler(
+            self._compilation_manager, ResourceLimits.from_config(self.config)
+        )
+        return scheduler.build(self._artifact_manager.declared_targets, names, jobs)
+
+    def affected_targets(self, changes: "FileChanges") -> Dict[str, List[str]]:
+        """Map changed files to declared targets that must be rebuilt.
+
+        Returns the stale objects of each affected target (empty when only
+        its link step is stale). Added or removed files, crow.toml and inputs
+        of outputs not owned by a target (e.g. precompiled headers) affect
+        every target. Consumers of affected libraries are included.
+        """
+        declared = self._artifact_manager.declared_targets
+        everything = {name: [] for name in declared}
+        if changes.added or changes.removed or "crow.toml" in changes.modified:
+            return everything
+
+        owners: Dict[str, List[str]] = {}
+        for name, artifact in self.targets.items():
+            if name in declared:
+                for object_file in artifact.get("objects", []):
+                    owners.setdefault(str(object_file), []).append(name)
+
+        sources = {
+            name: {self._relative_source(source) for source in spec.sources}
+            for name, spec in declared.items()
+        }
+        affected: Dict[str, Set[str]] = {}
+        state = self._artifact_manager.build_state
+        for path in changes.modified:
+            for name, spec in declared.items():
+                if path in sources[name]:
+                    affected.setdefault(name, set())
+            for object_file in state.dependents_of(str(self.project_root / path)):
+                if object_file not in owners:
+                    return everything
+                for name in owners[object_file]:
+                    affected.setdefault(name, set()).add(object_file)
+
+        pending = list(affected)
+        while pending:
+            library = pending.pop()
+            for name, spec in declared.items():
+                if library in spec.dependencies and name not in affected:
+                    affected[name] = set()
+                    pending.append(name)
+        return {name: sorted(objects) for name, objects in affected.items()}
+
+    def watch(
+        self,
+        callback: Optional[Callable[[Optional["FileChanges"]], Any]] = None,
+        debounce: float = 0.2,
+        poll_interval: float = 0.5,
+        backend: str = "auto",
+        max_batches: Optional[int] = None,
+    ):
+        """Rebuild whenever project files change, until interrupted.
+
+        callback(changes) runs once with None and then after every debounced
+        batch of changes; by default the declared targets affected by the
+        batch are rebuilt with build(). The context (discovery results, build
+        state, compiler probes) stays warm between batches; only crow.toml
+        changes or added and removed files drop the memoized discovery.
+        backend is "auto", "inotify" or "polling". Errors raised by a rebuild
+        are reported and watching continues; Ctrl+C stops it.
+        """
+        from ..discovery import FileWatcher
+
+        if callback is None:
+            if not self._artifact_manager.declared_targets:
+                raise ValueError(
+                    "watch() without callback needs targets from add_target()"
+                )
+            callback = self._rebuild_affected
+        console = self._build_executor.console
+
+        def run(changes: Optional["FileChanges"]):
+            try:
+                callback(changes)
+            except Exception as error:  # keep watching after failed builds
+                console.line(f"[watch] {type(error).__name__}: {error}")
+            console.flush()
+
+        batches = 0
+        try:
+            run(None)
+            with FileWatcher(
+                self._file_walker, debounce, poll_interval, backend
+            ) as watcher:
+                console.line(
+                    f"[watch] watching {self.project_root} ({watcher.backend})"
+                )
+                console.flush()
+                while max_batches is None or batches < max_batches:
+                    changes = watcher.wait()
+                    batches += 1
+                    if "crow.toml" in changes.modified:
+                        self.invalidate("config")
+                        watcher.walker = self._file_walker
+                    elif changes.added or changes.removed:
+                        self.invalidate("_source_discoverer")
+                    shown = ", ".join(changes.paths[:5])
+                    if len(changes.paths) > 5:
+                        shown += f" and {len(changes.paths) - 5} more"
+                    console.line("[watch] changed:", shown)
+                    run(changes)
+        except KeyboardInterrupt:
+            console.line("[watch] stopped")
+            console.flush()
+
+    def _relative_source(self, source: str) -> str:
+        """Returns source as POSIX path relative to the project root."""
+        path = Path(source)
+        if path.is_absolute():
+            try:
+                path = path.relative_to(self.project_root)
+            except ValueError:
+                return path.as_posix()
+        return Path(os.path.normpath(path)).as_posix()
+
+    def _rebuild_affected(self, changes: Optional["FileChanges"]):
+        """Default watch() callback building the targets changes affect."""
+        if changes is None:
+            self.build()
+            return
+        affected = self.affected_targets(changes)
+        if affected:
+            self.build(*affected)
+
+    def add_test(
+        self,
+        name: str,
+        target: Optional[str] = None,
+        args: Optional[List[str]] = None,
+        framework: str = "auto",
+        shards: Optional[int] = None,
+        timeout: Optional[float] = None,
+        env: Optional[Dict[str, str]] = None,
+        cwd: Optional[str] = None,
+    ):
+        """Register a test run by run_tests() from executable target (default: name).
+
+        framework is "auto" (detected from the binary), "gtest", "catch2" or
+        "plain"; GoogleTest and Catch2 v3 tests are split into shards, by
+        default sized from previous run times.
+        """
+        from ..execution.test_runner import TEST_FRAMEWORKS
+
+        if framework not in TEST_FRAMEWORKS:
+            raise ValueError(f"Unknown test framework: {framework!r}")
+        self._tests[name] = {
+            "target": target or name,
+            "args": list(args or []),
+            "framework": framework,
+            "shards": shards,
+            "timeout": timeout,
+            "env": dict(env or {}),
+            "cwd": cwd,
+        }
+
+    def run_tests(
+        self,
+        *names: str,
+        jobs: Optional[int] = None,
+        shards: Optional[int] = None,
+        timeout: Optional[float] = None,
+        junit: Optional[str] = None,
+        check: bool = True,
+    ) -> List["TestResult"]:
+        """Run tests in parallel, longest first, and write a JUnit XML summary.
+
+        names are tests from add_test() or executable artifacts (all tests
+        from add_test() by default). timeout (default 300 seconds) applies to
+        every test or shard without a timeout of its own from add_test();
+        output is kept up to 64 KiB per test, with full logs in
+        build/test_logs. The summary goes to junit (default
+        build/test_results.xml). With check, failing tests raise TestsFailed.
+        """
+        from ..execution import TestRunner, TestsFailed
+
+        if not names:
+            names = tuple(self._tests)
+            if not names:
+                raise ValueError("No tests registered; use add_test() or pass names")
+        specs = [self._test_spec(name) for name in names]
+        runner = TestRunner(
+            self._build_executor,
+            self._artifact_manager.build_state,
+            self._artifact_manager.build_directory,
+        )
+        junit_path = Path(junit) if junit else None
+        results = runner.run(specs, jobs, shards, timeout, junit_path)
+        if check and not all(result.passed for result in results):
+            raise TestsFailed(results)
+        return results
+
+    def _test_spec(self, name: str) -> "TestSpec":
+        """Resolves registered test or artifact name to the binary to run."""
+        from ..execution.test_runner import TestSpec
+
+        options = self._tests.get(name, {"target": name})
+        target = options["target"]
+        artifact = self.targets.get(target)
+        if artifact is not None:
+            path = Path(artifact["path"])
+        else:
+            path = self._artifact_manager.build_directory / target
+            if not path.exists():
+                raise ValueError(f"Test {name!r}: executable {target!r} was not built")
+        return TestSpec(
+            name,
+            path,
+            options.get("args", []),
+            options.get("framework", "auto"),
+            options.get("shards"),
+            options.get("timeout"),
+            options.get("env", {}),
+            options.get("cwd"),
         )
@@ -0,0 +1,11 @@
+from .._lazy import lazy_exports
+
+# Exported names and the submodules defining them.
+_EXPORTS = {
+    "RemoteExecutor": ".remote_executor",
+    "CompileWorker": ".worker",
+}
+
+__all__ = list(_EXPORTS)
+
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS)
@@ -0,0 +1,215 @@
+import json
+import os
+import re
+import socket
+import struct
+from typing import Dict, Any, List, Optional, Tuple
+
+PROTOCOL_VERSION = 1
+DEFAULT_PORT = 3633
+
+# Upper bounds keep a confused or hostile peer from exhausting memory.
+MAX_HEADER_SIZE = 1 << 20
+MAX_PAYLOAD_SIZE = 1 << 30
+
+_LENGTH = struct.Struct("!I")
+
+# Flags that only change code generation or diagnostics and are safe to run
+# on a worker. Anything else, in particular flags naming other files to read
+# or write (plugins, profiles, sanitizer lists, reports, -B), makes the unit
+# compile locally.
+REMOTE_FLAGS = frozenset(
+    [
+        "-O",
+        "-O0",
+        "-O1",
+        "-O2",
+        "-O3",
+        "-Os",
+        "-Oz",
+        "-Og",
+        "-Ofast",
+        "-g",
+        "-g0",
+        "-g1",
+        "-g2",
+        "-g3",
+        "-ggdb",
+        "-ggdb3",
+        "-gdwarf",
+        "-gdwarf-4",
+        "-gdwarf-5",
+        "-gline-tables-only",
+        "-gno-split-dwarf",
+        "-w",
+        "-pedantic",
+        "-pedantic-errors",
+        "-pipe",
+        "-ansi",
+        "-m32",
+        "-m64",
+        "-mavx",
+        "-mavx2",
+        "-mbmi",
+        "-mbmi2",
+        "-mfma",
+        "-mlzcnt",
+        "-mpopcnt",
+        "-msse2",
+        "-msse3",
+        "-mssse3",
+        "-msse4.1",
+        "-msse4.2",
+        "-mthumb",
+        "-marm",
+        "-fPIC",
+        "-fpic",
+        "-fPIE",
+        "-fpie",
+        "-fno-pic",
+        "-fno-pie",
+        "-fexceptions",
+        "-fno-exceptions",
+        "-frtti",
+        "-fno-rtti",
+        "-fcommon",
+        "-fno-common",
+        "-fstrict-aliasing",
+        "-fno-strict-aliasing",
+        "-fomit-frame-pointer",
+        "-fno-omit-frame-pointer",
+        "-fstack-protector",
+        "-fstack-protector-strong",
+        "-fstack-protector-all",
+        "-fno-stack-protector",
+        "-ffunction-sections",
+        "-fdata-sections",
+        "-fvisibility-inlines-hidden",
+        "-fsigned-char",
+        "-funsigned-char",
+        "-fno-builtin",
+        "-ffreestanding",
+        "-ffast-math",
+        "-fno-fast-math",
+        "-fno-math-errno",
+        "-fwrapv",
+        "-fpermissive",
+        "-fno-threadsafe-statics",
+        "-fno-inline",
+        "-fcolor-diagnostics",
+        "-fno-color-diagnostics",
+        "-fdiagnostics-color",
+        "-fno-diagnostics-color",
+        "-fopenmp",
+        "-flto",
+        "-fno-lto",
+        "-fcoroutines",
+    ]
+)
+# Options accepted as name=value when the value matches _OPTION_VALUE.
+REMOTE_OPTIONS = frozenset(
+    [
+        "-std",
+        "--std",
+        "-march",
+        "-mtune",
+        "-mcpu",
+        "-mfpu",
+        "-mfloat-abi",
+        "-mabi",
+        "-mcmodel",
+        "-mfpmath",
+        "-fvisibility",
+        "-fsanitize",
+        "-fno-sanitize",
+        "-fsanitize-recover",
+        "-fno-sanitize-recover",
+        "-fdiagnostics-color",
+        "-flto",
+        "-ffp-contract",
+        "-ftls-model",
+        "-ftemplate-depth",
+        "-fconstexpr-depth",
+        "-fmessage-length",
+        "-fmax-errors",
+        "-ferror-limit",
+        "-Werror",
+        "-Wno-error",
+    ]
+)
+# Option values without path separators, so they cannot name a file.
+_OPTION_VALUE = re.compile(r"[A-Za-z0-9_.+,-]+")
+# Warning switches like -Wall or -Wno-unused-parameter; they take no value.
+_WARNING_FLAG = re.compile(r"-W(?:no-)?[a-z0-9][a-z0-9+-]*")
+
+
+class ProtocolError(RuntimeError):
+    """Raised when a peer sends a malformed or oversized message."""
+
+
+def send_message(
+    connection: socket.socket, header: Dict[str, Any], payload: bytes = b""
+):
+    """Sends JSON header followed by binary payload."""
+    encoded = json.dumps(dict(header, size=len(payload))).encode("utf-8")
+    connection.sendall(_LENGTH.pack(len(encoded)) + encoded)
+    if payload:
+        connection.sendall(payload)
+
+
+def receive_message(connection: socket.socket) -> Tuple[Dict[str, Any], bytes]:
+    """Receives message sent by send_message."""
+    (length,) = _LENGTH.unpack(_receive_exactly(connection, _LENGTH.size))
+    if length > MAX_HEADER_SIZE:
+        raise ProtocolError(f"Header of {length} bytes exceeds limit")
+    try:
+        header = json.loads(_receive_exactly(connection, length).decode("utf-8"))
+    except ValueError as error:
+        raise ProtocolError(f"Malformed header: {error}") from None
+    if not isinstance(header, dict):
+        raise ProtocolError("Header is not an object")
+    size = header.get("size", 0)
+    if not isinstance(size, int) or not 0 <= size <= MAX_PAYLOAD_SIZE:
+        raise ProtocolError(f"Invalid payload size {size!r}")
+    return header, _receive_exactly(connection, size) if size else b""
+
+
+def remote_flags_allowed(flags: List[str]) -> bool:
+    """Checks whether every flag is safe to pass to a worker's compiler."""
+    for flag in flags:
+        if not isinstance(flag, str):
+            return False
+        if flag in REMOTE_FLAGS or _WARNING_FLAG.fullmatch(flag):
+            continue
+        name, separator, value = flag.partition("=")
+        if not (
+            separator and name in REMOTE_OPTIONS and _OPTION_VALUE.fullmatch(value)
+        ):
+            return False
+    return True
+
+
+def parse_address(address: str) -> Tuple[str, int]:
+    """Splits host[:port] into host and port."""
+    host, separator, port = address.rpartition(":")
+    if not separator or "]" in port:
+        return address.strip("[]"), DEFAULT_PORT
+    return host.strip("[]"), int(port)
+
+
+def token_from_environment(token: Optional[str] = None) -> str:
+    """Returns shared secret, falling back to CROW_REMOTE_TOKEN."""
+    return token if token is not None else os.environ.get("CROW_REMOTE_TOKEN", "")
+
+
+def _receive_exactly(connection: socket.socket, size: int) -> bytes:
+    """Reads exactly size bytes or raises ProtocolError on early EOF."""
+    chunks = []
+    remaining = size
+    while remaining:
+        chunk = connection.recv(min(remaining, 1 << 20))
+        if not chunk:
+            raise ProtocolError("Connection closed mid-message")
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b"".join(chunks)
@@ -0,0 +1,312 @@
+import os
+import socket
+import subprocess
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, Any, List, NamedTuple, Optional, Tuple
+from ..discovery import CompilerProbe
+from ..tracing import tracer
+from .protocol import (
+    PROTOCOL_VERSION,
+    ProtocolError,
+    parse_address,
+    receive_message,
+    remote_flags_allowed,
+    send_message,
+    token_from_environment,
+)
+
+DEFAULT_TIMEOUT = 120.0
+CONNECT_TIMEOUT = 2.0
+
+# Seconds a worker that failed or timed out is skipped before being retried.
+RETRY_AFTER = 30.0
+
+# Flags consumed by the preprocessor, with whether they take a separate value.
+PREPROCESSOR_FLAGS = {
+    "-I": True,
+    "-isystem": True,
+    "-iquote": True,
+    "-idirafter": True,
+    "-include": True,
+    "-imacros": True,
+    "-isysroot": True,
+    "-D": True,
+    "-U": True,
+}
+DEPFILE_FLAGS = {
+    "-MMD": False,
+    "-MD": False,
+    "-MP": False,
+    "-MF": True,
+    "-MT": True,
+    "-MQ": True,
+}
+SOURCE_SUFFIXES = (".c", ".cc", ".cpp", ".cxx", ".c++", ".C")
+
+
+class RemotePlan(NamedTuple):
+    """How one compile command is split into local and remote parts."""
+
+    source: str
+    preprocess: List[str]
+    flags: List[str]
+    language: str
+
+
+class _Worker:
+    def __init__(self, address: str):
+        self.address = address
+        self.host, self.port = parse_address(address)
+        self.slots: Optional[int] = None
+        self.compilers: List[List[str]] = []
+        self.in_flight = 0
+        self.retry_at = 0.0
+        self.connections: List[socket.socket] = []
+
+
+class RemoteExecutor:
+    """Class for compiling translation units on remote workers.
+
+    Sources are preprocessed locally (which also writes their depfiles), so
+    workers only need a compiler matching the local one's family, version
+    and target. A unit goes remote only when a worker has a free slot; if
+    none does, the unit's command is not eligible, or the worker fails or
+    takes longer than timeout, compile() returns None and the caller
+    compiles locally; so does a failing local preprocessing step. Failing
+    workers are skipped for RETRY_AFTER seconds.
+    """
+
+    def __init__(
+        self,
+        workers: List[str],
+        probe: CompilerProbe,
+        timeout: float = DEFAULT_TIMEOUT,
+        token: Optional[str] = None,
+    ):
+        self.workers = [_Worker(address) for address in workers]
+        self.probe = probe
+        self.timeout = timeout
+        self.token = token_from_environment(token)
+        self._next = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(
+        cls, config: Dict[str, Any], probe: CompilerProbe
+    ) -> Optional["RemoteExecutor"]:
+        """Creates executor from [remote] of crow.toml or CROW_REMOTE_WORKERS."""
+        remote_config = config.get("remote", {})
+        workers = os.environ.get("CROW_REMOTE_WORKERS")
+        if workers is not None:
+            addresses = [address for address in workers.split(",") if address.strip()]
+        else:
+            addresses = list(remote_config.get("workers", []))
+        if not addresses:
+            return None
+        return cls(
+            [address.strip() for address in addresses],
+            probe,
+            float(remote_config.get("timeout", DEFAULT_TIMEOUT)),
+            remote_config.get("token"),
+        )
+
+    def plan(self, command: List[str]) -> Optional[RemotePlan]:
+        """Splits GCC/Clang compile command, or returns None if it must stay local.
+
+        GCC precompiled headers are preprocessed from the header next to the
+        .gch; units using Clang precompiled headers stay local.
+        """
+        if "-c" not in command:
+            return None
+        preprocess = [command[0], "-E"]
+        flags: List[str] = []
+        sources = []
+        arguments = iter(command[1:])
+        for argument in arguments:
+            if argument == "-c":
+                continue
+            if argument == "-o":
+                next(arguments, None)
+                continue
+            if argument in DEPFILE_FLAGS:
+                preprocess.append(argument)
+                if DEPFILE_FLAGS[argument]:
+                    preprocess.append(next(arguments, ""))
+                continue
+            if argument == "-include-pch":
+                # Clang's AST files cannot be expanded into preprocessed text.
+                return None
+            option = _preprocessor_option(argument)
+            if option is not None:
+                preprocess.append(argument)
+                if option == argument and PREPROCESSOR_FLAGS[option]:
+                    value = next(arguments, "")
+                    if option == "-include" and not os.path.isfile(value):
+                        # Only a precompiled form of the header exists.
+                        return None
+                    preprocess.append(value)
+                continue
+            if not argument.startswith("-"):
+                sources.append(argument)
+                preprocess.append(argument)
+                continue
+            flags.append(argument)
+            preprocess.append(argument)
+
+        if len(sources) != 1 or not sources[0].endswith(SOURCE_SUFFIXES):
+            return None
+        if not remote_flags_allowed(flags):
+            return None
+        driver = os.path.basename(command[0])
+        language = "c" if sources[0].endswith(".c") and "++" not in driver else "c++"
+        return RemotePlan(sources[0], preprocess, flags, language)
+
+    def compile(
+        self, command: List[str], object_file: Path, executor: "BuildExecutor"
+    ) -> Optional[subprocess.CompletedProcess]:
+        """Compiles command's unit on a worker; None means compile it locally."""
+        plan = self.plan(command)
+        if plan is None:
+            return None
+        info = self.probe.probe(command[0])
+        wanted = [info.family, info.version, info.target]
+        worker = self._reserve(wanted)
+        if worker is None:
+            return None
+
+        try:
+            preprocessed = executor.execute_command(
+                plan.preprocess, check_success=False, capture_output=True, echo=False
+            )
+            if preprocessed.returncode != 0:
+                # Compiling locally reports the unit's errors as usual.
+                return None
+            header = {
+                "version": PROTOCOL_VERSION,
+                "token": self.token,
+                "op": "compile",
+                "compiler": wanted,
+                "language": plan.language,
+                "flags": plan.flags,
+            }
+            with tracer.span(
+                os.path.basename(plan.source), "remote", worker=worker.address
+            ):
+                reply, data = self._request(
+                    worker, header, zlib.compress(preprocessed.stdout or b"", 1)
+                )
+            if reply.get("status") != "ok":
+                self._fail(worker)
+                return None
+            if reply["returncode"] == 0:
+                temp_path = object_file.with_name(
+                    f"{object_file.name}.{os.getpid()}.tmp"
+                )
+                temp_path.write_bytes(zlib.decompress(data))
+                os.replace(temp_path, object_file)
+            return subprocess.CompletedProcess(
+                command,
+                reply["returncode"],
+                reply.get("stdout", "").encode(),
+                reply.get("stderr", "").encode(),
+            )
+        except (OSError, ProtocolError, ValueError, KeyError, zlib.error):
+            self._fail(worker)
+            return None
+        finally:
+            with self._lock:
+                worker.in_flight -= 1
+
+    def close(self):
+        """Closes pooled worker connections."""
+        with self._lock:
+            for worker in self.workers:
+                for connection in worker.connections:
+                    connection.close()
+                worker.connections = []
+
+    def _reserve(self, wanted: List[str]) -> Optional[_Worker]:
+        """Takes a free slot on a healthy worker with a matching compiler."""
+        now = time.monotonic()
+        with self._lock:
+            candidates = self.workers[self._next :] + self.workers[: self._next]
+            self._next = (self._next + 1) % max(1, len(self.workers))
+        for worker in candidates:
+            if worker.retry_at > now:
+                continue
+            if worker.slots is None and not self._handshake(worker):
+                continue
+            if wanted not in worker.compilers:
+                continue
+            with self._lock:
+                # A concurrent _fail may have reset slots since the handshake.
+                if worker.slots is not None and worker.in_flight < worker.slots:
+                    worker.in_flight += 1
+                    return worker
+        return None
+
+    def _handshake(self, worker: _Worker) -> bool:
+        """Learns worker's slots and compilers; marks it failed if unreachable."""
+        try:
+            reply, _ = self._request(
+                worker, {"version": PROTOCOL_VERSION, "token": self.token, "op": "ping"}
+            )
+        except (OSError, ProtocolError):
+            self._fail(worker)
+            return False
+        if reply.get("status") != "ok":
+            self._fail(worker)
+            return False
+        with self._lock:
+            worker.compilers = [list(entry) for entry in reply.get("compilers", [])]
+            worker.slots = int(reply.get("jobs", 1))
+        return True
+
+    def _request(
+        self, worker: _Worker, header: Dict[str, Any], payload: bytes = b""
+    ) -> Tuple[Dict[str, Any], bytes]:
+        """Sends request over a pooled connection and waits for the reply.
+
+        A pooled connection the worker has meanwhile closed is retried once
+        over a fresh one.
+        """
+        while True:
+            with self._lock:
+                pooled = worker.connections.pop() if worker.connections else None
+            connection = pooled or socket.create_connection(
+                (worker.host, worker.port), timeout=CONNECT_TIMEOUT
+            )
+            try:
+                connection.settimeout(self.timeout)
+                send_message(connection, header, payload)
+                reply = receive_message(connection)
+            except (OSError, ProtocolError) as error:
+                connection.close()
+                if pooled is None or isinstance(error, socket.timeout):
+                    raise
+                continue
+            except BaseException:
+                connection.close()
+                raise
+            with self._lock:
+                worker.connections.append(connection)
+            return reply
+
+    def _fail(self, worker: _Worker):
+        with self._lock:
+            worker.retry_at = time.monotonic() + RETRY_AFTER
+            worker.slots = None
+            for connection in worker.connections:
+                connection.close()
+            worker.connections = []
+
+
+def _preprocessor_option(argument: str) -> Optional[str]:
+    """Returns preprocessor option argument is (or starts with), if any."""
+    for option in PREPROCESSOR_FLAGS:
+        if argument.startswith(option):
+            return option
+    return None
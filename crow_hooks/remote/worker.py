@@ -0,0 +1,236 @@
+"""Compile worker daemon for distributed builds.
+
+Usage:
+    python -m crow_hooks.remote.worker --host 0.0.0.0 --port 3633 --jobs 16 \
+        --compiler gcc --compiler clang --token "$CROW_REMOTE_TOKEN"
+"""
+
+import argparse
+import hmac
+import os
+import shutil
+import socketserver
+import subprocess
+import sys
+import tempfile
+import threading
+import zlib
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+from ..config import ConfigurationManager
+from ..discovery import CompilerInfo, CompilerProbe
+from .protocol import (
+    DEFAULT_PORT,
+    MAX_PAYLOAD_SIZE,
+    PROTOCOL_VERSION,
+    ProtocolError,
+    receive_message,
+    remote_flags_allowed,
+    send_message,
+    token_from_environment,
+)
+
+COMPILE_TIMEOUT = 600
+
+
+class CompileWorker:
+    """Class for serving compile requests of remote build clients.
+
+    Clients send preprocessed sources with code generation flags; the worker
+    compiles them with a local compiler of the same family, version and
+    target and returns the object file. Only flags that cannot read or write
+    other files are accepted, and a shared token is required when set.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = DEFAULT_PORT,
+        compilers: Optional[List[str]] = None,
+        jobs: Optional[int] = None,
+        token: Optional[str] = None,
+        timeout: float = COMPILE_TIMEOUT,
+    ):
+        probe = CompilerProbe(ConfigurationManager.cache_directory())
+        self.compilers: List[CompilerInfo] = []
+        for name in compilers or ["cc", "c++"]:
+            path = shutil.which(name)
+            if path is not None:
+                info = probe.probe(path)
+                if info.family in ("gcc", "clang"):
+                    self.compilers.append(info)
+        self.jobs = jobs or os.cpu_count() or 1
+        self.token = token_from_environment(token)
+        self.timeout = timeout
+        self.running = 0
+        self._slots = threading.BoundedSemaphore(self.jobs)
+        self._lock = threading.Lock()
+        self.server = _Server((host, port), _Handler)
+        self.server.worker = self
+
+    @property
+    def address(self) -> str:
+        """Returns host:port the worker listens on."""
+        host, port = self.server.server_address[:2]
+        return f"{host}:{port}"
+
+    def serve_forever(self):
+        """Serves requests until shutdown() is called."""
+        self.server.serve_forever()
+
+    def shutdown(self):
+        """Stops serving and closes the listening socket."""
+        self.server.shutdown()
+        self.server.server_close()
+
+    def handle(
+        self, header: Dict[str, Any], payload: bytes
+    ) -> Tuple[Dict[str, Any], bytes]:
+        """Answers one request."""
+        if header.get("version") != PROTOCOL_VERSION:
+            return {"status": "error", "error": "protocol version mismatch"}, b""
+        if not hmac.compare_digest(str(header.get("token", "")), self.token):
+            return {"status": "error", "error": "invalid token"}, b""
+        operation = header.get("op")
+        if operation == "ping":
+            return {
+                "status": "ok",
+                "jobs": self.jobs,
+                "running": self.running,
+                "compilers": [
+                    [info.family, info.version, info.target] for info in self.compilers
+                ],
+            }, b""
+        if operation == "compile":
+            return self._compile(header, payload)
+        return {"status": "error", "error": f"unknown operation {operation!r}"}, b""
+
+    def _compile(
+        self, header: Dict[str, Any], payload: bytes
+    ) -> Tuple[Dict[str, Any], bytes]:
+        """Compiles preprocessed source from payload and returns the object."""
+        flags = header.get("flags", [])
+        if not isinstance(flags, list) or not remote_flags_allowed(flags):
+            return {"status": "error", "error": "flags not allowed"}, b""
+        compiler = self._find_compiler(header.get("compiler", []))
+        if compiler is None:
+            return {"status": "error", "error": "no matching compiler"}, b""
+        suffix = ".ii" if header.get("language") == "c++" else ".i"
+        decompressor = zlib.decompressobj()
+        source_text = decompressor.decompress(payload, MAX_PAYLOAD_SIZE)
+        if decompressor.unconsumed_tail:
+            return {"status": "error", "error": "payload too large"}, b""
+        if not decompressor.eof:
+            return {"status": "error", "error": "truncated payload"}, b""
+
+        with self._slots:
+            with self._lock:
+                self.running += 1
+            try:
+                with tempfile.TemporaryDirectory(prefix="crow-worker-") as temp_dir:
+                    source = os.path.join(temp_dir, "unit" + suffix)
+                    output = os.path.join(temp_dir, "unit.o")
+                    Path(source).write_bytes(source_text)
+                    command = [compiler.path, "-c", source, "-o", output] + flags
+                    try:
+                        result = subprocess.run(
+                            command,
+                            capture_output=True,
+                            cwd=temp_dir,
+                            timeout=self.timeout,
+                        )
+                    except subprocess.TimeoutExpired:
+                        return {"status": "error", "error": "compile timed out"}, b""
+                    reply = {
+                        "status": "ok",
+                        "returncode": result.returncode,
+                        "stdout": result.stdout.decode(errors="replace"),
+                        "stderr": result.stderr.decode(errors="replace"),
+                    }
+                    if result.returncode != 0:
+                        return reply, b""
+                    return reply, zlib.compress(Path(output).read_bytes(), 1)
+            finally:
+                with self._lock:
+                    self.running -= 1
+
+    def _find_compiler(self, wanted: List[str]) -> Optional[CompilerInfo]:
+        """Returns compiler matching client's [family, version, target]."""
+        for info in self.compilers:
+            if [info.family, info.version, info.target] == list(wanted):
+                return info
+        return None
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    """TCP server handling every client connection on its own thread."""
+
+    allow_reuse_address = True
+    daemon_threads = True
+    worker: CompileWorker
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    """Answers requests of one client connection until it closes."""
+
+    def handle(self):
+        worker: CompileWorker = self.server.worker
+        try:
+            while True:
+                try:
+                    header, payload = receive_message(self.request)
+                except ProtocolError:
+                    return
+                try:
+                    reply, data = worker.handle(header, payload)
+                except (OSError, zlib.error) as error:
+                    reply, data = {"status": "error", "error": str(error)}, b""
+                send_message(self.request, reply, data)
+        except OSError:
+            return
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(
+        description="Serve compile requests of crow builds"
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--jobs", type=int, help="parallel compiles (default: CPUs)")
+    parser.add_argument(
+        "--compiler", action="append", help="compiler to offer (repeatable)"
+    )
+    parser.add_argument("--token", help="shared secret (default: CROW_REMOTE_TOKEN)")
+    arguments = parser.parse_args(argv)
+
+    worker = CompileWorker(
+        arguments.host,
+        arguments.port,
+        arguments.compiler,
+        arguments.jobs,
+        arguments.token,
+    )
+    if not worker.compilers:
+        parser.error("no usable GCC or Clang compiler found")
+    if not worker.token and arguments.host not in ("127.0.0.1", "localhost", "::1"):
+        print(
+            "warning: serving without a token on a non-loopback address",
+            file=sys.stderr,
+        )
+    print(
+        f"crow worker listening on {worker.address} with {worker.jobs} job(s):",
+        ", ".join(
+            f"{info.family} {info.version} ({info.path})" for info in worker.compilers
+        ),
+        flush=True,
+    )
+    try:
+        worker.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        worker.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,3 @@
+from .build_tracer import BuildTracer, Span, tracer
+
+__all__ = ["BuildTracer", "Span", "tracer"]
@@ -0,0 +1,174 @@
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Any, Iterator, List, NamedTuple, Optional
+
+
+class Span(NamedTuple):
+    """Finished timed region of build work."""
+
+    name: str
+    category: str
+    start: float
+    duration: float
+    thread: int
+    args: Dict[str, Any]
+
+
+class BuildTracer:
+    """Class for recording spans of build work and exporting them.
+
+    Spans are cheap no-ops while the tracer is disabled. Recorded spans can be
+    written as Chrome trace-event JSON (chrome://tracing, Perfetto) and
+    summarized as tables of the slowest and most memory-hungry compiles.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.output_path: Optional[Path] = None
+        self.spans: List[Span] = []
+        self._origin = time.perf_counter()
+        self._threads: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self._exit_registered = False
+
+    def enable(self, output_path: Optional[Path] = None):
+        """Starts recording spans.
+
+        With output_path the trace is written there, and the summary printed
+        to stderr, when the interpreter exits.
+        """
+        self.enabled = True
+        if output_path is not None:
+            self.output_path = Path(output_path)
+            if not self._exit_registered:
+                self._exit_registered = True
+                atexit.register(self._write_at_exit)
+
+    def _write_at_exit(self):
+        if not self.spans:
+            return
+        try:
+            path = self.write()
+        except OSError as error:
+            sys.stderr.write(f"[trace] could not write trace: {error}\n")
+            return
+        sys.stderr.write(f"[trace] written to {path}\n{self.summary()}\n")
+
+    @contextmanager
+    def span(self, name: str, category: str, **args: Any) -> Iterator[Dict[str, Any]]:
+        """Times enclosed block; the yielded dict can be filled with more args."""
+        if not self.enabled:
+            yield args
+            return
+        start = time.perf_counter()
+        try:
+            yield args
+        finally:
+            self.record(name, category, start, time.perf_counter() - start, args)
+
+    def record(
+        self,
+        name: str,
+        category: str,
+        start: float,
+        duration: float,
+        args: Optional[Dict[str, Any]] = None,
+    ):
+        """Adds finished span measured with time.perf_counter()."""
+        if not self.enabled:
+            return
+        ident = threading.get_ident()
+        with self._lock:
+            thread = self._threads.setdefault(ident, len(self._threads))
+            self.spans.append(
+                Span(name, category, start, duration, thread, dict(args or {}))
+            )
+
+    def chrome_trace(self) -> Dict[str, Any]:
+        """Returns recorded spans as Chrome trace-event document."""
+        pid = os.getpid()
+        with self._lock:
+            spans = list(self.spans)
+            threads = dict(self._threads)
+        events: List[Dict[str, Any]] = [
+            {
+                "name": "thread_name",
+                "ph": "M",
+                "pid": pid,
+                "tid": thread,
+                "args": {"name": "main" if thread == 0 else f"worker-{thread}"},
+            }
+            for thread in sorted(threads.values())
+        ]
+        for span in spans:
+            events.append(
+                {
+                    "name": span.name,
+                    "cat": span.category,
+                    "ph": "X",
+                    "ts": round((span.start - self._origin) * 1e6, 3),
+                    "dur": round(span.duration * 1e6, 3),
+                    "pid": pid,
+                    "tid": span.thread,
+                    "args": span.args,
+                }
+            )
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write(self, path: Optional[Path] = None) -> Optional[Path]:
+        """Writes Chrome trace JSON to path (or the configured output path)."""
+        target = Path(path) if path is not None else self.output_path
+        if target is None:
+            return None
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_text(json.dumps(self.chrome_trace()), encoding="utf-8")
+        return target
+
+    def summary(self, limit: int = 10) -> str:
+        """Formats tables of the slowest and most memory-hungry compiles."""
+        with self._lock:
+            compiles = [span for span in self.spans if span.category == "compile"]
+        if not compiles:
+            return "No translation units were compiled."
+
+        def rows(spans: List[Span]) -> List[str]:
+            lines = [
+                f"{'wall s':>8} {'cpu s':>8} {'rss MB':>8} {'exit':>4}  target: source"
+            ]
+            for span in spans[:limit]:
+                cpu = span.args.get("cpu_time")
+                rss = span.args.get("max_rss_kb")
+                lines.append(
+                    f"{span.duration:8.2f} "
+                    f"{'-' if cpu is None else format(cpu, '8.2f'):>8} "
+                    f"{'-' if rss is None else format(rss / 1024, '8.1f'):>8} "
+                    f"{str(span.args.get('exit_code', '-')):>4}  "
+                    f"{span.args.get('target', '?')}: {span.name}"
+                )
+            return lines
+
+        slowest = sorted(compiles, key=lambda span: span.duration, reverse=True)
+        largest = sorted(
+            compiles, key=lambda span: span.args.get("max_rss_kb") or 0, reverse=True
+        )
+        total = sum(span.duration for span in compiles)
+        lines = [f"{len(compiles)} translation units, {total:.2f}s total compile time"]
+        lines += ["", "Slowest translation units:"] + rows(slowest)
+        lines += ["", "Largest peak memory:"] + rows(largest)
+        return "\n".join(lines)
+
+    def reset(self):
+        """Drops recorded spans."""
+        with self._lock:
+            self.spans = []
+            self._threads = {}
+            self._origin = time.perf_counter()
+
+
+tracer = BuildTracer()
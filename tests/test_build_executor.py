@@ -0,0 +1,128 @@
+import asyncio
+import os
+import subprocess
+import threading
+import time
+
+import pytest
+
+from crow_hooks.execution import BuildCancelled, BuildExecutor
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "killpg"), reason="needs POSIX")
+
+
+def alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    return True
+
+
+def started_pid(path, timeout=5.0) -> int:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if path.exists() and path.read_text().strip():
+            return int(path.read_text())
+        time.sleep(0.02)
+    raise AssertionError("command did not start")
+
+
+@pytest.fixture
+def executor(tmp_path):
+    executor = BuildExecutor(tmp_path, use_jobserver=False)
+    executor.grace_period = 0.5
+    return executor
+
+
+def test_async_commands_capture_output(executor):
+    result = asyncio.run(
+        executor.execute_command_async(["sh", "-c", "echo out"], capture_output=True)
+    )
+    assert result.stdout == b"out\n"
+
+
+def test_cancelling_awaiter_terminates_command_and_frees_token(executor, tmp_path):
+    executor.serve_jobserver(1)
+    pid_file = tmp_path / "pid"
+    command = ["sh", "-c", f"echo $$ > {pid_file}; exec sleep 30"]
+
+    async def main():
+        running = asyncio.ensure_future(executor.execute_command_async(command))
+        # Waits for the only job slot, held by the first command.
+        waiting = asyncio.ensure_future(executor.execute_command_async(["true"]))
+        await asyncio.get_running_loop().run_in_executor(None, started_pid, pid_file)
+        waiting.cancel()
+        running.cancel()
+        for task in (running, waiting):
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+    asyncio.run(main())
+    pid = started_pid(pid_file)
+    deadline = time.monotonic() + 5
+    while alive(pid) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert not alive(pid)
+
+    finished = threading.Event()
+
+    def run_sync():
+        executor.execute_command(["true"], echo=False)
+        finished.set()
+
+    threading.Thread(target=run_sync, daemon=True).start()
+    assert finished.wait(5), "job slot leaked by cancelled async command"
+
+
+def test_cancel_scope_stops_async_commands(executor, tmp_path):
+    pid_file = tmp_path / "pid"
+    command = ["sh", "-c", f"echo $$ > {pid_file}; exec sleep 30"]
+
+    async def main():
+        task = asyncio.ensure_future(executor.execute_command_async(command))
+        await asyncio.get_running_loop().run_in_executor(None, started_pid, pid_file)
+        executor.cancel()
+        with pytest.raises(BuildCancelled):
+            await task
+
+    with executor.cancel_scope():
+        asyncio.run(main())
+        with pytest.raises(BuildCancelled):
+            asyncio.run(executor.execute_command_async(["true"]))
+
+
+def test_failure_in_execute_many_kills_process_groups_and_frees_tokens(
+    executor, tmp_path
+):
+    jobserver = executor.serve_jobserver(2)
+    pid_file = tmp_path / "pid"
+    child_file = tmp_path / "child"
+    sleeper = [
+        "sh",
+        "-c",
+        f"sleep 30 & echo $! > {child_file}; echo $$ > {pid_file}; wait",
+    ]
+    failing = [
+        "sh",
+        "-c",
+        f"while [ ! -s {pid_file} ]; do sleep 0.02; done; exit 1",
+    ]
+
+    started = time.monotonic()
+    with pytest.raises(subprocess.CalledProcessError):
+        executor.execute_many([sleeper, failing], jobs=2)
+    assert time.monotonic() - started < 10
+
+    for pid in (started_pid(pid_file), started_pid(child_file)):
+        deadline = time.monotonic() + 5
+        while alive(pid) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert not alive(pid)
+
+    assert not executor.cancelled
+    # Both slots are free again: the implicit one and the single token.
+    assert jobserver.acquire() is None
+    assert os.read(jobserver.read_fd, 16) == b"+"
+    os.write(jobserver.write_fd, b"+")
+    jobserver.release(None)
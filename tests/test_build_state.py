@@ -0,0 +1,55 @@
+import sys
+
+from crow_hooks.compilation import BuildStateDatabase
+from crow_hooks.discovery import CompilerProbe
+
+
+def test_compiler_identity_matches_probe(tmp_path):
+    state = BuildStateDatabase(tmp_path)
+    identity = state.compiler_identity(sys.executable)
+    assert identity == CompilerProbe.identity(sys.executable)
+
+
+def test_object_stays_current_until_source_or_command_changes(tmp_path):
+    source = tmp_path / "a.c"
+    source.write_text("int a;\n")
+    obj = tmp_path / "a.o"
+    obj.write_bytes(b"object")
+    command = ["cc", "-c", str(source), "-o", str(obj)]
+
+    state = BuildStateDatabase(tmp_path / "build")
+    assert not state.is_object_current(obj, str(source), command, sys.executable)
+    state.record_object(obj, str(source), command, sys.executable)
+    state.save()
+
+    state = BuildStateDatabase(tmp_path / "build")
+    assert state.is_object_current(obj, str(source), command, sys.executable)
+    assert not state.is_object_current(
+        obj, str(source), command + ["-O2"], sys.executable
+    )
+
+    source.write_text("int a = 1;\n")
+    state.refresh()
+    assert not state.is_object_current(obj, str(source), command, sys.executable)
+
+
+def test_header_change_invalidates_dependent_objects(tmp_path):
+    header = tmp_path / "a.h"
+    header.write_text("#define A 1\n")
+    objects = {}
+    for name in ("a", "b"):
+        source = tmp_path / f"{name}.c"
+        source.write_text(f"int {name};\n")
+        objects[name] = (tmp_path / f"{name}.o", str(source), ["cc", str(source)])
+        objects[name][0].write_bytes(b"object")
+
+    state = BuildStateDatabase(tmp_path / "build")
+    obj, source, command = objects["a"]
+    state.record_object(obj, source, command, sys.executable, [str(header)])
+    state.record_object(*objects["b"], sys.executable)
+    assert state.dependents_of(str(header)) == [str(obj)]
+
+    header.write_text("#define A 2\n")
+    state.refresh([str(header)])
+    assert not state.is_object_current(obj, source, command, sys.executable)
+    assert state.is_object_current(*objects["b"], sys.executable)
@@ -0,0 +1,186 @@
+import shutil
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from crow_hooks.hooks import HookContext
+
+pytestmark = pytest.mark.skipif(
+    not (shutil.which("gcc") and shutil.which("g++")), reason="needs gcc and g++"
+)
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    """Empty project using the system GCC, with its own caches."""
+    monkeypatch.setenv("CROW_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.delenv("CROW_BUILD_DIR", raising=False)
+    monkeypatch.setenv("CC", "gcc")
+    monkeypatch.setenv("CXX", "g++")
+    root = tmp_path / "project"
+    root.mkdir()
+    (root / "crow.toml").write_text('[package]\nname = "demo"\n')
+    return root
+
+
+def write(root: Path, files):
+    for name, text in files.items():
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text)
+
+
+def output_of(binary: Path) -> str:
+    return subprocess.run([str(binary)], capture_output=True, text=True).stdout
+
+
+def test_gcc_pch_falls_back_to_real_header(project):
+    write(
+        project,
+        {
+            "src/pch.h": '#include "detail.h"\n',
+            "src/detail.h": "#define GREETING 42\n",
+            "src/main.cpp": (
+                "#include <cstdio>\n"
+                'int main() { std::printf("%d\\n", GREETING); return 0; }\n'
+            ),
+        },
+    )
+    binary = HookContext(str(project)).compile_target(
+        "app", ["src/main.cpp"], pch="src/pch.h"
+    )
+    assert output_of(binary) == "42\n"
+
+    pch_dir = project / "build" / "app_objects" / "pch"
+    assert (pch_dir / "pch.h").is_file()
+
+    # An unusable .gch makes GCC read the header next to it instead.
+    (pch_dir / "pch.h.gch").write_bytes(b"not a precompiled header")
+    write(project, {"src/main.cpp": (project / "src/main.cpp").read_text() + "\n"})
+    binary = HookContext(str(project)).compile_target(
+        "app", ["src/main.cpp"], pch="src/pch.h"
+    )
+    assert output_of(binary) == "42\n"
+
+
+def test_unity_build_of_mixed_c_and_cpp_directory(project):
+    write(
+        project,
+        {
+            "src/one.c": "int one(void) { return 1; }\n",
+            "src/two.c": "int two(void) { return 2; }\n",
+            "src/three.cpp": "int three() { return 3; }\n",
+            "src/main.cpp": (
+                "#include <cstdio>\n"
+                "int one(void);\nint two(void);\nint three();\n"
+                'int main() { std::printf("%d\\n", one() + two() + three()); }\n'
+            ),
+        },
+    )
+    sources = ["src/main.cpp", "src/one.c", "src/three.cpp", "src/two.c"]
+    binary = HookContext(str(project)).compile_target("app", sources, unity=True)
+    assert output_of(binary) == "6\n"
+
+    objects = list((project / "build" / "app_objects").rglob("*.o"))
+    assert len(objects) == 2
+
+
+def test_declared_c_target(project):
+    write(
+        project,
+        {
+            "src/main.c": (
+                "#include <stdio.h>\n"
+                "int main(void) {\n"
+                "    int class = 1; /* not valid C++ */\n"
+                '    printf("%d\\n", class);\n'
+                "    return 0;\n"
+                "}\n"
+            ),
+        },
+    )
+    ctx = HookContext(str(project))
+    ctx.add_target("app", ["src/main.c"], cxx=False)
+    binary = ctx.build("app")["app"]
+    assert output_of(binary) == "1\n"
+
+
+def test_include_minimization_is_opt_in(project):
+    assert HookContext(str(project))._include_resolver is None
+    (project / "crow.toml").write_text(
+        '[package]\nname = "demo"\n\n[build]\nminimize_includes = true\n'
+    )
+    assert HookContext(str(project))._include_resolver is not None
+
+
+def test_minimized_includes_keep_directories_needed_by_user_headers(project):
+    (project / "crow.toml").write_text(
+        '[package]\nname = "demo"\n\n[build]\nminimize_includes = true\n'
+    )
+    external = project.parent / "external"
+    write(
+        external,
+        {"vendor.h": '#include "deep.h"\n#define VENDOR (DEEP + 1)\n'},
+    )
+    write(
+        project,
+        {
+            "include/deep.h": "#define DEEP 41\n",
+            "src/main.cpp": (
+                "#include <cstdio>\n"
+                '#include "vendor.h"\n'
+                'int main() { std::printf("%d\\n", VENDOR); return 0; }\n'
+            ),
+        },
+    )
+    binary = HookContext(str(project)).compile_target(
+        "app", ["src/main.cpp"], extra_cflags=["-I", str(external)]
+    )
+    assert output_of(binary) == "42\n"
+
+
+def test_unchanged_objects_are_not_rebuilt(project):
+    write(
+        project,
+        {
+            "src/main.c": "int helper(void);\nint main(void) { return helper(); }\n",
+            "src/helper.c": "int helper(void) { return 0; }\n",
+        },
+    )
+    sources = ["src/main.c", "src/helper.c"]
+    HookContext(str(project)).compile_target("app", sources)
+    objects = project / "build" / "app_objects" / "src"
+    built = {path.name: path.stat().st_mtime_ns for path in objects.glob("*.o")}
+    assert sorted(built) == ["helper.o", "main.o"]
+
+    write(project, {"src/helper.c": "int helper(void) { return 0 ; }\n"})
+    HookContext(str(project)).compile_target("app", sources)
+    assert (objects / "main.o").stat().st_mtime_ns == built["main.o"]
+    assert (objects / "helper.o").stat().st_mtime_ns != built["helper.o"]
+
+
+def test_header_change_rebuilds_only_its_includers(project):
+    write(
+        project,
+        {
+            "src/value.h": "#define VALUE 1\n",
+            "src/main.c": (
+                "#include <stdio.h>\n"
+                '#include "value.h"\n'
+                "int other(void);\n"
+                'int main(void) { printf("%d\\n", VALUE + other()); return 0; }\n'
+            ),
+            "src/other.c": "int other(void) { return 10; }\n",
+        },
+    )
+    sources = ["src/main.c", "src/other.c"]
+    binary = HookContext(str(project)).compile_target("app", sources)
+    assert output_of(binary) == "11\n"
+    other = project / "build" / "app_objects" / "src" / "other.o"
+    built = other.stat().st_mtime_ns
+
+    write(project, {"src/value.h": "#define VALUE 2\n"})
+    binary = HookContext(str(project)).compile_target("app", sources)
+    assert output_of(binary) == "12\n"
+    assert other.stat().st_mtime_ns == built
@@ -0,0 +1,63 @@
+import os
+import sys
+
+import pytest
+
+from crow_hooks.discovery import CompilerProbe
+
+pytestmark = pytest.mark.skipif(os.name == "nt", reason="needs executable scripts")
+
+FAKE_COMPILER = """#!{python}
+import sys
+with open({log!r}, "a") as log:
+    log.write(" ".join(sys.argv[1:]) + "\\n")
+if "--version" in sys.argv:
+    print("gcc (Fake) {version}")
+elif "-dumpmachine" in sys.argv:
+    print("x86_64-fake-linux")
+"""
+
+
+def fake_compiler(directory, version):
+    path = directory / "fakecc"
+    log = directory / "calls.log"
+    path.write_text(
+        FAKE_COMPILER.format(python=sys.executable, log=str(log), version=version)
+    )
+    path.chmod(0o755)
+    return str(path), log
+
+
+def test_probe_is_cached_until_compiler_binary_changes(tmp_path):
+    compiler, log = fake_compiler(tmp_path, "9.1.0")
+    info = CompilerProbe(tmp_path / "cache").probe(compiler)
+    assert (info.family, info.version, info.target) == (
+        "gcc",
+        "9.1.0",
+        "x86_64-fake-linux",
+    )
+    assert info.supports("pch")
+    calls = log.read_text()
+
+    # A new process reads the probe from the disk cache.
+    assert CompilerProbe(tmp_path / "cache").probe(compiler) == info
+    assert log.read_text() == calls
+
+    fake_compiler(tmp_path, "10.2.0")
+    info = CompilerProbe(tmp_path / "cache").probe(compiler)
+    assert info.version == "10.2.0"
+    assert log.read_text() != calls
+
+
+def test_resolve_notices_earlier_path_entry(tmp_path, monkeypatch):
+    first, second = tmp_path / "first", tmp_path / "second"
+    first.mkdir()
+    second.mkdir()
+    fake_compiler(second, "1.0")
+    monkeypatch.setenv("PATH", os.pathsep.join([str(first), str(second)]))
+    probe = CompilerProbe(tmp_path / "cache")
+    assert probe.resolve(["fakecc"]) == str(second / "fakecc")
+
+    fake_compiler(first, "1.0")
+    probe = CompilerProbe(tmp_path / "cache")
+    assert probe.resolve(["fakecc"]) == str(first / "fakecc")
@@ -0,0 +1,23 @@
+import os
+import time
+
+from crow_hooks.config import ConfigurationManager
+from crow_hooks.hooks import HookContext
+
+
+def test_config_of_one_context_does_not_leak_into_another(tmp_path, monkeypatch):
+    monkeypatch.setenv("CROW_CACHE_DIR", str(tmp_path / "cache"))
+    root = tmp_path / "project"
+    root.mkdir()
+    (root / "crow.toml").write_text('[package]\nname = "demo"\n')
+    # Only files older than the racy window are served from the memo.
+    os.utime(root / "crow.toml", (time.time() - 60, time.time() - 60))
+
+    HookContext(str(root)).config["package"]["name"] = "mutated"
+    assert HookContext(str(root)).config["package"]["name"] == "demo"
+
+    parsed = ConfigurationManager.parse_toml(root / "crow.toml")
+    parsed["package"]["name"] = "mutated"
+    assert ConfigurationManager.load_toml(root / "crow.toml") == {
+        "package": {"name": "demo"}
+    }
@@ -0,0 +1,31 @@
+from crow_hooks.compilation.depfile import (
+    parse_make_depfile,
+    show_includes_dependency,
+)
+
+
+def test_make_depfile_with_continuations_and_escapes():
+    text = (
+        "build/a.o: src/a.c include/a.h \\\n"
+        "  include/with\\ space.h include/./b.h\n"
+        "include/a.h:\n"
+    )
+    assert parse_make_depfile(text) == [
+        "src/a.c",
+        "include/a.h",
+        "include/with space.h",
+        "include/b.h",
+    ]
+
+
+def test_make_depfile_with_drive_letters():
+    text = "C:\\build\\a.obj: C:\\src\\a.c C:\\include\\a.h\n"
+    assert parse_make_depfile(text)[-2:] == ["C:\\src\\a.c", "C:\\include\\a.h"]
+
+
+def test_show_includes_note():
+    assert (
+        show_includes_dependency("Note: including file:   C:\\include\\a.h\r\n")
+        == "C:\\include\\a.h"
+    )
+    assert show_includes_dependency("a.cpp(3): error C2065\r\n") is None
@@ -0,0 +1,64 @@
+import os
+import time
+
+from crow_hooks.discovery import FileIndex, FileWalker
+
+
+def backdate(root):
+    """Moves mtimes out of the racy window so listings get indexed."""
+    past = time.time() - 60
+    for directory, _, names in os.walk(root):
+        for name in names:
+            os.utime(os.path.join(directory, name), (past, past))
+        os.utime(directory, (past, past))
+
+
+def walk(root, monkeypatch):
+    """Walks root with a freshly loaded index, counting directory listings."""
+    listed = []
+    scandir = os.scandir
+
+    def counting_scandir(path):
+        listed.append(os.path.relpath(path, root))
+        return scandir(path)
+
+    monkeypatch.setattr(os, "scandir", counting_scandir)
+    walker = FileWalker(root / "project", index=FileIndex(root / "index.bin"))
+    files = sorted(walker.walk({"sources": ["**/*.c"]})["sources"])
+    monkeypatch.setattr(os, "scandir", scandir)
+    return files, listed
+
+
+def test_index_reuses_listings_until_directory_or_rules_change(tmp_path, monkeypatch):
+    project = tmp_path / "project"
+    for name in ("src/a.c", "src/deep/b.c", "lib/c.c"):
+        (project / name).parent.mkdir(parents=True, exist_ok=True)
+        (project / name).write_text("")
+    (project / ".gitignore").write_text("*.o\n")
+    backdate(project)
+
+    cold, listed = walk(tmp_path, monkeypatch)
+    assert cold == ["lib/c.c", "src/a.c", "src/deep/b.c"]
+    assert len(listed) == 4
+
+    warm, listed = walk(tmp_path, monkeypatch)
+    assert warm == cold
+    assert listed == []
+
+    (project / "src/new.c").write_text("")
+    files, listed = walk(tmp_path, monkeypatch)
+    assert "src/new.c" in files
+    assert listed == ["project/src"]
+
+    (project / ".gitignore").write_text("*.o\nlib/\n")
+    files, listed = walk(tmp_path, monkeypatch)
+    assert files == ["src/a.c", "src/deep/b.c", "src/new.c"]
+    assert sorted(listed) == ["project", "project/src", "project/src/deep"]
+
+
+def test_index_of_other_format_is_ignored(tmp_path):
+    path = tmp_path / "index.bin"
+    path.write_bytes(b"not an index")
+    index = FileIndex(path)
+    index.load()
+    assert index.lookup("", os.stat(tmp_path), "rules") is None
@@ -0,0 +1,62 @@
+from crow_hooks.discovery import FileWalker, IgnoreRules
+
+
+def write(root, names):
+    for name in names:
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("")
+
+
+def test_ignore_rules_follow_gitignore_semantics():
+    rules = IgnoreRules(
+        [
+            "# comment",
+            "*.log",
+            "!keep.log",
+            "/top.txt",
+            "out/",
+            "docs/**/*.tmp",
+            "\\#hash",
+        ]
+    )
+    assert rules.match("a/b/debug.log", False) is True
+    assert rules.match("a/keep.log", False) is False
+    assert rules.match("top.txt", False) is True
+    assert rules.match("sub/top.txt", False) is None
+    assert rules.match("a/out", True) is True
+    assert rules.match("a/out", False) is None
+    assert rules.match("docs/x/y/z.tmp", False) is True
+    assert rules.match("docs.tmp", False) is None
+    assert rules.match("#hash", False) is True
+
+
+def test_walk_prunes_gitignored_excluded_and_build_directories(tmp_path):
+    write(
+        tmp_path,
+        [
+            ".gitignore",
+            "src/main.cpp",
+            "src/gen/skip.cpp",
+            "src/.gitignore",
+            "src/local.cpp",
+            "lib/a.c",
+            "vendor/v.c",
+            "build/obj.c",
+            ".git/hooks/x.c",
+            "notes.log",
+        ],
+    )
+    (tmp_path / ".gitignore").write_text("*.log\ngen/\n")
+    (tmp_path / "src/.gitignore").write_text("local.cpp\n")
+    walker = FileWalker(tmp_path, build_dir=tmp_path / "build", exclude=["vendor/"])
+
+    found = walker.walk({"sources": ["**/*.c", "**/*.cpp"], "logs": ["*.log"]})
+    assert sorted(found["sources"]) == ["lib/a.c", "src/main.cpp"]
+    assert found["logs"] == []
+    assert sorted(walker.iter_files("src")) == ["src/.gitignore", "src/main.cpp"]
+    assert list(walker.iter_files("src/gen")) == []
+
+    unfiltered = FileWalker(tmp_path, build_dir=tmp_path / "build", use_gitignore=False)
+    sources = unfiltered.walk({"sources": ["**/*.cpp"]})["sources"]
+    assert sorted(sources) == ["src/gen/skip.cpp", "src/local.cpp", "src/main.cpp"]
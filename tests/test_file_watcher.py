@@ -0,0 +1,68 @@
+import sys
+
+import pytest
+
+from crow_hooks.discovery import FileWalker, FileWatcher
+
+pytestmark = pytest.mark.skipif(
+    not sys.platform.startswith("linux"), reason="needs inotify"
+)
+
+
+@pytest.fixture
+def watcher(tmp_path):
+    (tmp_path / "src" / "deep").mkdir(parents=True)
+    (tmp_path / "build").mkdir()
+    (tmp_path / "src" / "main.c").write_text("int main(void) { return 0; }\n")
+    (tmp_path / "src" / "deep" / "util.h").write_text("\n")
+    walker = FileWalker(tmp_path, tmp_path / "build")
+    with FileWatcher(walker, debounce=0.05, backend="inotify") as watcher:
+
+        def no_full_snapshot():
+            raise AssertionError("inotify batches must not re-walk the tree")
+
+        watcher._snapshot = no_full_snapshot
+        yield tmp_path, watcher
+
+
+def test_events_name_changed_files(watcher):
+    root, watcher = watcher
+    (root / "src" / "main.c").write_text("int main(void) { return 1; }\n")
+    (root / "src" / "new.c").write_text("\n")
+    (root / "build" / "out.o").write_text("\n")
+    changes = watcher.wait(timeout=5)
+    assert changes.modified == ["src/main.c"]
+    assert changes.added == ["src/new.c"]
+    assert changes.removed == []
+
+    (root / "build" / "other.o").write_text("\n")
+    assert watcher.wait(timeout=0.3) is None
+
+
+def test_directory_and_gitignore_changes(watcher):
+    root, watcher = watcher
+    (root / "lib" / "inner").mkdir(parents=True)
+    (root / "lib" / "inner" / "a.c").write_text("\n")
+    changes = watcher.wait(timeout=5)
+    assert changes.added == ["lib/inner/a.c"]
+
+    (root / "lib" / "inner" / "b.c").write_text("\n")
+    assert watcher.wait(timeout=5).added == ["lib/inner/b.c"]
+
+    (root / "src" / ".gitignore").write_text("deep/\n")
+    changes = watcher.wait(timeout=5)
+    assert changes.added == ["src/.gitignore"]
+    assert changes.removed == ["src/deep/util.h"]
+
+    (root / "lib" / "inner" / "a.c").unlink()
+    (root / "lib" / "inner" / "b.c").unlink()
+    (root / "lib" / "inner").rmdir()
+    assert watcher.wait(timeout=5).removed == ["lib/inner/a.c", "lib/inner/b.c"]
+
+
+def test_queue_overflow_falls_back_to_snapshot(watcher):
+    root, watcher = watcher
+    del watcher._snapshot
+    watcher._inotify._overflowed = True
+    (root / "src" / "main.c").unlink()
+    assert watcher.wait(timeout=5).removed == ["src/main.c"]
@@ -0,0 +1,61 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+REPOSITORY_ROOT = Path(__file__).resolve().parents[1]
+
+# Modules that must not be loaded by `import crow_hooks` alone.
+HEAVY_MODULES = [
+    "asyncio",
+    "concurrent.futures",
+    "socket",
+    "tomllib",
+    "toml",
+    "xml.etree.ElementTree",
+    "crow_hooks.compilation",
+    "crow_hooks.discovery.compiler_probe",
+    "crow_hooks.discovery.file_walker",
+    "crow_hooks.execution",
+    "crow_hooks.remote",
+]
+
+
+def loaded_modules(tmp_path: Path, code: str):
+    """Runs code in a fresh interpreter inside tmp_path; returns its modules."""
+    (tmp_path / "crow.toml").write_text('[package]\nname = "demo"\n')
+    script = code + "\nimport json, sys\nprint(json.dumps(sorted(sys.modules)))\n"
+    environment = dict(
+        os.environ,
+        PYTHONPATH=str(REPOSITORY_ROOT),
+        CROW_CACHE_DIR=str(tmp_path / "cache"),
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=str(tmp_path),
+        env=environment,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return set(json.loads(output.splitlines()[-1]))
+
+
+def test_import_defers_heavy_modules(tmp_path):
+    modules = loaded_modules(tmp_path, "import crow_hooks")
+    assert not [name for name in HEAVY_MODULES if name in modules]
+
+
+def test_lazy_exports_resolve():
+    from crow_hooks import compilation, discovery, execution, remote
+
+    for package in (compilation, discovery, execution, remote):
+        for name in package.__all__:
+            assert getattr(package, name).__name__ == name
+
+
+def test_run_defers_async_machinery(tmp_path):
+    modules = loaded_modules(tmp_path, "from crow_hooks import ctx\nctx.run(['true'])")
+    assert "asyncio" not in modules
+    assert "concurrent.futures" not in modules
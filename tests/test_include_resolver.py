@@ -0,0 +1,41 @@
+from crow_hooks.compilation import IncludeResolver
+
+
+def write(root, files):
+    for name, text in files.items():
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text)
+
+
+def test_only_directories_of_nested_includes_are_kept(tmp_path):
+    write(
+        tmp_path,
+        {
+            "src/main.cpp": '#include "local.h"\n#include <vector>\nint main() {}\n',
+            "src/local.h": '#include "one.h"\n',
+            "a/one.h": "#include <two.h>\n",
+            "b/two.h": "#include <three.h>\n",
+            "c/unused.h": "",
+            "d/three.h": "",
+        },
+    )
+    resolver = IncludeResolver(tmp_path, ["a", "c", "b", "d"], tmp_path / "build")
+    assert resolver.directories_for(["src/main.cpp"]) == ["a", "b", "d"]
+
+    # A new include deeper down is picked up after refresh().
+    write(tmp_path, {"d/three.h": '#include "unused.h"\n', "c/unused.h": ""})
+    resolver.refresh()
+    assert resolver.directories_for(["src/main.cpp"]) == ["a", "c", "b", "d"]
+
+
+def test_computed_include_keeps_full_list(tmp_path):
+    write(
+        tmp_path,
+        {
+            "src/main.cpp": '#include "one.h"\n',
+            "a/one.h": "#include HEADER\n",
+        },
+    )
+    resolver = IncludeResolver(tmp_path, ["a", "b"], tmp_path / "build")
+    assert resolver.directories_for(["src/main.cpp"]) is None
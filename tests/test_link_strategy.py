@@ -0,0 +1,6 @@
+from crow_hooks.compilation.link_strategy import LinkStrategy
+
+
+def test_compiler_linker_is_kept_unless_configured():
+    assert LinkStrategy.from_config({}).linker == "default"
+    assert LinkStrategy.from_config({"link": {"linker": "auto"}}).linker == "auto"
@@ -0,0 +1,78 @@
+import hashlib
+import os
+
+from crow_hooks.compilation.object_cache import ObjectCache
+
+
+def file_hash(path):
+    try:
+        with open(path, "rb") as handle:
+            return hashlib.sha1(handle.read()).hexdigest()
+    except OSError:
+        return None
+
+
+def store(cache, root, name, size=1000):
+    """Caches a fake object of source name, as after compiling it."""
+    source = root / name
+    source.write_text(f"int {name.split('.')[0]};\n")
+    obj = root / (name + ".o")
+    obj.write_bytes(os.urandom(size))
+    direct_key = cache.key("gcc", ["-c", name])
+    cache.store_direct(direct_key, [str(source)], file_hash, root, obj)
+    return direct_key, obj
+
+
+def test_hit_after_store_and_miss_after_change(tmp_path):
+    cache = ObjectCache(tmp_path / "cache")
+    direct_key, obj = store(cache, tmp_path, "a.c")
+
+    found = cache.lookup(direct_key, file_hash, tmp_path)
+    assert found is not None
+    destination = tmp_path / "out.o"
+    assert cache.fetch(found[0], destination)
+    assert destination.read_bytes() == obj.read_bytes()
+    assert found[1] == [str(tmp_path / "a.c")]
+
+    (tmp_path / "a.c").write_text("int changed;\n")
+    assert cache.lookup(direct_key, file_hash, tmp_path) is None
+    assert cache.stats["hits"] == 1 and cache.stats["misses"] == 1
+
+
+def test_size_is_tracked_without_scanning_below_limit(tmp_path, monkeypatch):
+    cache = ObjectCache(tmp_path / "cache", max_size=100_000)
+    store(cache, tmp_path, "a.c")
+    cache.cleanup()  # No size file yet: one scan establishes the total.
+
+    scans = []
+    monkeypatch.setattr(cache, "_evict", lambda: scans.append(True))
+    store(cache, tmp_path, "b.c")
+    cache.cleanup()
+    assert scans == []
+
+    on_disk = sum(
+        os.path.getsize(os.path.join(directory, name))
+        for kind in ("objects", "manifests")
+        for directory, _, names in os.walk(tmp_path / "cache" / kind)
+        for name in names
+    )
+    assert cache._read_size() == on_disk
+
+
+def test_eviction_removes_oldest_objects_and_manifests(tmp_path):
+    cache = ObjectCache(tmp_path / "cache", max_size=5000)
+    old_key, _ = store(cache, tmp_path, "old.c", 2000)
+    cache.cleanup()
+    for directory, _, names in os.walk(tmp_path / "cache"):
+        for name in names:
+            os.utime(os.path.join(directory, name), (1, 1))
+
+    new_key, _ = store(cache, tmp_path, "new.c", 2000)
+    store(cache, tmp_path, "newer.c", 2000)
+    cache.cleanup()
+
+    assert cache.stats["evictions"] >= 2
+    assert not cache._manifest_path(old_key).exists()
+    assert cache.lookup(old_key, file_hash, tmp_path) is None
+    assert cache.lookup(new_key, file_hash, tmp_path) is not None
+    assert cache._read_size() <= 5000 * 0.9
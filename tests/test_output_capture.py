@@ -0,0 +1,27 @@
+import gc
+import subprocess
+import sys
+import weakref
+
+from crow_hooks.execution import ConsoleLog
+
+
+def test_discarded_console_is_not_kept_alive():
+    console = ConsoleLog()
+    reference = weakref.ref(console)
+    del console
+    gc.collect()
+    assert reference() is None
+
+
+def test_queued_text_is_written_at_exit():
+    script = (
+        "from crow_hooks.execution import ConsoleLog\n"
+        "console = ConsoleLog(max_delay=60)\n"
+        "console.line('first')\n"
+        "console.line('queued')\n"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", script], capture_output=True, text=True, check=True
+    ).stdout
+    assert output == "first\nqueued\n"
@@ -0,0 +1,81 @@
+import os
+import signal
+import subprocess
+import sys
+
+import pytest
+
+from crow_hooks.execution.process_spawn import ProcessSpawner, SpawnedProcess
+
+pytestmark = pytest.mark.skipif(
+    not hasattr(os, "posix_spawn"), reason="needs posix_spawn"
+)
+
+REPORT = "import os; print(os.getcwd()); print(os.getpgid(0) == os.getpid())"
+
+
+def run(process):
+    stdout = process.stdout.read().decode()
+    process.stdout.close()
+    process.stderr.close()
+    assert process.wait() == 0
+    return stdout.split()
+
+
+def test_spawn_in_other_directory_without_shell(tmp_path):
+    spawner = ProcessSpawner("posix_spawn")
+    process = spawner.spawn(
+        [sys.executable, "-c", REPORT], dict(os.environ), str(tmp_path), True
+    )
+    if spawner._libc_spawn() is None:
+        assert isinstance(process, subprocess.Popen)
+    else:
+        assert isinstance(process, SpawnedProcess)
+    assert run(process) == [os.path.realpath(tmp_path), "False"]
+
+
+def test_spawn_in_other_directory_with_new_group(tmp_path):
+    spawner = ProcessSpawner("posix_spawn")
+    process = spawner.spawn(
+        [sys.executable, "-c", REPORT],
+        dict(os.environ),
+        str(tmp_path),
+        True,
+        new_group=True,
+    )
+    assert run(process) == [os.path.realpath(tmp_path), "True"]
+
+
+def test_spawn_falls_back_to_subprocess_without_chdir_action(tmp_path):
+    spawner = ProcessSpawner("posix_spawn")
+    spawner._libc, spawner._libc_loaded = None, True
+    process = spawner.spawn(
+        [sys.executable, "-c", REPORT], dict(os.environ), str(tmp_path), True
+    )
+    assert isinstance(process, subprocess.Popen)
+    assert run(process) == [os.path.realpath(tmp_path), "False"]
+
+
+@pytest.mark.skipif(
+    not os.path.exists("/proc/self/status"), reason="needs /proc/<pid>/status"
+)
+@pytest.mark.parametrize("other_directory", [False, True])
+def test_children_get_default_sigpipe_and_sigxfsz(tmp_path, other_directory):
+    spawner = ProcessSpawner("posix_spawn")
+    directory = str(tmp_path) if other_directory else os.getcwd()
+    process = spawner.spawn(
+        ["grep", "SigIgn", "/proc/self/status"], dict(os.environ), directory, True
+    )
+    _, mask = run(process)
+    ignored = int(mask, 16)
+    assert not ignored & (1 << (signal.SIGPIPE - 1))
+    assert not ignored & (1 << (signal.SIGXFSZ - 1))
+
+
+def test_wait_raises_when_status_was_reaped_elsewhere():
+    process = ProcessSpawner("posix_spawn").spawn(
+        ["true"], dict(os.environ), os.getcwd(), False
+    )
+    os.waitpid(process.pid, 0)
+    with pytest.raises(ChildProcessError):
+        process.wait()
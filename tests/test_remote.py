@@ -0,0 +1,133 @@
+import shutil
+import subprocess
+import threading
+import zlib
+
+import pytest
+
+from crow_hooks.compilation import CompilationError
+from crow_hooks.hooks import HookContext
+from crow_hooks.remote import CompileWorker
+from crow_hooks.remote import worker as worker_module
+from crow_hooks.remote.protocol import PROTOCOL_VERSION, remote_flags_allowed
+
+pytestmark = pytest.mark.skipif(not shutil.which("g++"), reason="needs g++")
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    """Project whose builds go to a worker listening on localhost."""
+    monkeypatch.setenv("CROW_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setenv("CROW_REMOTE_TOKEN", "secret")
+    monkeypatch.setenv("CXX", "g++")
+    monkeypatch.delenv("CROW_BUILD_DIR", raising=False)
+    worker = CompileWorker(port=0, compilers=["g++"], jobs=2)
+    compiled = []
+    handle = worker.handle
+
+    def counting_handle(header, payload):
+        if header.get("op") == "compile":
+            compiled.append(header["language"])
+        return handle(header, payload)
+
+    worker.handle = counting_handle
+    thread = threading.Thread(target=worker.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setenv("CROW_REMOTE_WORKERS", worker.address)
+
+    root = tmp_path / "project"
+    (root / "src").mkdir(parents=True)
+    (root / "crow.toml").write_text('[package]\nname = "demo"\n')
+    yield root, compiled
+    worker.shutdown()
+    thread.join()
+
+
+def test_units_with_gcc_pch_compile_on_worker(project):
+    root, compiled = project
+    (root / "src/pch.h").write_text('#include "value.h"\n')
+    (root / "src/value.h").write_text("#define VALUE 5\n")
+    (root / "src/main.cpp").write_text(
+        '#include <cstdio>\nint main() { std::printf("%d\\n", VALUE); }\n'
+    )
+    binary = HookContext(str(root)).compile_target(
+        "app", ["src/main.cpp"], pch="src/pch.h"
+    )
+    assert compiled == ["c++"]
+    output = subprocess.run([str(binary)], capture_output=True, text=True).stdout
+    assert output == "5\n"
+
+
+def test_failed_preprocessing_falls_back_to_local_compile(project):
+    root, compiled = project
+    (root / "src/main.cpp").write_text('#include "missing.h"\nint main() {}\n')
+    with pytest.raises(CompilationError):
+        HookContext(str(root)).compile_target("app", ["src/main.cpp"])
+    assert compiled == []
+
+
+def test_clang_pch_and_missing_forced_include_stay_local(project):
+    executor = HookContext(str(project[0]))._remote_executor
+    command = ["clang++", "-c", "a.cpp", "-o", "a.o"]
+    assert executor.plan(command) is not None
+    assert executor.plan(command + ["-include-pch", "pch/a.h.pch"]) is None
+    assert executor.plan(command + ["-include", "/nonexistent/a.h"]) is None
+
+
+def test_reserve_skips_worker_failed_during_handshake(project):
+    executor = HookContext(str(project[0]))._remote_executor
+    worker = executor.workers[0]
+
+    def handshake_then_fail(target):
+        target.compilers = [["gcc", "1", "x"]]
+        executor._fail(target)
+        return True
+
+    executor._handshake = handshake_then_fail
+    assert executor._reserve(["gcc", "1", "x"]) is None
+
+
+def test_flags_touching_other_files_are_rejected():
+    assert remote_flags_allowed(
+        ["-O2", "-g", "-fPIC", "-std=c++17", "-march=native", "-Wall", "-Wno-error"]
+    )
+    for flag in [
+        "-ftime-trace=/tmp/x.json",
+        "-fproc-stat-report=/tmp/x",
+        "-fsanitize-coverage-allowlist=/etc/shadow",
+        "-fxray-attr-list=/etc/passwd",
+        "-fthinlto-index=/etc/passwd",
+        "-fplugin=/tmp/evil.so",
+        "-fprofile-use=/tmp/x.profdata",
+        "-gsplit-dwarf",
+        "-Wl,-T,/etc/passwd",
+        "-march=../../etc/passwd",
+        "-B/tmp",
+    ]:
+        assert not remote_flags_allowed([flag]), flag
+
+
+def test_worker_rejects_payload_inflating_past_limit(monkeypatch):
+    worker = CompileWorker(port=0, compilers=["g++"], token="secret")
+    try:
+        info = worker.compilers[0]
+        header = {
+            "version": PROTOCOL_VERSION,
+            "token": "secret",
+            "op": "compile",
+            "compiler": [info.family, info.version, info.target],
+            "language": "c++",
+            "flags": [],
+        }
+        monkeypatch.setattr(worker_module, "MAX_PAYLOAD_SIZE", 64)
+        reply, _ = worker.handle(header, zlib.compress(b"int x;\n" * 100))
+        assert reply == {"status": "error", "error": "payload too large"}
+
+        monkeypatch.setattr(worker_module, "MAX_PAYLOAD_SIZE", 1 << 20)
+        reply, _ = worker.handle(header, zlib.compress(b"int x;\n" * 100)[:20])
+        assert reply == {"status": "error", "error": "truncated payload"}
+        reply, data = worker.handle(header, zlib.compress(b"int x;\n"))
+        assert reply["status"] == "ok" and reply["returncode"] == 0
+        assert zlib.decompress(data)
+    finally:
+        worker.server.server_close()
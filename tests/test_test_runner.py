@@ -0,0 +1,121 @@
+import os
+import sys
+import xml.etree.ElementTree as ElementTree
+
+import pytest
+
+from crow_hooks.compilation.build_state import BuildStateDatabase
+from crow_hooks.execution import BuildExecutor
+from crow_hooks.execution import test_runner as tests
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "killpg"), reason="needs POSIX")
+
+# Runs the test cases GTEST_SHARD_INDEX selects, like GoogleTest does.
+FAKE_GTEST = """
+import os, sys
+cases = ["Math.Add", "Math.Sub", "Io.Read", "Io.Write"]
+total = int(os.environ.get("GTEST_TOTAL_SHARDS", "1"))
+index = int(os.environ.get("GTEST_SHARD_INDEX", "0"))
+mine = [case for number, case in enumerate(cases) if number % total == index]
+report = os.environ["GTEST_OUTPUT"][len("xml:"):]
+with open(report, "w") as handle:
+    handle.write(f'<testsuites tests="{len(mine)}">')
+    for case in mine:
+        suite, name = case.split(".")
+        failed = case == "Io.Write"
+        handle.write(f'<testsuite name="{suite}" tests="1" failures="{int(failed)}">')
+        handle.write(f'<testcase name="{name}">')
+        handle.write('<failure message="wrong"/>' if failed else "")
+        handle.write("</testcase></testsuite>")
+    handle.write("</testsuites>")
+sys.exit(1 if "Io.Write" in mine else 0)
+"""
+
+# Picks test cases from --shard-count and --shard-index, like Catch2 does.
+FAKE_CATCH2 = """
+import sys
+arguments = sys.argv[1:]
+count = int(arguments[arguments.index("--shard-count") + 1])
+index = int(arguments[arguments.index("--shard-index") + 1])
+mine = [case for case in range(5) if case % count == index]
+print("cases", mine)
+sys.exit(3 if 4 in mine else 0)
+"""
+
+SLEEPER = """
+import time
+time.sleep(10)
+"""
+
+
+def fake_binary(directory, name, body):
+    path = directory / name
+    path.write_text(f"#!{sys.executable}\n{body}")
+    path.chmod(0o755)
+    return path
+
+
+@pytest.fixture
+def runner(tmp_path):
+    executor = BuildExecutor(tmp_path, use_jobserver=False)
+    executor.grace_period = 0.2
+    build = tmp_path / "build"
+    return tests.TestRunner(executor, BuildStateDatabase(build), build)
+
+
+def spec(path, timeout=None):
+    return tests.TestSpec(path.name, path, [], "auto", None, timeout, {})
+
+
+def test_shards_run_and_junit_reports_merge(runner, tmp_path):
+    gtest = fake_binary(tmp_path, "unit", FAKE_GTEST)
+    catch2 = fake_binary(tmp_path, "spec", FAKE_CATCH2)
+    junit = tmp_path / "results.xml"
+    results = runner.run(
+        [spec(gtest), spec(catch2)],
+        jobs=2,
+        shards=3,
+        junit_path=junit,
+    )
+
+    assert [result.name for result in results] == [
+        "unit[1/3]",
+        "unit[2/3]",
+        "unit[3/3]",
+        "spec[1/3]",
+        "spec[2/3]",
+        "spec[3/3]",
+    ]
+    assert runner.framework(spec(gtest)) == "gtest"
+    assert runner.framework(spec(catch2)) == "catch2"
+    failed = {result.name for result in results if not result.passed}
+    assert failed == {"unit[1/3]", "spec[2/3]"}
+
+    root = ElementTree.parse(junit).getroot()
+    gtest_cases = {
+        f"{suite.get('name')}.{case.get('name')}"
+        for suite in root.findall("testsuite")
+        if suite.get("name") != "crow"
+        for case in suite.iter("testcase")
+    }
+    assert gtest_cases == {
+        "unit[1/3].Math.Add",
+        "unit[1/3].Io.Write",
+        "unit[2/3].Math.Sub",
+        "unit[3/3].Io.Read",
+    }
+    (crow,) = root.findall("testsuite[@name='crow']")
+    assert [case.get("name") for case in crow] == [
+        "spec[1/3]",
+        "spec[2/3]",
+        "spec[3/3]",
+    ]
+    assert crow.get("failures") == "1"
+    assert root.get("failures") == "2"
+
+
+def test_own_timeout_overrides_run_timeout(runner, tmp_path):
+    sleeper = fake_binary(tmp_path, "slow", SLEEPER)
+    (result,) = runner.run([spec(sleeper, timeout=0.5)], timeout=60)
+    assert result.status == "timeout"
+    assert result.duration < 10
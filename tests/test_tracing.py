@@ -0,0 +1,65 @@
+import json
+import sys
+import threading
+
+from crow_hooks.execution import BuildExecutor
+from crow_hooks.tracing import BuildTracer, tracer
+
+
+def test_disabled_tracer_records_nothing():
+    local = BuildTracer()
+    with local.span("a.c", "compile") as args:
+        args["exit_code"] = 0
+    assert local.spans == []
+
+
+def test_chrome_trace_and_summary(tmp_path):
+    local = BuildTracer()
+    local.enable()
+    with local.span("slow.c", "compile", target="app") as args:
+        args.update(exit_code=0, cpu_time=0.5, max_rss_kb=4096)
+
+    def worker():
+        with local.span("fast.c", "compile", target="app"):
+            pass
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    thread.join()
+    local.record("link", "link", 0.0, 0.1)
+
+    path = local.write(tmp_path / "trace.json")
+    events = json.loads(path.read_text())["traceEvents"]
+    names = {event["args"]["name"] for event in events if event["ph"] == "M"}
+    assert names == {"main", "worker-1"}
+    spans = {event["name"]: event for event in events if event["ph"] == "X"}
+    assert set(spans) == {"slow.c", "fast.c", "link"}
+    assert spans["slow.c"]["cat"] == "compile"
+    assert spans["slow.c"]["args"]["max_rss_kb"] == 4096
+    assert spans["fast.c"]["tid"] == 1
+
+    summary = local.summary()
+    assert summary.startswith("2 translation units")
+    lines = summary.splitlines()
+    largest = lines[lines.index("Largest peak memory:") + 2].split()
+    assert largest[1:] == ["0.50", "4.0", "0", "app:", "slow.c"]
+
+
+def test_commands_report_exit_code_and_resources(tmp_path):
+    tracer.reset()
+    tracer.enable()
+    try:
+        executor = BuildExecutor(tmp_path, use_jobserver=False)
+        executor.execute_command(
+            [sys.executable, "-c", "raise SystemExit(3)"],
+            check_success=False,
+            capture_output=True,
+            echo=False,
+        )
+    finally:
+        tracer.enabled = False
+    (span,) = [span for span in tracer.spans if span.category == "command"]
+    tracer.reset()
+    assert span.args["exit_code"] == 3
+    assert span.args["command"].startswith(sys.executable)
+    assert span.args["cpu_time"] is None or span.args["cpu_time"] >= 0